@@ -0,0 +1,68 @@
+"""Compares sequential `Carie.forward` with concurrent `Carie.aforward`.
+
+Both run the tasks of storage/*.csv against a local stub LM server, so the
+numbers measure how well LM latency is overlapped, not the model itself.
+
+Usage: python -m benchmarks.async_throughput [--tasks 32] [--latency 0.05]
+"""
+
+import os
+
+# The LM disk cache would answer repeated prompts without any latency
+os.environ.setdefault("DSP_CACHEBOOL", "false")
+
+from argparse import ArgumentParser
+from itertools import cycle, islice
+from time import perf_counter
+import asyncio
+
+import dspy
+
+from carie.data import _load_sensor_csv
+from carie.lm import get_lm
+from carie.programs import Carie
+
+from benchmarks.stub_lm import StubLM, start_stub_lm_server
+
+
+async def _run_concurrently(carie: Carie, tasks: list[str]):
+    return await asyncio.gather(*(carie.aforward(task=task) for task in tasks))
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("--tasks", type=int, default=32)
+    parser.add_argument("--latency", type=float, default=0.05)
+    args = parser.parse_args()
+
+    stub_lm = StubLM(latency=args.latency)
+    server, port = start_stub_lm_server(stub_lm)
+    dspy.settings.configure(lm=get_lm(port=port))
+
+    tasks = [row["task"] for row in _load_sensor_csv()]
+    tasks = list(islice(cycle(tasks), args.tasks))
+    carie = Carie(fast_path=False)
+
+    print(f"{'mode':<6} {'tasks':>6} {'LM calls':>9} {'seconds':>8} {'tasks/s':>8}")
+
+    for mode in ("sync", "async"):
+        requests = stub_lm.requests
+        start = perf_counter()
+
+        if mode == "sync":
+            predictions = [carie(task=task) for task in tasks]
+        else:
+            predictions = asyncio.run(_run_concurrently(carie, tasks))
+
+        seconds = perf_counter() - start
+        assert len(predictions) == len(tasks)
+        print(
+            f"{mode:<6} {len(tasks):>6} {stub_lm.requests - requests:>9}"
+            f" {seconds:>8.2f} {len(tasks) / seconds:>8.1f}"
+        )
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
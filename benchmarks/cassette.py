@@ -0,0 +1,84 @@
+"""Records Carie sessions on an LM cassette, then replays them offline.
+
+The first run records every LM response of the stub LM server. The replay
+runs after the server is shut down, so every response must come from the
+cassette, and must give the same predictions. A last replay of a task that
+was never recorded shows a miss failing loudly.
+
+Usage: python -m benchmarks.cassette [--tasks 32] [--latency 0.05]
+"""
+
+import os
+
+os.environ.setdefault("DSP_CACHEBOOL", "false")
+
+from argparse import ArgumentParser
+from itertools import cycle, islice
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+import dspy
+
+from carie.cassette import Cassette, CassetteMissError, set_cassette
+from carie.data import _load_sensor_csv
+from carie.lm import get_lm
+from carie.programs import Carie
+
+from benchmarks.stub_lm import StubLM, start_stub_lm_server
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("--tasks", type=int, default=32)
+    parser.add_argument("--latency", type=float, default=0.05)
+    args = parser.parse_args()
+
+    server, port = start_stub_lm_server(StubLM(latency=args.latency))
+    dspy.settings.configure(lm=get_lm(port=port))
+
+    tasks = [row["task"] for row in _load_sensor_csv()]
+    tasks = list(islice(cycle(tasks), args.tasks))
+    carie = Carie(fast_path=False)
+    results = {}
+
+    print(f"{'mode':<8} {'tasks':>6} {'seconds':>8} {'tasks/s':>8}  cassette")
+
+    with TemporaryDirectory() as directory:
+        file_path = os.path.join(directory, "lm.jsonl")
+
+        for mode in ("record", "replay"):
+            cassette = Cassette(file_path, mode=mode)
+            set_cassette(cassette)
+
+            start = perf_counter()
+            results[mode] = [carie(task=task).result for task in tasks]
+            seconds = perf_counter() - start
+
+            cassette.close()
+            print(
+                f"{mode:<8} {len(tasks):>6} {seconds:>8.2f} {len(tasks) / seconds:>8.1f}"
+                f"  {cassette.stats()}"
+            )
+
+            # Replays must not need the LM server
+            if mode == "record":
+                server.shutdown()
+                server.server_close()
+
+        assert results["replay"] == results["record"], "Replay changed predictions"
+        print(
+            f"\n{os.path.getsize(file_path) / 1024:.1f} KiB recorded, same predictions"
+        )
+
+        set_cassette(Cassette(file_path, mode="replay"))
+
+        try:
+            carie(task="Which of our plants was repotted last?")
+        except CassetteMissError as miss:
+            print(f"Unrecorded task: {miss}")
+
+    set_cassette(None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Compares parse failures and hops per task with and without guided actions.
+
+The stub LM garbles a share of its actions, as small models do, unless the
+request carries a `guided_regex`, which vLLM would enforce while decoding.
+Scripted completions the regex does not match are garbled too, and reported
+as regex misses, so a regex rejecting valid actions shows up as failures.
+
+Usage: python -m benchmarks.constrained_actions [--tasks 64] [--malformed-rate 0.2]
+"""
+
+import os
+
+os.environ.setdefault("DSP_CACHEBOOL", "false")
+
+from argparse import ArgumentParser
+from itertools import cycle, islice
+
+import dspy
+
+from carie.data import _load_sensor_csv
+from carie.lm import get_lm
+from carie.programs import Carie
+from react import action_stats, reset_react_stats
+
+from benchmarks.stub_lm import StubLM, start_stub_lm_server
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("--tasks", type=int, default=64)
+    parser.add_argument("--malformed-rate", type=float, default=0.2)
+    args = parser.parse_args()
+
+    stub_lm = StubLM(latency=0.0, malformed_rate=args.malformed_rate)
+    server, port = start_stub_lm_server(stub_lm)
+    dspy.settings.configure(lm=get_lm(port=port))
+
+    tasks = [row["task"] for row in _load_sensor_csv()]
+    tasks = list(islice(cycle(tasks), args.tasks))
+
+    print(
+        f"{'constrained':<12} {'tasks':>6} {'actions':>8} {'failed':>7}"
+        f" {'failure rate':>13} {'hops/task':>10} {'regex misses':>13}"
+    )
+
+    for constrained_actions in (False, True):
+        carie = Carie(fast_path=False)
+        carie.generate_reasoning.constrained_actions = constrained_actions
+        reset_react_stats()
+        regex_mismatches = stub_lm.regex_mismatches
+
+        for task in tasks:
+            carie(task=task)
+
+        stats = action_stats()
+        print(
+            f"{str(constrained_actions):<12} {stats['tasks']:>6} {stats['actions']:>8}"
+            f" {stats['failed_actions']:>7} {stats['parse_failure_rate']:>13.1%}"
+            f" {stats['hops_per_task']:>10.2f}"
+            f" {stub_lm.regex_mismatches - regex_mismatches:>13}"
+        )
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""Compares Carie with and without the fast path in front of ReAct.
+
+Tasks are those of storage/*.csv plus templated questions about the plants
+of storage/plants.json, some negated, ambiguous or about the past so the
+fast path must leave them to ReAct. Routed tasks never reach the stub LM server, so the
+end-to-end percentiles show what each answered task waited for.
+
+Usage: python -m benchmarks.fast_path [--tasks 200] [--latency 0.05]
+"""
+
+import os
+
+os.environ.setdefault("DSP_CACHEBOOL", "false")
+
+from argparse import ArgumentParser
+from itertools import cycle, islice
+from random import Random
+from time import perf_counter
+
+import dspy
+import numpy as np
+
+from carie.data import _load_sensor_csv
+from carie.lm import get_lm
+from carie.programs import Carie
+from carie.router import reset_router_stats, router_stats
+from plants import list_plants
+
+from benchmarks.stub_lm import StubLM, start_stub_lm_server
+
+_TEMPLATES = (
+    "What is the {sensor} of {name}?",
+    "What is {name}'s ideal {sensor}?",
+    "What should {name}'s {sensor} be?",
+    "Is {name} too cold?",
+    "Is {name} over-watered?",
+    "Who needs more {sensor}?",
+    "Which plants have too much {sensor}?",
+    "How is {name} doing?",
+    "Should I move {name} next to the window?",
+)
+# Negated, ambiguous or past questions, which must be left to ReAct
+_FALLBACK_TEMPLATES = (
+    "Which plants are not too hot?",
+    "Which plants does not need more water?",
+    "Does {name} need more or less {sensor}?",
+    "Isn't {name} too cold?",
+    "Which plants don't have enough {sensor}?",
+    "What was {name}'s {sensor} yesterday?",
+    "What should the humidity be for {name}?",
+    "Is {name}'s humidity too low?",
+)
+_SENSORS = ("light", "soil pH", "air humidity", "temperature", "soil moisture")
+
+
+def _tasks(n_tasks: int) -> list[str]:
+    random = Random(0)
+    names = [plant.name for plant in list_plants()]
+    tasks = [row["task"] for row in _load_sensor_csv()]
+    tasks += [
+        random.choice(_TEMPLATES + _FALLBACK_TEMPLATES).format(
+            name=random.choice(names), sensor=random.choice(_SENSORS)
+        )
+        for _ in range(len(tasks) * 2)
+    ]
+    random.shuffle(tasks)
+    return list(islice(cycle(tasks), n_tasks))
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("--tasks", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.05)
+    args = parser.parse_args()
+
+    stub_lm = StubLM(latency=args.latency)
+    server, port = start_stub_lm_server(stub_lm)
+    dspy.settings.configure(lm=get_lm(port=port))
+    tasks = _tasks(args.tasks)
+
+    router = Carie().router
+    routed = [
+        template
+        for template in _FALLBACK_TEMPLATES
+        if router.route(template.format(name="Eddie", sensor="light"))
+    ]
+    assert not routed, f"Routed questions that must be left to ReAct: {routed}"
+
+    print(
+        f"{'fast path':<10} {'tasks':>6} {'hit rate':>9} {'LM calls':>9}"
+        f" {'p50 (ms)':>9} {'p95 (ms)':>9} {'p99 (ms)':>9} {'tasks/s':>8}"
+    )
+
+    for fast_path in (False, True):
+        carie = Carie(fast_path=fast_path)
+        reset_router_stats()
+        requests = stub_lm.requests
+        latencies = []
+        start = perf_counter()
+
+        for task in tasks:
+            task_start = perf_counter()
+            carie(task=task)
+            latencies.append(perf_counter() - task_start)
+
+        seconds = perf_counter() - start
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1000
+        print(
+            f"{str(fast_path):<10} {len(tasks):>6} {router_stats()['hit_rate']:>9.1%}"
+            f" {stub_lm.requests - requests:>9} {p50:>9.2f} {p95:>9.2f}"
+            f" {p99:>9.2f} {len(tasks) / seconds:>8.1f}"
+        )
+
+    stats = router_stats()
+    print(
+        f"\nrouting (us): p50 {stats['p50_us']:.1f}, p95 {stats['p95_us']:.1f},"
+        f" p99 {stats['p99_us']:.1f}; routes per intent: {stats['intents']}"
+    )
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
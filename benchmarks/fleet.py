@@ -0,0 +1,85 @@
+from random import Random
+
+_SPECIES = [
+    "Haworthia fasciata",
+    "Calathea orbifolia",
+    "Phalaenopsis amabilis",
+    "Tillandsia cyanea",
+    "Monstera deliciosa",
+    "Ficus lyrata",
+]
+_PERSONALITIES = [
+    "polite, helpful, always bored",
+    "cheerful and talkative",
+    "dramatic, moody, loves attention",
+    "hopeless-romantic with a broken heart",
+]
+# (ideal minimum, ideal maximum) per sensor, in the order of plants.json
+_IDEAL_RANGES = {
+    "air_humidity": (30.0, 70.0),
+    "air_temperature": (18.0, 28.0),
+    "soil_humidity": (20.0, 80.0),
+    "soil_ph": (5.5, 7.0),
+    "light_level": (500, 4000),
+}
+
+
+def synthetic_plant_json(plant_id: int, random: Random) -> dict:
+    """Builds one plant shaped like the items of storage/plants.json."""
+    actual_sensor, ideal_min_sensor, ideal_max_sensor = {}, {}, {}
+
+    for sensor_name, (low, high) in _IDEAL_RANGES.items():
+        width = high - low
+        ideal_min = low + random.random() * width / 4
+        ideal_max = high - random.random() * width / 4
+        actual = low - width / 4 + random.random() * width * 1.5
+
+        if sensor_name == "light_level":
+            ideal_min, ideal_max, actual = int(ideal_min), int(ideal_max), int(actual)
+        else:
+            ideal_min, ideal_max, actual = (
+                round(ideal_min, 1),
+                round(ideal_max, 1),
+                round(actual, 1),
+            )
+
+        ideal_min_sensor[sensor_name] = ideal_min
+        ideal_max_sensor[sensor_name] = ideal_max
+        actual_sensor[sensor_name] = actual
+
+    return {
+        "_meta": [],
+        "id": plant_id,
+        "name": f"Plant{plant_id}",
+        "scientific_name": random.choice(_SPECIES),
+        "personality": random.choice(_PERSONALITIES),
+        "actual_sensor": actual_sensor,
+        "ideal_min_sensor": ideal_min_sensor,
+        "ideal_max_sensor": ideal_max_sensor,
+    }
+
+
+def synthetic_plants_json(n_plants: int, seed: int = 0) -> list[dict]:
+    """Builds a fleet of `n_plants` named Plant1, Plant2, ..."""
+    random = Random(seed)
+    return [
+        synthetic_plant_json(plant_id, random) for plant_id in range(1, n_plants + 1)
+    ]
+
+
+def synthetic_updates(
+    plants_json: list[dict], n_updates: int, seed: int = 0
+) -> list[dict]:
+    """Builds actual sensor updates for randomly picked plants of a fleet."""
+    random = Random(seed)
+    updates = []
+
+    for plant_json in random.sample(plants_json, n_updates):
+        sensor_name = random.choice(list(_IDEAL_RANGES))
+        low, high = _IDEAL_RANGES[sensor_name]
+        value = round(low + random.random() * (high - low), 1)
+        updates.append(
+            {"name": plant_json["name"], "actual_sensor": {sensor_name: value}}
+        )
+
+    return updates
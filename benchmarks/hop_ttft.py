@@ -0,0 +1,106 @@
+"""Measures time to first token per hop with and without append-only prompts.
+
+Trajectories of the tasks of storage/*.csv are planned first, then every
+planner prompt is sent again in the same order as a streamed request, timing
+its first token. By default prompts go to a stub LM that simulates prefix
+caching; give --port of a vLLM server started with --enable-prefix-caching
+to measure the real thing.
+
+Usage: python -m benchmarks.hop_ttft [--tasks 16] [--port 8000]
+"""
+
+import os
+
+os.environ.setdefault("DSP_CACHEBOOL", "false")
+
+from argparse import ArgumentParser
+from collections import defaultdict
+from itertools import cycle, islice
+from statistics import mean
+from time import perf_counter
+import re
+
+import dspy
+import requests
+
+from carie.data import _load_sensor_csv
+from carie.lm import get_lm
+from carie.programs import Carie
+
+from benchmarks.stub_lm import StubLM, start_stub_lm_server
+
+
+def _hop(prompt: str) -> int:
+    query = prompt.split("\n---\n")[-1]
+    return len(re.findall(r"^Thought \d+:", query, flags=re.MULTILINE))
+
+
+def _time_to_first_token(url: str, model: str, prompt: str) -> float:
+    start = perf_counter()
+    payload = {"model": model, "prompt": prompt, "max_tokens": 1, "stream": True}
+
+    with requests.post(f"{url}/v1/completions", json=payload, stream=True) as response:
+        for line in response.iter_lines():
+            if line.startswith(b"data:"):
+                return perf_counter() - start
+
+    raise RuntimeError("The LM streamed no tokens")
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("--tasks", type=int, default=16)
+    parser.add_argument("--port", type=int, default=None)
+    parser.add_argument("--url", default="http://127.0.0.1")
+    args = parser.parse_args()
+
+    stub_lm = None
+
+    if args.port is None:
+        # 1000 uncached prompt tokens take 0.2 seconds to prefill
+        stub_lm = StubLM(latency=0.002, prefill_latency=0.0002)
+        _, args.port = start_stub_lm_server(stub_lm)
+
+    lm = get_lm(port=args.port, url=args.url)
+    dspy.settings.configure(lm=lm)
+    url = f"{args.url}:{args.port}"
+
+    tasks = [row["task"] for row in _load_sensor_csv()]
+    tasks = list(islice(cycle(tasks), args.tasks))
+
+    ttfts = {}
+
+    for append_only in (False, True):
+        carie = Carie(fast_path=False)
+        react = carie.generate_reasoning
+        react.append_only = append_only
+        react.planners = [None] * (1 if append_only else react.max_hops)
+
+        lm.history.clear()
+
+        for task in tasks:
+            carie(task=task)
+
+        prompts = [entry["prompt"] for entry in lm.history]
+
+        if stub_lm is not None:
+            stub_lm.clear_prefix_cache()
+
+        ttfts[append_only] = defaultdict(list)
+
+        for prompt in prompts:
+            ttft = _time_to_first_token(url, lm.kwargs["model"], prompt)
+            ttfts[append_only][_hop(prompt)].append(ttft)
+
+    print(f"{'hop':>4} {'prompts':>8} {'per-hop (ms)':>13} {'append-only (ms)':>17}")
+
+    for hop in sorted(ttfts[False]):
+        print(
+            f"{hop:>4} {len(ttfts[False][hop]):>8}"
+            f" {mean(ttfts[False][hop]) * 1000:>13.1f}"
+            f" {mean(ttfts[True].get(hop) or [float('nan')]) * 1000:>17.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
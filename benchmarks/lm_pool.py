@@ -0,0 +1,98 @@
+"""Runs concurrent Carie sessions against a pool of stub vLLM replicas.
+
+Replicas are local stub LM servers: healthy ones, a slow one, and a dead
+one whose port refuses connections. The pool should send most requests to
+the healthy replicas and open the circuit of the dead one after a few
+failures, without any session failing.
+
+Usage: python -m benchmarks.lm_pool [--tasks 64] [--healthy 2] [--slow-latency 0.5]
+"""
+
+import os
+
+os.environ.setdefault("DSP_CACHEBOOL", "false")
+
+from argparse import ArgumentParser
+from itertools import cycle, islice
+from time import perf_counter
+import asyncio
+
+import dspy
+
+from carie.data import _load_sensor_csv
+from carie.lm import get_lm
+from carie.programs import Carie
+
+from benchmarks.stub_lm import StubLM, start_stub_lm_server
+
+
+def _dead_url() -> str:
+    # A port that was just free, and nothing listens on any more
+    server, port = start_stub_lm_server(StubLM())
+    server.shutdown()
+    server.server_close()
+    return f"http://127.0.0.1:{port}"
+
+
+async def _run_concurrently(carie: Carie, tasks: list[str]):
+    return await asyncio.gather(
+        *(carie.aforward(task=task) for task in tasks), return_exceptions=True
+    )
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("--tasks", type=int, default=64)
+    parser.add_argument("--healthy", type=int, default=2)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--slow-latency", type=float, default=0.5)
+    args = parser.parse_args()
+
+    replicas = {}
+
+    for index in range(args.healthy):
+        _, port = start_stub_lm_server(StubLM(latency=args.latency))
+        replicas[f"http://127.0.0.1:{port}"] = f"healthy {index + 1}"
+
+    _, port = start_stub_lm_server(StubLM(latency=args.slow_latency))
+    replicas[f"http://127.0.0.1:{port}"] = "slow"
+    replicas[_dead_url()] = "dead"
+
+    tasks = [row["task"] for row in _load_sensor_csv()]
+    tasks = list(islice(cycle(tasks), args.tasks))
+
+    print(f"{'replicas':<28} {'tasks':>6} {'failed':>7} {'seconds':>8} {'tasks/s':>8}")
+
+    setups = {
+        "first healthy only": list(replicas)[:1],
+        "all, least loaded": list(replicas),
+    }
+
+    for setup, endpoints in setups.items():
+        lm = get_lm(endpoints=endpoints)
+        dspy.settings.configure(lm=lm)
+        carie = Carie(fast_path=False)
+
+        start = perf_counter()
+        predictions = asyncio.run(_run_concurrently(carie, tasks))
+        seconds = perf_counter() - start
+
+        failed = sum(isinstance(prediction, Exception) for prediction in predictions)
+        print(
+            f"{setup:<28} {len(tasks):>6} {failed:>7} {seconds:>8.2f}"
+            f" {len(tasks) / seconds:>8.1f}"
+        )
+
+    print(
+        f"\n{'replica':<12} {'state':<10} {'requests':>9} {'failures':>9} {'latency (ms)':>13}"
+    )
+
+    for url, stats in lm.pool.stats().items():
+        print(
+            f"{replicas[url]:<12} {stats['state']:<10} {stats['requests']:>9}"
+            f" {stats['failures']:>9} {(stats['latency'] or 0.0) * 1000:>13.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Compares concurrent Carie sessions with and without LM micro-batching.
+
+Sessions run through `Carie.aforward`, so their planner calls are made at
+once from many threads. The stub LM server answers a batch of prompts in
+about the time of one, as a GPU batch does, so throughput grows with batch
+size while every request waits up to the batch window.
+
+Usage: python -m benchmarks.micro_batching [--tasks 128] [--windows 0 2 5 10]
+"""
+
+import os
+
+os.environ.setdefault("DSP_CACHEBOOL", "false")
+
+from argparse import ArgumentParser
+from itertools import cycle, islice
+from time import perf_counter
+import asyncio
+
+import dspy
+
+from carie.batching import batch_stats, reset_batch_stats
+from carie.data import _load_sensor_csv
+from carie.lm import get_lm
+from carie.programs import Carie
+
+from benchmarks.stub_lm import StubLM, start_stub_lm_server
+
+
+async def _run_concurrently(carie: Carie, tasks: list[str]):
+    return await asyncio.gather(*(carie.aforward(task=task) for task in tasks))
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("--tasks", type=int, default=128)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--windows", type=float, nargs="+", default=[0, 2, 5, 10])
+    parser.add_argument("--max-batch-size", type=int, default=32)
+    args = parser.parse_args()
+
+    stub_lm = StubLM(latency=args.latency)
+    server, port = start_stub_lm_server(stub_lm)
+
+    tasks = [row["task"] for row in _load_sensor_csv()]
+    tasks = list(islice(cycle(tasks), args.tasks))
+
+    print(
+        f"{'window (ms)':>11} {'LM calls':>9} {'batches':>8} {'mean size':>10}"
+        f" {'seconds':>8} {'tasks/s':>8}  batch sizes"
+    )
+
+    for window in args.windows:
+        dspy.settings.configure(
+            lm=get_lm(
+                port=port, batch_window_ms=window, max_batch_size=args.max_batch_size
+            )
+        )
+        carie = Carie(fast_path=False)
+        reset_batch_stats()
+        requests = stub_lm.requests
+
+        start = perf_counter()
+        asyncio.run(_run_concurrently(carie, tasks))
+        seconds = perf_counter() - start
+
+        stats = batch_stats()
+        calls = stub_lm.requests - requests
+        batches = stats["batches"] if window else calls
+        mean_size = stats["mean_batch_size"] if window else 1.0
+        print(
+            f"{window:>11g} {calls:>9} {batches:>8} {mean_size:>10.1f}"
+            f" {seconds:>8.2f} {len(tasks) / seconds:>8.1f}  {stats['histogram']}"
+        )
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
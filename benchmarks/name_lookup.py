@@ -0,0 +1,70 @@
+"""Times exact and near-miss plant name lookups over a synthetic fleet.
+
+Usage: python -m benchmarks.name_lookup [--sizes 10000 100000]
+"""
+
+from argparse import ArgumentParser
+from random import Random
+from time import perf_counter
+
+from plants import ColumnarPlants, _NameIndex, _plant_from_json
+
+from benchmarks.fleet import synthetic_plants_json
+
+
+def _misspell(name: str, random: Random) -> str:
+    index = random.randrange(1, len(name))
+    return name[:index] + name[index + 1 :]
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--queries", type=int, default=1000)
+    args = parser.parse_args()
+
+    print(
+        f"{'store':<10} {'plants':>8} {'build (s)':>10} {'exact (us)':>11} {'near miss (us)':>15}"
+    )
+
+    for n_plants in args.sizes:
+        plants_json = synthetic_plants_json(n_plants)
+        random = Random(0)
+        names = [
+            plant_json["name"]
+            for plant_json in random.sample(plants_json, args.queries)
+        ]
+        misspelled_names = [_misspell(name, random) for name in names]
+
+        for store in ("dataclass", "columnar"):
+            if store == "columnar":
+                plants = ColumnarPlants.from_json(plants_json)
+            else:
+                plants = {
+                    plant_json["name"].lower(): _plant_from_json(plant_json)
+                    for plant_json in plants_json
+                }
+
+            name_index = _NameIndex()
+            start = perf_counter()
+            name_index.sync(plants)
+            build = perf_counter() - start
+
+            start = perf_counter()
+            for name in names:
+                plants.get(name.lower())
+            exact = (perf_counter() - start) / len(names)
+
+            start = perf_counter()
+            for name in misspelled_names:
+                name_index.search(name, limit=2)
+            near_miss = (perf_counter() - start) / len(names)
+
+            print(
+                f"{store:<10} {n_plants:>8} {build:>10.2f} "
+                f"{exact * 1e6:>11.1f} {near_miss * 1e6:>15.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""Compares tokens generated vs kept per hop with and without stop sequences.
+
+The stub LM rambles past `Action n` with a made-up observation and a later
+hop, as base models do, which planners then throw away.
+
+Usage: python -m benchmarks.planner_tokens [--tasks 32]
+"""
+
+import os
+
+os.environ.setdefault("DSP_CACHEBOOL", "false")
+
+from argparse import ArgumentParser
+from itertools import cycle, islice
+
+import dspy
+
+from carie.data import _load_sensor_csv
+from carie.lm import get_lm
+from carie.programs import Carie
+from react import hop_token_stats, reset_react_stats
+
+from benchmarks.stub_lm import StubLM, start_stub_lm_server
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("--tasks", type=int, default=32)
+    args = parser.parse_args()
+
+    server, port = start_stub_lm_server(StubLM(latency=0.0, ramble=True))
+    dspy.settings.configure(lm=get_lm(port=port))
+
+    tasks = [row["task"] for row in _load_sensor_csv()]
+    tasks = list(islice(cycle(tasks), args.tasks))
+
+    print(
+        f"{'stop':<6} {'hop':>4} {'calls':>6} {'generated':>10} {'kept':>6} {'wasted':>7}"
+    )
+
+    for stop_after_action in (False, True):
+        carie = Carie(fast_path=False)
+        carie.generate_reasoning.stop_after_action = stop_after_action
+        reset_react_stats()
+
+        for task in tasks:
+            carie(task=task)
+
+        for hop, tokens in hop_token_stats().items():
+            wasted = 1 - tokens["kept"] / tokens["generated"]
+            print(
+                f"{str(stop_after_action):<6} {hop:>4} {tokens['calls']:>6}"
+                f" {tokens['generated']:>10} {tokens['kept']:>6} {wasted:>7.0%}"
+            )
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
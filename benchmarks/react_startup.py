@@ -0,0 +1,61 @@
+"""Times creating and copying Carie for growing numbers of hops.
+
+"eager" builds every planner signature, as `ReAct.__init__` used to. "cold"
+is the first Carie of a process, "warm" any later one, "copy" the deepcopy
+optimizers and evaluation make, and "compile" materializes every planner
+through `named_predictors`, as BootstrapFewShot does.
+
+Usage: python -m benchmarks.react_startup [--hops 8 16 32]
+"""
+
+from argparse import ArgumentParser
+from time import perf_counter
+
+from carie.programs import Carie
+from react import _REACT_SIGNATURES, _generate_react_signature
+
+
+def _timed(function) -> tuple[float, object]:
+    start = perf_counter()
+    result = function()
+    return perf_counter() - start, result
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("--hops", type=int, nargs="+", default=[8, 16, 32])
+    args = parser.parse_args()
+
+    print(
+        f"{'hops':>5} {'eager (ms)':>11} {'cold (ms)':>10} {'warm (ms)':>10}"
+        f" {'copy (ms)':>10} {'compile (ms)':>13}"
+    )
+
+    for max_hops in args.hops:
+        _REACT_SIGNATURES.clear()
+        cold, carie = _timed(lambda: Carie(max_hops=max_hops))
+        react = carie.generate_reasoning
+
+        eager, _ = _timed(
+            lambda: [
+                _generate_react_signature(
+                    tools=react.tools,
+                    input_fields=react.input_fields,
+                    hops=hop,
+                    instructions=react.instructions,
+                )
+                for hop in range(1, max_hops + 1)
+            ]
+        )
+        warm, _ = _timed(lambda: Carie(max_hops=max_hops))
+        copy, _ = _timed(carie.deepcopy)
+        compile, _ = _timed(carie.named_predictors)
+
+        print(
+            f"{max_hops:>5} {eager * 1000:>11.2f} {cold * 1000:>10.2f}"
+            f" {warm * 1000:>10.2f} {copy * 1000:>10.2f} {compile * 1000:>13.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
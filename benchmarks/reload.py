@@ -0,0 +1,71 @@
+"""Compares a full re-read of plants.json with applying an update log.
+
+Usage: python -m benchmarks.reload [--sizes 10000 100000] [--updates 0.01]
+"""
+
+from argparse import ArgumentParser
+from tempfile import TemporaryDirectory
+from time import perf_counter
+import json
+import os
+
+from plants import _apply_updates, _read_plants
+
+from benchmarks.fleet import synthetic_plants_json, synthetic_updates
+
+
+def _best_of(function, repeat: int) -> float:
+    timings = []
+
+    for _ in range(repeat):
+        start = perf_counter()
+        function()
+        timings.append(perf_counter() - start)
+
+    return min(timings)
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--updates", type=float, default=0.01)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(
+        f"{'store':<10} {'plants':>8} {'updates':>8} {'full (ms)':>10} {'incremental (ms)':>17}"
+    )
+
+    with TemporaryDirectory() as directory:
+        for n_plants in args.sizes:
+            plants_json = synthetic_plants_json(n_plants)
+            updates = synthetic_updates(
+                plants_json, max(1, int(n_plants * args.updates))
+            )
+            update_lines = [json.dumps(update) for update in updates]
+
+            file_path = os.path.join(directory, f"plants_{n_plants}.json")
+            with open(file_path, "w") as file:
+                json.dump(plants_json, file, indent=4)
+
+            for store in ("dataclass", "columnar"):
+                plants = _read_plants(store=store, file_path=file_path)
+
+                full = _best_of(
+                    lambda: _read_plants(store=store, file_path=file_path), args.repeat
+                )
+                incremental = _best_of(
+                    lambda: _apply_updates(
+                        plants, [json.loads(line) for line in update_lines]
+                    ),
+                    args.repeat,
+                )
+
+                print(
+                    f"{store:<10} {n_plants:>8} {len(updates):>8} "
+                    f"{full * 1000:>10.1f} {incremental * 1000:>17.1f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,366 @@
+"""A local stand-in for a vLLM server that replays scripted ReAct trajectories.
+
+It serves the OpenAI-compatible /v1/completions and /v1/chat/completions
+endpoints used by `dspy.HFClientVLLM`, sleeping to simulate latency. Planner
+prompts are answered with the thought and action of the matching example of
+storage/*.csv (or a generic script), and semantic similarity prompts with
+"true". Like vLLM, it honours `stop`, `max_tokens`, `stream` and
+`guided_regex`, and only prefills prompt blocks it has not seen before, as
+automatic prefix caching does. A request with a list of prompts takes as
+long as its slowest prompt, as batched generation roughly does.
+
+Usage: python -m benchmarks.stub_lm [--port 8000] [--latency 0.05]
+"""
+
+from argparse import ArgumentParser
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock, Thread
+from time import sleep
+from random import Random
+from zlib import crc32
+import json
+import re
+
+from carie.data import _load_sensor_csv
+
+_GENERIC_SCRIPT = [
+    ("We need to check the status of all plants", "list_plants[ ]"),
+    ("We know the status of all plants", "Finish[All plants were checked]"),
+]
+
+
+def _load_scripts() -> dict[str, list[tuple[str, str]]]:
+    scripts = {}
+
+    for row in _load_sensor_csv():
+        script = []
+
+        for hop in range(1, 4):
+            thought, action = row.get(f"Thought_{hop}"), row.get(f"Action_{hop}")
+
+            if not thought or not action:
+                break
+
+            script.append((thought, action))
+
+        if script:
+            scripts[row["task"].strip()] = script
+
+    return scripts
+
+
+def _garble(action: str) -> str:
+    # Either an unknown tool or no brackets around the arguments
+    if crc32(action.encode()) % 2:
+        return "use_" + action
+
+    return action.replace("[", " ").replace("]", "")
+
+
+def _count_tokens(text: str) -> int:
+    return len(text.split())
+
+
+def _tokenize(text: str) -> list[str]:
+    # Whitespace stays with the token before it, so prompts differing only in
+    # spacing do not share a prefix, as with real tokenizers
+    return re.findall(r"\s*\S+", text)
+
+
+class StubLM:
+    """Scripted completions plus the simulated cost of producing them.
+
+    Args:
+        latency: seconds spent on every request.
+        token_latency: seconds spent per generated token.
+        prefill_latency: seconds spent per prompt token missing from the
+            prefix cache.
+        ramble: keep generating made-up observations and later hops after the
+            action, as base models do, unless a stop sequence cuts them.
+        malformed_rate: share of actions garbled into unparseable ones, unless
+            a `guided_regex` rules them out. The same prompts get the same
+            garbling. Scripted completions a `guided_regex` does not match
+            are always garbled, and counted in `regex_mismatches`, so a
+            wrong regex fails to parse.
+        block_tokens: prompt tokens per prefix cache block.
+        max_blocks: prefix cache blocks kept, least recently used go first.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.05,
+        token_latency: float = 0.0,
+        prefill_latency: float = 0.0,
+        ramble: bool = True,
+        malformed_rate: float = 0.0,
+        block_tokens: int = 16,
+        max_blocks: int = 100_000,
+    ):
+        self.latency = latency
+        self.token_latency = token_latency
+        self.prefill_latency = prefill_latency
+        self.ramble = ramble
+        self.malformed_rate = malformed_rate
+        self.block_tokens = block_tokens
+        self.max_blocks = max_blocks
+        self.scripts = _load_scripts()
+        self.requests = 0
+        self.regex_mismatches = 0
+        self._blocks = OrderedDict()
+        self._lock = Lock()
+
+    def complete(self, prompt: str, parameters: dict) -> tuple[str, dict, float, float]:
+        """Answers one prompt.
+
+        Returns:
+            The completion, its OpenAI-style usage and the seconds to be
+            spent before its first token and on the rest of it.
+        """
+        with self._lock:
+            self.requests += 1
+
+        cached_tokens = self._cache_prefix(prompt)
+
+        if "Text 1:" in prompt:
+            text = " compare both texts.\n\nIs Semantically Similar: true"
+        else:
+            text = self._react_completion(prompt, parameters.get("guided_regex"))
+
+        text = self._cut(text, parameters)
+        usage = {
+            "prompt_tokens": len(_tokenize(prompt)),
+            "completion_tokens": _count_tokens(text),
+            "prompt_tokens_details": {"cached_tokens": cached_tokens},
+        }
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+
+        prefill_seconds = self.latency + self.prefill_latency * (
+            usage["prompt_tokens"] - cached_tokens
+        )
+        decode_seconds = self.token_latency * usage["completion_tokens"]
+        return text, usage, prefill_seconds, decode_seconds
+
+    def _cache_prefix(self, prompt: str) -> int:
+        """Counts prompt tokens in cached blocks, then caches every block."""
+        tokens = _tokenize(prompt)
+        block_hash = None
+        cached_tokens = 0
+        missed = False
+
+        with self._lock:
+            for start in range(
+                0, len(tokens) - self.block_tokens + 1, self.block_tokens
+            ):
+                block = tuple(tokens[start : start + self.block_tokens])
+                block_hash = hash((block_hash, block))
+
+                if not missed and block_hash in self._blocks:
+                    cached_tokens += self.block_tokens
+                    self._blocks.move_to_end(block_hash)
+                else:
+                    missed = True
+                    self._blocks[block_hash] = None
+
+            while len(self._blocks) > self.max_blocks:
+                self._blocks.popitem(last=False)
+
+        return cached_tokens
+
+    def clear_prefix_cache(self):
+        with self._lock:
+            self._blocks.clear()
+
+    def _react_completion(self, prompt: str, guided_regex: str = None) -> str:
+        query = prompt.split("\n---\n")[-1]
+        hops = re.findall(r"^Thought (\d+):", query, flags=re.MULTILINE)
+        hop = int(hops[-1]) if hops else 1
+        task = re.search(r"^Task: (.*)$", query, flags=re.MULTILINE)
+        script = self.scripts.get(
+            task.group(1).strip() if task else "", _GENERIC_SCRIPT
+        )
+        thought, action = script[min(hop, len(script)) - 1]
+
+        text = f" {thought}\n\nAction {hop}: {action}"
+
+        if guided_regex:
+            # Decoding could only produce text the regex matches, which the
+            # scripted completion must be
+            if re.fullmatch(guided_regex, text):
+                return text
+
+            with self._lock:
+                self.regex_mismatches += 1
+
+            return f" {thought}\n\nAction {hop}: {_garble(action)}"
+
+        if Random(crc32(prompt.encode())).random() < self.malformed_rate:
+            action = _garble(action)
+            text = f" {thought}\n\nAction {hop}: {action}"
+
+        if self.ramble and not action.startswith("Finish"):
+            text += (
+                f"\n\nObservation {hop}: The sensor reads as expected for this plant"
+                f"\n\nThought {hop + 1}: We know enough to answer the task"
+                f"\n\nAction {hop + 1}: Finish[Done]"
+            )
+
+        return text
+
+    @staticmethod
+    def _cut(text: str, parameters: dict) -> str:
+        stops = parameters.get("stop") or []
+
+        for stop in [stops] if isinstance(stops, str) else stops:
+            stop_index = text.find(stop)
+
+            if stop_index >= 0:
+                text = text[:stop_index]
+
+        max_tokens = parameters.get("max_tokens")
+
+        if max_tokens and _count_tokens(text) > max_tokens:
+            text = " ".join(text.split(" ")[: max_tokens + 1])
+
+        return text
+
+
+def _handler(stub_lm: StubLM):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length) or b"{}")
+            chat = self.path.endswith("/chat/completions")
+
+            if chat:
+                prompts = [
+                    "\n\n".join(
+                        message["content"] for message in payload.get("messages", [])
+                    )
+                ]
+            elif self.path.endswith("/completions"):
+                prompts = payload.get("prompt", "")
+                prompts = [prompts] if isinstance(prompts, str) else prompts
+            else:
+                self.send_error(404)
+                return
+
+            texts, usage = [], {}
+            prefill_seconds = decode_seconds = 0.0
+
+            for prompt in prompts:
+                text, prompt_usage, prompt_prefill, prompt_decode = stub_lm.complete(
+                    prompt, payload
+                )
+                texts.append(text)
+                # Prompts sent together are batched on the GPU, so a batch
+                # takes about as long as its slowest prompt
+                prefill_seconds = max(prefill_seconds, prompt_prefill)
+                decode_seconds = max(decode_seconds, prompt_decode)
+
+                for key, value in prompt_usage.items():
+                    if isinstance(value, dict):
+                        usage.setdefault(key, {})
+                        for detail, count in value.items():
+                            usage[key][detail] = usage[key].get(detail, 0) + count
+                    else:
+                        usage[key] = usage.get(key, 0) + value
+
+            sleep(prefill_seconds)
+
+            if payload.get("stream"):
+                self._stream(chat, texts, decode_seconds)
+                return
+
+            sleep(decode_seconds)
+            choices = [
+                (
+                    {"index": index, "message": {"role": "assistant", "content": text}}
+                    if chat
+                    else {"index": index, "text": text, "finish_reason": "stop"}
+                )
+                for index, text in enumerate(texts)
+            ]
+            body = json.dumps(
+                {"model": payload.get("model"), "choices": choices, "usage": usage}
+            ).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _stream(self, chat: bool, texts: list[str], decode_seconds: float):
+            # Server-sent events: the first token of every choice, then the rest
+            self.close_connection = True
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Connection", "close")
+            self.end_headers()
+
+            for part in range(2):
+                for index, text in enumerate(texts):
+                    tokens = _tokenize(text)
+                    delta = "".join(tokens[:1] if part == 0 else tokens[1:])
+                    choice = (
+                        {"index": index, "delta": {"content": delta}}
+                        if chat
+                        else {"index": index, "text": delta}
+                    )
+                    event = json.dumps({"choices": [choice]})
+                    self.wfile.write(f"data: {event}\n\n".encode())
+
+                self.wfile.flush()
+
+                if part == 0:
+                    sleep(decode_seconds)
+
+            self.wfile.write(b"data: [DONE]\n\n")
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+class _StubLMServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Many sessions connect at once, more than the default backlog of 5
+    request_queue_size = 256
+
+
+def start_stub_lm_server(
+    stub_lm: StubLM = None, port: int = 0
+) -> tuple[ThreadingHTTPServer, int]:
+    """Serves `stub_lm` from a daemon thread.
+
+    Args:
+        stub_lm: the scripted model, a default StubLM if None.
+        port: the port to listen on, any free port if 0.
+
+    Returns:
+        The running server and the port it listens on.
+    """
+    server = _StubLMServer(("127.0.0.1", port), _handler(stub_lm or StubLM()))
+    Thread(target=server.serve_forever, name="stub-lm", daemon=True).start()
+    return server, server.server_address[1]
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--token-latency", type=float, default=0.0)
+    parser.add_argument("--prefill-latency", type=float, default=0.0)
+    args = parser.parse_args()
+
+    stub_lm = StubLM(
+        latency=args.latency,
+        token_latency=args.token_latency,
+        prefill_latency=args.prefill_latency,
+    )
+    server = _StubLMServer(("127.0.0.1", args.port), _handler(stub_lm))
+    print(f"Stub LM listening on http://127.0.0.1:{server.server_address[1]}")
+    server.serve_forever()
@@ -0,0 +1,286 @@
+"""End-to-end latency and throughput of `Carie.forward` and `evaluate_carie`.
+
+Every scenario runs on synthetic fleets of each size, the plants of
+storage/plants.json plus Plant1, Plant2, ... from `benchmarks.fleet`:
+
+- sensors: the tasks of storage/*.csv, with their gold trajectories. The
+  stub LM answers them with those trajectories, and `evaluate_carie` scores
+  the predictions of the first fleet against them, from an empty judge
+  cache.
+- requests: the titles of requests.jsonl, free-form tasks with no script,
+  so the stub LM plans them with a generic one and the fast path misses.
+
+For each scenario, fleet and target, it reports p50/p95/p99 latency,
+tasks/s, hops per task, and the time split between LM requests, tools and
+parsing. Parsing is the rest of the time spent on tasks: rendering prompts,
+parsing completions and actions, routing and compressing trajectories, and,
+with --concurrency, waiting for threads. LM and tool seconds are summed over
+threads, as tasks and judges run at once.
+
+LM requests go to a stub LM server, so no GPU is needed; give --port of a
+vLLM server to measure the real thing. --output writes every result as
+JSON, for regression tracking.
+
+Usage: python -m benchmarks.suite [--sizes 0 1000 10000] [--tasks 64] [--output suite.json]
+"""
+
+import os
+import tempfile
+
+# The LM disk cache and the judge cache of earlier runs would answer prompts
+# without any latency
+os.environ.setdefault("DSP_CACHEBOOL", "false")
+os.environ.setdefault(
+    "JUDGE_CACHE_FILE_PATH",
+    os.path.join(tempfile.mkdtemp(prefix="carie-suite-"), "judge.sqlite"),
+)
+
+from argparse import ArgumentParser, BooleanOptionalAction
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from itertools import cycle, islice
+from time import perf_counter
+import json
+import platform
+
+import dspy
+import numpy as np
+from dspy import Example
+
+from carie.data import _load_sensor_csv
+from carie.lm import get_lm, lm_stats, reset_lm_stats
+from carie.metrics import evaluate_carie
+from carie.programs import Carie
+from carie.tools import reset_tool_time_stats, tool_time_stats
+from config import CARIE_FAST_PATH
+from plants import apply_plant_updates, reload_plants
+
+from benchmarks.fleet import synthetic_plants_json
+from benchmarks.stub_lm import StubLM, start_stub_lm_server
+
+
+def _sensor_examples() -> list[Example]:
+    return [Example(row).with_inputs("task") for row in _load_sensor_csv()]
+
+
+def _request_examples(file_path: str) -> list[Example]:
+    if not os.path.exists(file_path):
+        return []
+
+    with open(file_path) as file:
+        requests = [json.loads(line) for line in file if line.strip()]
+
+    return [
+        Example(task=request["title"]).with_inputs("task")
+        for request in requests
+        if request.get("title")
+    ]
+
+
+def _use_fleet(n_plants: int):
+    # The plants of plants.json, plus the synthetic ones
+    reload_plants(force=True)
+
+    if n_plants:
+        apply_plant_updates(synthetic_plants_json(n_plants))
+
+
+def _hops(prediction) -> int:
+    return sum(1 for step_name in prediction if "thought" in step_name.lower())
+
+
+def _measure(function, items: list, concurrency: int) -> dict:
+    """Calls `function` on every item from `concurrency` threads, timing each call.
+
+    Returns:
+        The results of the calls, their latencies, the wall seconds of the
+        run, and the LM requests made and LM and tool seconds spent meanwhile.
+    """
+
+    def timed(item):
+        start = perf_counter()
+        result = function(item)
+        return result, perf_counter() - start
+
+    reset_lm_stats()
+    reset_tool_time_stats()
+    start = perf_counter()
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        timed_results = list(executor.map(timed, items))
+
+    seconds = perf_counter() - start
+    lm = lm_stats()
+
+    return {
+        "results": [result for result, _ in timed_results],
+        "latencies": [latency for _, latency in timed_results],
+        "seconds": seconds,
+        "lm_requests": lm["requests"],
+        "lm_seconds": lm["seconds"],
+        "tool_seconds": sum(times["seconds"] for times in tool_time_stats().values()),
+    }
+
+
+def _report(scenario: str, n_plants: int, target: str, run: dict, hops: list) -> dict:
+    latencies = np.array(run["latencies"])
+    task_seconds = float(latencies.sum())
+    lm_seconds = run["lm_seconds"]
+    tool_seconds = run["tool_seconds"]
+    # LM and tool seconds overlap when calls run at once within a task
+    parsing_seconds = max(task_seconds - lm_seconds - tool_seconds, 0.0)
+    split_seconds = max(lm_seconds + tool_seconds + parsing_seconds, 1e-9)
+
+    return {
+        "scenario": scenario,
+        "plants": n_plants,
+        "target": target,
+        "tasks": len(latencies),
+        "seconds": run["seconds"],
+        "tasks_per_second": len(latencies) / run["seconds"],
+        "latency": {
+            f"p{percentile}": float(np.percentile(latencies, percentile))
+            for percentile in (50, 95, 99)
+        },
+        "hops_per_task": sum(hops) / len(hops) if hops else None,
+        "lm_requests": run["lm_requests"],
+        "time_split": {
+            "lm": lm_seconds / split_seconds,
+            "tools": tool_seconds / split_seconds,
+            "parsing": parsing_seconds / split_seconds,
+        },
+        "time_seconds": {
+            "lm": lm_seconds,
+            "tools": tool_seconds,
+            "parsing": parsing_seconds,
+        },
+    }
+
+
+def _print_header():
+    print(
+        f"{'scenario':<9} {'plants':>7} {'target':<15} {'tasks':>6} {'tasks/s':>8}"
+        f" {'p50 (ms)':>9} {'p95 (ms)':>9} {'p99 (ms)':>9} {'hops':>5}"
+        f" {'LM %':>5} {'tools %':>8} {'parsing %':>10}"
+    )
+
+
+def _print_result(result: dict):
+    latency = result["latency"]
+    split = result["time_split"]
+    hops = result["hops_per_task"]
+    print(
+        f"{result['scenario']:<9} {result['plants']:>7} {result['target']:<15}"
+        f" {result['tasks']:>6} {result['tasks_per_second']:>8.1f}"
+        f" {latency['p50'] * 1000:>9.1f} {latency['p95'] * 1000:>9.1f}"
+        f" {latency['p99'] * 1000:>9.1f} {'-' if hops is None else f'{hops:.2f}':>5}"
+        f" {split['lm'] * 100:>5.0f} {split['tools'] * 100:>8.0f}"
+        f" {split['parsing'] * 100:>10.0f}"
+    )
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[0, 1000, 10_000])
+    parser.add_argument("--tasks", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--token-latency", type=float, default=0.0)
+    parser.add_argument("--prefill-latency", type=float, default=0.0)
+    parser.add_argument(
+        "--port", type=int, help="of a vLLM server, instead of the stub"
+    )
+    parser.add_argument(
+        "--fast-path", action=BooleanOptionalAction, default=CARIE_FAST_PATH
+    )
+    parser.add_argument("--requests-file", default="requests.jsonl")
+    parser.add_argument("--output", help="JSON file the results are written to")
+    args = parser.parse_args()
+
+    server = None
+    port = args.port
+
+    if port is None:
+        server, port = start_stub_lm_server(
+            StubLM(
+                latency=args.latency,
+                token_latency=args.token_latency,
+                prefill_latency=args.prefill_latency,
+            )
+        )
+
+    dspy.settings.configure(lm=get_lm(port=port))
+    lm = dspy.settings.lm
+
+    scenarios = {
+        "sensors": _sensor_examples(),
+        "requests": _request_examples(args.requests_file),
+    }
+    carie = Carie(fast_path=args.fast_path)
+    results = []
+
+    _print_header()
+
+    for n_plants in args.sizes:
+        _use_fleet(n_plants)
+
+        for scenario, examples in scenarios.items():
+            if not examples:
+                continue
+
+            examples = list(islice(cycle(examples), args.tasks))
+
+            def forward(example):
+                # Pool threads start from the main settings
+                with dspy.settings.context(lm=lm, trace=None):
+                    return carie(**example.inputs())
+
+            run = _measure(forward, examples, args.concurrency)
+            predictions = run["results"]
+            result = _report(
+                scenario,
+                n_plants,
+                "Carie.forward",
+                run,
+                [_hops(p) for p in predictions],
+            )
+            results.append(result)
+            _print_result(result)
+
+            # Only the tasks of storage/*.csv have gold trajectories to score
+            # against. Scores do not depend on the fleet, and later fleets
+            # would hit the judge cache, so they are measured once.
+            if scenario != "sensors" or n_plants != args.sizes[0]:
+                continue
+
+            def evaluate(pair):
+                with dspy.settings.context(lm=lm, trace=None):
+                    return evaluate_carie(*pair)
+
+            run = _measure(evaluate, list(zip(examples, predictions)), args.concurrency)
+            result = _report(scenario, n_plants, "evaluate_carie", run, hops=[])
+            result["score"] = float(np.mean(run["results"]))
+            results.append(result)
+            _print_result(result)
+
+    if server is not None:
+        server.shutdown()
+
+    if args.output:
+        report = {
+            "created": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "arguments": vars(args),
+            "results": results,
+        }
+
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
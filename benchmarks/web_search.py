@@ -0,0 +1,76 @@
+"""Compares serial and hedged web searches over offline fixture backends.
+
+The primary backend answers every query of storage/web_search_fixture.json
+slowly, sometimes past the timeout, or not at all; the secondary one answers
+them quickly. Serial search only tries the secondary after the primary
+failed or timed out, hedged search starts it after the hedge delay.
+
+Usage: python -m benchmarks.web_search [--primary-latency 1.0] [--timeout 0.5]
+"""
+
+from argparse import ArgumentParser
+from time import perf_counter
+import json
+
+import numpy as np
+
+from carie.search import FixtureBackend, _SEARCH_STATS, search, web_search_stats
+
+_FIXTURE_FILE_PATH = "./storage/web_search_fixture.json"
+
+
+def main():
+    parser = ArgumentParser()
+    parser.add_argument("--primary-latency", type=float, default=1.0)
+    parser.add_argument("--secondary-latency", type=float, default=0.1)
+    parser.add_argument("--timeout", type=float, default=0.5)
+    parser.add_argument("--hedge-delay", type=float, default=0.2)
+    args = parser.parse_args()
+
+    with open(_FIXTURE_FILE_PATH) as file:
+        queries = list(json.load(file))
+
+    secondary = FixtureBackend(_FIXTURE_FILE_PATH, latency=args.secondary_latency)
+    primaries = {
+        "fast": FixtureBackend(_FIXTURE_FILE_PATH, latency=args.secondary_latency),
+        "slow": FixtureBackend(_FIXTURE_FILE_PATH, latency=args.primary_latency),
+        "dead": FixtureBackend(_FIXTURE_FILE_PATH, fail=True),
+    }
+
+    print(
+        f"{'primary':<8} {'mode':<7} {'searches':>9} {'answered':>9}"
+        f" {'p50 (ms)':>9} {'max (ms)':>9}  backends"
+    )
+
+    for primary_name, primary in primaries.items():
+        for hedged in (False, True):
+            _SEARCH_STATS.clear()
+            latencies, answered = [], 0
+
+            for query in queries:
+                start = perf_counter()
+                results = search(
+                    query,
+                    backends=[("primary", primary), ("secondary", secondary)],
+                    hedged=hedged,
+                    timeout=args.timeout,
+                    hedge_delay=args.hedge_delay,
+                )
+                latencies.append(perf_counter() - start)
+                answered += bool(results)
+
+            stats = {
+                name: count
+                for name, count in web_search_stats().items()
+                if name != "cache"
+            }
+            print(
+                f"{primary_name:<8} {'hedged' if hedged else 'serial':<7}"
+                f" {len(queries):>9} {answered:>9}"
+                f" {np.percentile(latencies, 50) * 1000:>9.1f}"
+                f" {max(latencies) * 1000:>9.1f}  {stats}"
+            )
+
+
+if __name__ == "__main__":
+    main()
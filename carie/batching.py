@@ -0,0 +1,145 @@
+from collections import Counter
+from concurrent.futures import Future
+from threading import Event, Lock
+from time import monotonic
+import json
+
+# Batches sent by size, and seconds batches were kept open
+_BATCH_SIZES = Counter()
+_BATCH_WAIT = Counter()
+_BATCH_STATS_LOCK = Lock()
+
+
+def batch_stats() -> dict:
+    """Reports how many completion requests were sent together.
+
+    Returns:
+        Batches and requests sent, the mean batch size, the mean seconds a
+        batch was kept open, and the histogram of batch sizes.
+    """
+    with _BATCH_STATS_LOCK:
+        histogram = dict(sorted(_BATCH_SIZES.items()))
+        wait = _BATCH_WAIT["seconds"]
+
+    batches = sum(histogram.values())
+    requests = sum(size * count for size, count in histogram.items())
+
+    return {
+        "batches": batches,
+        "requests": requests,
+        "mean_batch_size": requests / batches if batches else 0.0,
+        "mean_window": wait / batches if batches else 0.0,
+        "histogram": histogram,
+    }
+
+
+def reset_batch_stats():
+    with _BATCH_STATS_LOCK:
+        _BATCH_SIZES.clear()
+        _BATCH_WAIT.clear()
+
+
+class _Batch:
+    def __init__(self):
+        self.prompts = []
+        self.futures = []
+        self.full = Event()
+        self.opened_at = monotonic()
+
+
+class MicroBatcher:
+    """Sends concurrent completion requests with the same parameters as one.
+
+    The first request of a batch waits up to `window` seconds, or until
+    `max_batch_size` requests joined, then sends every prompt in one request
+    and hands each caller the choices of its prompt. Requests with other
+    parameters go in other batches.
+
+    Args:
+        send: sends a completion payload whose "prompt" is a list of prompts
+            and returns its choices, each with the "index" OpenAI-compatible
+            servers give it.
+        window: seconds a batch is kept open for more requests.
+        max_batch_size: prompts sent in one request at most.
+    """
+
+    def __init__(self, send, window: float, max_batch_size: int):
+        self.send = send
+        self.window = window
+        self.max_batch_size = max_batch_size
+        self._batches = {}
+        self._lock = Lock()
+
+    def submit(self, payload: dict) -> list[dict]:
+        """Completes `payload`, whose "prompt" is a single prompt.
+
+        Returns:
+            The choices of that prompt.
+        """
+        parameters = {
+            name: value for name, value in payload.items() if name != "prompt"
+        }
+        key = json.dumps(parameters, sort_keys=True, default=str)
+        future = Future()
+
+        with self._lock:
+            batch = self._batches.get(key)
+            leader = batch is None
+
+            if leader:
+                batch = self._batches[key] = _Batch()
+
+            batch.prompts.append(payload["prompt"])
+            batch.futures.append(future)
+
+            if len(batch.prompts) >= self.max_batch_size:
+                del self._batches[key]
+                batch.full.set()
+
+        if leader:
+            batch.full.wait(self.window)
+
+            with self._lock:
+                if self._batches.get(key) is batch:
+                    del self._batches[key]
+
+            self._send(batch, parameters)
+
+        return future.result()
+
+    def _send(self, batch: _Batch, parameters: dict):
+        with _BATCH_STATS_LOCK:
+            _BATCH_SIZES[len(batch.prompts)] += 1
+            _BATCH_WAIT["seconds"] += monotonic() - batch.opened_at
+
+        try:
+            choices = self.send({**parameters, "prompt": batch.prompts})
+        except Exception as exception:
+            for future in batch.futures:
+                future.set_exception(exception)
+            return
+
+        # Servers give prompt i the choices i * n to i * n + n - 1
+        n = parameters.get("n") or 1
+        choices = sorted(choices, key=lambda choice: choice.get("index", 0))
+
+        for index, future in enumerate(batch.futures):
+            future.set_result(choices[index * n : (index + 1) * n])
+
+
+# Batchers shared by every client, and client copy, of the same servers
+_BATCHERS = {}
+_BATCHERS_LOCK = Lock()
+
+
+def get_batcher(key, send, window: float, max_batch_size: int) -> MicroBatcher:
+    """Gets the batcher of `key`, creating it with the other arguments on first use."""
+    key = (key, window, max_batch_size)
+
+    with _BATCHERS_LOCK:
+        batcher = _BATCHERS.get(key)
+
+        if batcher is None:
+            batcher = _BATCHERS[key] = MicroBatcher(send, window, max_batch_size)
+
+    return batcher
@@ -0,0 +1,176 @@
+from collections import OrderedDict
+from threading import Lock
+from time import monotonic, time
+import json
+import os
+import sqlite3
+
+
+class SQLiteCache:
+    """Persistent key-value cache with least-recently-used eviction.
+
+    Values are stored as JSON, optionally with an expiry time. One connection
+    is shared by all threads behind a lock; separate processes may share the
+    same file, as SQLite does the locking between them.
+    """
+
+    def __init__(self, file_path: str, max_entries: int = 100_000):
+        self.file_path = file_path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        directory = os.path.dirname(file_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = Lock()
+        self._connection = sqlite3.connect(
+            file_path, check_same_thread=False, isolation_level=None
+        )
+        self._connection.executescript("""
+            PRAGMA journal_mode = WAL;
+            CREATE TABLE IF NOT EXISTS cache (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                expires_at REAL,
+                last_used REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS cache_last_used ON cache (last_used);
+            """)
+        self._size = self._count()
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hit_rate,
+            "entries": self._size,
+        }
+
+    def get(self, key: str, default=None):
+        now = time()
+
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT value, expires_at FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row is None or (row[1] is not None and row[1] <= now):
+                self.misses += 1
+                return default
+
+            self._connection.execute(
+                "UPDATE cache SET last_used = ? WHERE key = ?", (now, key)
+            )
+            self.hits += 1
+
+        return json.loads(row[0])
+
+    def set(self, key: str, value, ttl: float = None):
+        now = time()
+        expires_at = now + ttl if ttl is not None else None
+
+        with self._lock:
+            cursor = self._connection.execute(
+                "INSERT OR IGNORE INTO cache VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), expires_at, now),
+            )
+
+            if cursor.rowcount:
+                self._size += 1
+            else:
+                self._connection.execute(
+                    "UPDATE cache SET value = ?, expires_at = ?, last_used = ? WHERE key = ?",
+                    (json.dumps(value), expires_at, now, key),
+                )
+
+            if self._size > self.max_entries:
+                self._evict()
+
+    def _evict(self):
+        # Expired entries go first, then the least recently used ones until a
+        # tenth of the room is free, so eviction does not run on every insert
+        self._connection.execute(
+            "DELETE FROM cache WHERE expires_at IS NOT NULL AND expires_at <= ?",
+            (time(),),
+        )
+        self._connection.execute(
+            """
+            DELETE FROM cache WHERE key IN (
+                SELECT key FROM cache ORDER BY last_used LIMIT
+                    MAX(0, (SELECT COUNT(*) FROM cache) - ?)
+            )
+            """,
+            (self.max_entries * 9 // 10,),
+        )
+        self._size = self._count()
+
+    def _count(self) -> int:
+        return self._connection.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+    def clear(self):
+        with self._lock:
+            self._connection.execute("DELETE FROM cache")
+            self._size = 0
+
+
+class TTLCache:
+    """In-memory key-value cache with expiring entries and LRU eviction.
+
+    Entries may carry a version, e.g. of the data they were computed from;
+    lookups for another version miss, so stale entries need no explicit
+    invalidation and are evicted in time.
+    """
+
+    def __init__(self, max_entries: int = 10_000):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = Lock()
+        # key -> (value, expires_at, version), least recently used first
+        self._entries = OrderedDict()
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hit_rate,
+            "entries": len(self._entries),
+        }
+
+    def get(self, key, default=None, version=None):
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is None or entry[1] <= monotonic() or entry[2] != version:
+                self.misses += 1
+                return default
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+
+        return entry[0]
+
+    def set(self, key, value, ttl: float, version=None):
+        with self._lock:
+            self._entries[key] = (value, monotonic() + ttl, version)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,163 @@
+from hashlib import sha256
+from threading import Lock
+import json
+import os
+
+from config import LM_CASSETTE_FALL_THROUGH, LM_CASSETTE_FILE_PATH, LM_CASSETTE_MODE
+
+_MODES = ("off", "record", "replay")
+
+
+class CassetteMissError(Exception):
+    pass
+
+
+def cassette_key(request: dict) -> str:
+    """Hashes an LM request, e.g. its model, prompt and sampling parameters.
+
+    Keys are canonical: they do not depend on the order of the parameters.
+    """
+    request_json = json.dumps(
+        request, sort_keys=True, separators=(",", ":"), default=str
+    )
+    return sha256(request_json.encode()).hexdigest()
+
+
+class Cassette:
+    """Append-only JSONL store of LM responses, keyed by `cassette_key`.
+
+    In "record" mode every request is sent to the LM and its response
+    appended. In "replay" mode recorded responses are served without the
+    LM; a request missing from the cassette raises CassetteMissError, or,
+    with `fall_through`, is sent to the LM and recorded. The file is only
+    ever appended to, one line per response, so runs can be recorded in
+    several goes, and a line cut short by a crash is skipped when loading.
+
+    Args:
+        file_path: the JSONL file, created if missing.
+        mode: either "record" or "replay".
+        fall_through: send misses to the LM while replaying.
+    """
+
+    def __init__(
+        self, file_path: str, mode: str = "replay", fall_through: bool = False
+    ):
+        if mode not in _MODES[1:]:
+            raise ValueError(f"Cassette mode must be record or replay, not `{mode}`")
+
+        self.file_path = file_path
+        self.mode = mode
+        self.fall_through = fall_through
+        self.hits = 0
+        self.misses = 0
+        self.recorded = 0
+        self._lock = Lock()
+        self._responses = {}
+
+        directory = os.path.dirname(file_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        ends_with_newline = True
+
+        if os.path.exists(file_path):
+            with open(file_path) as file:
+                for line in file:
+                    ends_with_newline = line.endswith("\n")
+
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+
+                    self._responses[entry["key"]] = entry["choices"]
+
+        self._file = open(file_path, "a")
+
+        # A line cut short by a crash must not swallow the next response
+        if not ends_with_newline:
+            self._file.write("\n")
+
+    def stats(self) -> dict:
+        return {
+            "mode": self.mode,
+            "hits": self.hits,
+            "misses": self.misses,
+            "recorded": self.recorded,
+            "entries": len(self._responses),
+        }
+
+    def play(self, request: dict, send) -> list[dict]:
+        """Gets the choices of `request`, from the cassette or from `send()`.
+
+        Raises:
+            CassetteMissError: if replaying without `fall_through` and
+                `request` was never recorded.
+        """
+        key = cassette_key(request)
+
+        if self.mode == "replay":
+            with self._lock:
+                choices = self._responses.get(key)
+
+                if choices is not None:
+                    self.hits += 1
+                    return choices
+
+                self.misses += 1
+
+            if not self.fall_through:
+                raise CassetteMissError(
+                    f"LM request {key[:12]} is not in {self.file_path}. Record it or "
+                    "set LM_CASSETTE_FALL_THROUGH=true to send misses to the LM."
+                )
+
+        choices = send()
+        line = json.dumps({"key": key, "choices": choices}, separators=(",", ":"))
+
+        with self._lock:
+            # Recording the same response again would only grow the file
+            if self._responses.get(key) == choices:
+                return choices
+
+            self._responses[key] = choices
+            self._file.write(line + "\n")
+            self._file.flush()
+            self.recorded += 1
+
+        return choices
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+_CASSETTE = None
+_CASSETTE_LOCK = Lock()
+
+
+def get_cassette() -> Cassette | None:
+    """Gets the cassette LM clients play through, None if there is none.
+
+    Unless `set_cassette` was called, it is configured by LM_CASSETTE_MODE,
+    LM_CASSETTE_FILE_PATH and LM_CASSETTE_FALL_THROUGH.
+    """
+    global _CASSETTE
+
+    with _CASSETTE_LOCK:
+        if _CASSETTE is None and LM_CASSETTE_MODE != "off":
+            _CASSETTE = Cassette(
+                LM_CASSETTE_FILE_PATH,
+                mode=LM_CASSETTE_MODE,
+                fall_through=LM_CASSETTE_FALL_THROUGH,
+            )
+
+    return _CASSETTE
+
+
+def set_cassette(cassette: Cassette | None):
+    """Makes LM clients play through `cassette`, or the configured one if None."""
+    global _CASSETTE
+
+    with _CASSETTE_LOCK:
+        _CASSETTE = cassette
@@ -1,5 +1,5 @@
 from csv import DictReader
-from random import shuffle
+from random import Random
 
 from dspy import Example
 
@@ -48,13 +48,18 @@ def _load_sensor_csv(file_names: list[str] = None):
         yield from _read_csv(file_path=file_path)
 
 
-def split(rows: list, test_size: float = 0.3):
+def split(rows: list, test_size: float = 0.3, random: Random = None):
     n_test = int(len(rows) * test_size)
-    shuffle(rows)
+    (random or Random()).shuffle(rows)
     return rows[:n_test], rows[n_test:]
 
 
-def load_examples(n_examples: int = None, test_size: float = 0.3):
+def load_examples(n_examples: int = None, test_size: float = 0.3, seed: int = None):
+    """Splits the examples of storage/*.csv into train, validation and test sets.
+
+    The same `seed` always gives the same sets, a random split is made if None.
+    """
+    random = Random(seed)
     rows = list(_load_sensor_csv())
     # rows = list(_load_prototype_examples())
     n_examples = n_examples or len(rows)
@@ -64,8 +69,8 @@ def load_examples(n_examples: int = None, test_size: float = 0.3):
             f"Not enough examples. Desired {n_examples}, actual {len(rows)}"
         )
 
-    trainset, testset = split(rows, test_size=test_size)
-    valset, testset = split(testset, test_size=0.5)
+    trainset, testset = split(rows, test_size=test_size, random=random)
+    valset, testset = split(testset, test_size=0.5, random=random)
 
     trainset = [Example(row).with_inputs("task") for row in trainset]
     valset = [Example(row).with_inputs("task") for row in valset]
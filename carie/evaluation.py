@@ -0,0 +1,216 @@
+from hashlib import sha256
+from queue import Queue
+from threading import Thread
+from time import perf_counter
+import json
+import logging
+import os
+
+import dspy
+import tqdm
+
+from carie.metrics import score_carie_batch
+from config import EVAL_QUEUE_SIZE, EVAL_WORKERS
+
+_LOGGER = logging.getLogger(__name__)
+
+# Put after the last example for every worker, and by every worker once done
+_DONE = object()
+
+
+def example_key(example) -> str:
+    """Hashes an example, its task and gold fields alike, to find its result."""
+    example_json = json.dumps(example.toDict(), sort_keys=True, default=str)
+    return sha256(example_json.encode()).hexdigest()
+
+
+def examples_key(examples: list) -> str:
+    """Hashes a set of examples, whatever their order."""
+    keys = sorted(example_key(example) for example in examples)
+    return sha256("".join(keys).encode()).hexdigest()
+
+
+def load_run(dir_path: str) -> dict:
+    """Loads the settings saved by `save_run` in a run directory, empty if none."""
+    try:
+        with open(os.path.join(dir_path, "run.json")) as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {}
+
+
+def save_run(dir_path: str, run: dict):
+    """Saves the settings of a run, e.g. its seed, so resuming it can reuse them."""
+    os.makedirs(dir_path, exist_ok=True)
+
+    with open(os.path.join(dir_path, "run.json"), "w") as file:
+        json.dump(run, file, indent=2)
+
+
+def load_results(file_path: str) -> dict[str, dict]:
+    """Loads the results of an evaluation file by example key.
+
+    Lines cut short by a crash are skipped, so their examples are run again.
+    """
+    results = {}
+
+    if not os.path.exists(file_path):
+        return results
+
+    with open(file_path) as file:
+        for line in file:
+            try:
+                result = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+
+            results[result["key"]] = result
+
+    return results
+
+
+def run_evaluation(
+    program,
+    examples: list,
+    file_path: str,
+    workers: int = EVAL_WORKERS,
+    queue_size: int = EVAL_QUEUE_SIZE,
+    display_progress: bool = True,
+) -> float:
+    """Evaluates `program` on `examples`, streaming every result to a JSONL file.
+
+    Examples are run and scored by `workers` threads. As soon as an example
+    is scored, a line is appended to `file_path` with its prediction, its
+    thought, action and result scores, its hops and its latency. Examples
+    already in the file are not run again, so an evaluation cut short is
+    resumed by running it again with the same file. Examples that fail are
+    logged and left out of the file, to be retried by the next run.
+
+    Args:
+        program: the program to evaluate, shared by the workers.
+        examples: gold examples, with "task" as input.
+        file_path: the JSONL results file, created if missing.
+        workers: examples run at once.
+        queue_size: examples waiting for a worker, and results waiting to be
+            written, at most.
+        display_progress: show a progress bar.
+
+    Returns:
+        The mean score of the examples with a result, as a percentage, as
+        `Evaluate` gives it.
+    """
+    results = load_results(file_path)
+    keys = [example_key(example) for example in examples]
+    pending = {
+        key: example for key, example in zip(keys, examples) if key not in results
+    }
+    workers = max(1, min(workers, len(pending)))
+
+    examples_queue = Queue(maxsize=queue_size)
+    results_queue = Queue(maxsize=queue_size)
+    lm = dspy.settings.lm
+
+    def feed():
+        for key, example in pending.items():
+            examples_queue.put((key, example))
+
+        for _ in range(workers):
+            examples_queue.put(_DONE)
+
+    def work():
+        # Worker threads start from the main settings, not the caller's ones
+        with dspy.settings.context(lm=lm, trace=None):
+            while (item := examples_queue.get()) is not _DONE:
+                results_queue.put(_run_example(program, *item))
+
+        results_queue.put(_DONE)
+
+    threads = [Thread(target=feed, daemon=True)]
+    threads += [
+        Thread(target=work, name=f"evaluation-{index}", daemon=True)
+        for index in range(workers)
+    ]
+
+    for thread in threads:
+        thread.start()
+
+    directory = os.path.dirname(file_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    progress = tqdm.tqdm(
+        total=len(set(keys)),
+        initial=len(set(keys)) - len(pending),
+        dynamic_ncols=True,
+        disable=not display_progress,
+    )
+    failed = 0
+    finished_workers = 0
+
+    with open(file_path, "a") as file:
+        # A line cut short by a crash must not swallow the next result
+        if file.tell() and not _ends_with_newline(file_path):
+            file.write("\n")
+
+        while finished_workers < workers:
+            result = results_queue.get()
+
+            if result is _DONE:
+                finished_workers += 1
+                continue
+
+            if "error" in result:
+                failed += 1
+                _LOGGER.error(
+                    "Example %s failed: %s", result["key"][:12], result["error"]
+                )
+                continue
+
+            results[result["key"]] = result
+            file.write(json.dumps(result, default=str) + "\n")
+            file.flush()
+            progress.update()
+
+    progress.close()
+
+    scores = [results[key]["scores"]["score"] for key in keys if key in results]
+
+    if failed:
+        _LOGGER.warning(
+            "%d of %d examples failed, run again with %s to retry them",
+            failed,
+            len(pending),
+            file_path,
+        )
+
+    if not scores:
+        return 0.0
+
+    return round(100 * sum(scores) / len(scores), 2)
+
+
+def _ends_with_newline(file_path: str) -> bool:
+    with open(file_path, "rb") as file:
+        file.seek(-1, os.SEEK_END)
+        return file.read(1) == b"\n"
+
+
+def _run_example(program, key: str, example) -> dict:
+    start = perf_counter()
+
+    try:
+        prediction = program(**example.inputs())
+        latency = perf_counter() - start
+        scores = score_carie_batch([example], [prediction])[0]
+    except Exception as exception:
+        return {"key": key, "error": f"{type(exception).__name__}: {exception}"}
+
+    return {
+        "key": key,
+        "task": example.task,
+        "prediction": prediction.toDict(),
+        "scores": scores,
+        "hops": sum(1 for step_name in prediction if "thought" in step_name.lower()),
+        "latency": latency,
+        "scoring_latency": perf_counter() - start - latency,
+    }
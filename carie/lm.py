@@ -1,10 +1,275 @@
+from collections import Counter
+from functools import partial
+from threading import Lock
+from time import perf_counter
+
 import dspy
+from dsp.modules.cache_utils import CacheMemory
+from dsp.modules.hf_client import send_hfvllm_request_v01_wrapped
+
+from config import LM_BATCH_MAX_SIZE, LM_BATCH_WINDOW_MS, LM_ENDPOINTS
+from .batching import get_batcher
+from .cassette import get_cassette
+from .pool import EndpointPool, get_pool
 
 _MISTRAL_INSTRUCT = "mistralai/Mistral-7B-Instruct-v0.2"
 _MISTRAL = "mistralai/Mistral-7B-v0.1"
 _ORCA = "microsoft/Orca-2-7b"
 
+# Sampling parameters of vLLM that HFClientVLLM drops from its requests
+_GUIDED_DECODING_PARAMETERS = (
+    "guided_regex",
+    "guided_grammar",
+    "guided_choice",
+    "guided_decoding_backend",
+)
+# Sampling parameters HFClientVLLM sends, as listed in HFClientVLLM._generate,
+# so the requests these clients send themselves sample the same way
+_SAMPLING_PARAMETERS = (
+    "n",
+    "best_of",
+    "presence_penalty",
+    "frequency_penalty",
+    "repetition_penalty",
+    "temperature",
+    "top_p",
+    "top_k",
+    "min_p",
+    "seed",
+    "use_beam_search",
+    "length_penalty",
+    "early_stopping",
+    "stop",
+    "stop_token_ids",
+    "include_stop_str_in_output",
+    "ignore_eos",
+    "max_tokens",
+    "min_tokens",
+    "logprobs",
+    "prompt_logprobs",
+    "detokenize",
+    "skip_special_tokens",
+    "spaces_between_special_tokens",
+    "logits_processors",
+    "truncate_prompt_tokens",
+)
+# Client settings kept in `kwargs`, so LM copies keep them, but never sent
+_CLIENT_SETTINGS = ("url", "port", "batch_window", "max_batch_size")
+
+
+# LM requests, replayed ones included, and seconds waited on them by callers
+_LM_STATS = Counter()
+_LM_STATS_LOCK = Lock()
+
+
+def lm_stats() -> dict:
+    """Counts LM requests and the seconds spent on them, summed over threads."""
+    with _LM_STATS_LOCK:
+        return {"requests": _LM_STATS["requests"], "seconds": _LM_STATS["seconds"]}
+
+
+def reset_lm_stats():
+    with _LM_STATS_LOCK:
+        _LM_STATS.clear()
+
+
+def _parameters(kwargs: dict) -> dict:
+    parameters = {name: kwargs[name] for name in _SAMPLING_PARAMETERS if name in kwargs}
+    parameters.update(
+        (name, kwargs[name])
+        for name in _GUIDED_DECODING_PARAMETERS
+        if kwargs.get(name) is not None
+    )
+    return parameters
+
+
+class GuidedHFClientVLLM(dspy.HFClientVLLM):
+    """HFClientVLLM that also sends vLLM guided decoding parameters.
+
+    With a `batch_window` (seconds) completion requests made at once by
+    several threads are sent together, up to `max_batch_size` of them, see
+    `MicroBatcher`. Batching changes nothing sent per prompt: only requests
+    with the same sampling parameters, those HFClientVLLM sends, are joined. Requests without guided decoding parameters or batching,
+    and chat requests, are left to HFClientVLLM. Every request is recorded
+    in, or replayed from, the cassette of `get_cassette`, if there is one.
+    """
+
+    def basic_request(self, prompt, **kwargs):
+        start = perf_counter()
+
+        try:
+            return self._play(prompt, **kwargs)
+        finally:
+            with _LM_STATS_LOCK:
+                _LM_STATS["requests"] += 1
+                _LM_STATS["seconds"] += perf_counter() - start
+
+    def _play(self, prompt, **kwargs):
+        cassette = get_cassette()
+
+        if cassette is None:
+            return super().basic_request(prompt, **kwargs)
+
+        all_kwargs = {**self.kwargs, **kwargs}
+        request = {
+            "model": self.kwargs["model"],
+            "model_type": self.model_type,
+            "prompt": prompt,
+            "system_prompt": all_kwargs.get("system_prompt"),
+            **_parameters(all_kwargs),
+        }
+        choices = cassette.play(
+            request, lambda: self._generate(prompt, **kwargs)["choices"]
+        )
+        response = {"prompt": prompt, "choices": choices}
+        self.history.append(
+            {
+                "prompt": prompt,
+                "response": response,
+                "kwargs": all_kwargs,
+                "raw_kwargs": kwargs,
+            }
+        )
+        return response
+
+    def _generate(self, prompt, **kwargs):
+        kwargs = {**self.kwargs, **kwargs}
+        guided = any(
+            kwargs.get(name) is not None for name in _GUIDED_DECODING_PARAMETERS
+        )
+
+        if self.model_type == "chat" or not (guided or kwargs.get("batch_window")):
+            return super()._generate(prompt, **kwargs)
+
+        return self._generate_text(prompt, kwargs)
+
+    def _generate_text(self, prompt, kwargs: dict) -> dict:
+        payload = {
+            "model": self.kwargs["model"],
+            "prompt": prompt,
+            **_parameters(kwargs),
+        }
+
+        if kwargs.get("batch_window"):
+            batcher = get_batcher(
+                (type(self), self.urls_const),
+                partial(self._complete, "/v1/completions"),
+                window=kwargs["batch_window"],
+                max_batch_size=kwargs.get("max_batch_size") or LM_BATCH_MAX_SIZE,
+            )
+            completions = batcher.submit(payload)
+        else:
+            completions = self._complete("/v1/completions", payload)
+
+        return {
+            "prompt": prompt,
+            "choices": [{"text": completion["text"]} for completion in completions],
+        }
+
+    def _post(self, path: str, payload: dict):
+        url = self.urls.pop(0)
+        self.urls.append(url)
+
+        return send_hfvllm_request_v01_wrapped(
+            f"{url}{path}",
+            url=self.urls_const,
+            port=self.port,
+            json=payload,
+            headers=self.headers,
+            **self.http_request_kwargs,
+        )
+
+    def _complete(self, path: str, payload: dict) -> list[dict]:
+        response = self._post(path, payload)
+
+        try:
+            return response.json()["choices"]
+        except Exception:
+            raise Exception(
+                f"Received invalid JSON response from server: {response.text}"
+            )
+
+
+@CacheMemory.cache(ignore=["pool"])
+def _send_pooled_request(pool: EndpointPool, path: str, json: dict):
+    return pool.post(path, json=json)
+
+
+class PooledHFClientVLLM(GuidedHFClientVLLM):
+    """GuidedHFClientVLLM spreading requests across several vLLM replicas.
+
+    Every client, and copy of it, with the same `url` list shares one
+    EndpointPool, which keeps connections open and routes each request to
+    the least loaded healthy replica. Requests carry the same sampling
+    parameters as those of HFClientVLLM.
+
+    Args:
+        url: base URLs of the replicas, e.g. ["http://10.0.0.1:8000"].
+    """
+
+    def __init__(self, model, url: list[str], port=None, **kwargs):
+        super().__init__(model=model, port=port, url=list(url), **kwargs)
+
+    @property
+    def pool(self) -> EndpointPool:
+        return get_pool(self.urls_const)
+
+    def _generate(self, prompt, **kwargs):
+        kwargs = {**self.kwargs, **kwargs}
+
+        if self.model_type != "chat":
+            return self._generate_text(prompt, kwargs)
+
+        messages = [{"role": "user", "content": prompt}]
+
+        if kwargs.get("system_prompt"):
+            messages.insert(0, {"role": "system", "content": kwargs["system_prompt"]})
+
+        payload = {
+            "model": self.kwargs["model"],
+            "messages": messages,
+            **_parameters(kwargs),
+        }
+        completions = self._complete("/v1/chat/completions", payload)
+
+        return {
+            "prompt": prompt,
+            "choices": [
+                {"text": completion["message"]["content"]} for completion in completions
+            ],
+        }
+
+    def _post(self, path: str, payload: dict):
+        return _send_pooled_request(self.pool, path, payload)
+
+
+def get_lm(
+    model=_MISTRAL,
+    port=8000,
+    url="http://127.0.0.1",
+    endpoints=None,
+    batch_window_ms=LM_BATCH_WINDOW_MS,
+    max_batch_size=LM_BATCH_MAX_SIZE,
+    **kwargs,
+):
+    """Gets a client of one vLLM server, or of several replicas of it.
+
+    Args:
+        endpoints: base URLs of vLLM replicas, LM_ENDPOINTS if None. When
+            there are any, `port` and `url` are ignored.
+        batch_window_ms: milliseconds concurrent completion requests are
+            collected for, to be sent as one. 0 sends each on its own.
+        max_batch_size: completion requests sent as one at most.
+    """
+    endpoints = endpoints if endpoints is not None else LM_ENDPOINTS
+
+    if batch_window_ms:
+        kwargs.update(
+            batch_window=batch_window_ms / 1000, max_batch_size=max_batch_size
+        )
+
+    if endpoints:
+        return PooledHFClientVLLM(model=model, url=endpoints, **kwargs)
 
-def get_lm(model=_MISTRAL, port=8000, url="http://127.0.0.1", **kwargs):
-    lm = dspy.HFClientVLLM(model=model, port=port, url=url, **kwargs)
+    lm = GuidedHFClientVLLM(model=model, port=port, url=url, **kwargs)
     return lm
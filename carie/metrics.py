@@ -1,29 +1,128 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import dspy
 from numpy import mean, median
 
 from carie.programs import is_semantically_similar
+from config import JUDGE_MAX_CONCURRENCY
+
+_JUDGE_POOL = ThreadPoolExecutor(
+    max_workers=JUDGE_MAX_CONCURRENCY, thread_name_prefix="judge"
+)
 
 
 def evaluate_carie(gold, prediction, *args, **kwargs):
-    if not prediction.result.strip():
-        return 0
+    return evaluate_carie_batch([gold], [prediction])[0]
 
-    assert gold.task == prediction.task
 
-    thought_score = _score_thoughts(gold=gold, prediction=prediction)
-    action_score = _score_actions(gold=gold, prediction=prediction)
-    result_score = _score_result(gold=gold, prediction=prediction)
-    scores = [thought_score, action_score, result_score]
-    score = median(scores)
+def evaluate_carie_batch(golds: list, predictions: list) -> list[float]:
+    """Scores many examples, judging the texts of all of them concurrently.
 
-    return score
+    An example's score is the median of its thought, action and result
+    scores. Action and result scores are worked out first and, when they
+    agree, they settle the median, so the thoughts are never judged.
+    """
+    return [scores["score"] for scores in score_carie_batch(golds, predictions)]
+
+
+def score_carie_batch(golds: list, predictions: list) -> list[dict]:
+    """Scores many examples like `evaluate_carie_batch`, keeping their sub-scores.
+
+    Returns:
+        For each example, its "thought", "action" and "result" scores and its
+        "score". Sub-scores that were never worked out are None: all of them
+        for an empty result, and the thought score when it was settled.
+    """
+    scores = {}
+    pending = []
+
+    for idx, (gold, prediction) in enumerate(zip(golds, predictions)):
+        if not prediction.result.strip():
+            scores[idx] = _sub_scores(None, None, None, score=0)
+            continue
+
+        assert gold.task == prediction.task
+        pending.append(idx)
+
+    action_scores = {
+        idx: _score_actions(gold=golds[idx], prediction=predictions[idx])
+        for idx in pending
+    }
+    result_verdicts = _judge_many(
+        [(golds[idx].result, predictions[idx].result) for idx in pending]
+    )
+    result_scores = {
+        idx: _score_verdict(verdict) for idx, verdict in zip(pending, result_verdicts)
+    }
+
+    unsettled = [idx for idx in pending if action_scores[idx] != result_scores[idx]]
+    thought_pairs = {
+        idx: _thought_pairs(gold=golds[idx], prediction=predictions[idx])
+        for idx in unsettled
+    }
+    thought_verdicts = iter(
+        _judge_many(
+            [
+                pair
+                for idx in unsettled
+                for pair in thought_pairs[idx]
+                if pair is not None
+            ]
+        )
+    )
+
+    for idx in pending:
+        if idx in thought_pairs:
+            # A thought without a gold counterpart scores 0 without judging
+            thought_score = mean(
+                [
+                    _score_verdict(next(thought_verdicts)) if pair else 0
+                    for pair in thought_pairs[idx]
+                ]
+            )
+            score = median([thought_score, action_scores[idx], result_scores[idx]])
+        else:
+            # Settled by the action and result scores, whatever the thoughts
+            thought_score = None
+            score = action_scores[idx]
+
+        scores[idx] = _sub_scores(
+            thought_score, action_scores[idx], result_scores[idx], score=score
+        )
+
+    return [scores[idx] for idx in range(len(predictions))]
 
 
-def _score_thoughts(gold, prediction) -> float:
+def _sub_scores(thought, action, result, score) -> dict:
+    return {
+        "thought": None if thought is None else float(thought),
+        "action": action,
+        "result": result,
+        "score": float(score),
+    }
+
+
+def _judge_many(pairs: list[tuple[str, str]]) -> list[bool | None]:
+    lm = dspy.settings.lm
+
+    def judge(pair: tuple[str, str]) -> bool | None:
+        # Pool threads start from the main settings, not the caller's ones
+        with dspy.settings.context(lm=lm, trace=None):
+            return is_semantically_similar(*pair)
+
+    return list(_JUDGE_POOL.map(judge, pairs))
+
+
+def _score_verdict(semantically_similar: bool | None) -> float:
+    return 1.0 if semantically_similar else 0.0
+
+
+def _thought_pairs(gold, prediction) -> list[tuple[str, str] | None]:
     prediction_thought_hops = sum(
         [1 for step_name in prediction if "thought" in step_name.lower()]
     )
 
-    semantic_similarity_scores = []
+    thought_pairs = []
 
     for hop in range(1, prediction_thought_hops + 1):
         hop_step_name = f"Thought_{hop}"
@@ -31,16 +130,13 @@ def _score_thoughts(gold, prediction) -> float:
         try:
             gold_thought = gold[hop_step_name]
         except KeyError:
-            semantic_similarity_scores.append(0)
+            thought_pairs.append(None)
             continue
 
         predicted_thought = prediction[hop_step_name]
-        semantically_similar = is_semantically_similar(gold_thought, predicted_thought)
-        semantic_similarity_score = 1.0 if semantically_similar else 0.0
-        semantic_similarity_scores.append(semantic_similarity_score)
+        thought_pairs.append((gold_thought, predicted_thought))
 
-    score = mean(semantic_similarity_scores)
-    return score
+    return thought_pairs
 
 
 def _score_actions(gold, prediction) -> float:
@@ -50,13 +146,3 @@ def _score_actions(gold, prediction) -> float:
     score = 0.0 if has_duplicates else 1.0
 
     return score
-
-
-def _score_result(gold, prediction) -> float:
-    gold_result = gold.result
-    prediction_result = prediction.result
-
-    semantically_similar = is_semantically_similar(gold_result, prediction_result)
-    score = 1.0 if semantically_similar else 0.0
-
-    return score
@@ -0,0 +1,223 @@
+from threading import Condition, Lock
+from time import monotonic
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from config import (
+    LM_POOL_COOLDOWN,
+    LM_POOL_FAILURE_THRESHOLD,
+    LM_POOL_MAX_IN_FLIGHT,
+    LM_POOL_TIMEOUT,
+)
+
+# Weight of the latest request in an endpoint's average latency
+_LATENCY_SMOOTHING = 0.2
+
+
+class NoHealthyEndpointError(Exception):
+    pass
+
+
+class Endpoint:
+    """One LM server, with its own connections, load and circuit breaker.
+
+    The circuit opens after `failure_threshold` consecutive failures, so the
+    endpoint gets no requests for `cooldown` seconds. Then a single probe
+    request is let through, which closes the circuit if it succeeds and
+    opens it again otherwise.
+    """
+
+    def __init__(self, url: str, max_in_flight: int):
+        self.url = url.rstrip("/")
+        self.max_in_flight = max_in_flight
+        self.in_flight = 0
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.open_until = None
+        self.probing = False
+        # Average seconds per request, unknown until one succeeds
+        self.latency = None
+
+        # Keeps up to `max_in_flight` connections to the server open
+        self.session = requests.Session()
+        self.session.mount(
+            self.url, HTTPAdapter(pool_connections=1, pool_maxsize=max_in_flight)
+        )
+
+    @property
+    def state(self) -> str:
+        if self.open_until is None:
+            return "closed"
+
+        return "half-open" if monotonic() >= self.open_until else "open"
+
+    def available(self) -> bool:
+        # Until its latency is known an endpoint takes one request at a time,
+        # so a slow one does not get a share of a burst
+        max_in_flight = self.max_in_flight if self.latency is not None else 1
+
+        if self.in_flight >= max_in_flight:
+            return False
+
+        state = self.state
+        return state == "closed" or (state == "half-open" and not self.probing)
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "in_flight": self.in_flight,
+            "requests": self.requests,
+            "failures": self.failures,
+            "latency": self.latency,
+        }
+
+
+class EndpointPool:
+    """Routes LM requests to the least loaded of several healthy endpoints.
+
+    Requests go to the available endpoint expected to answer first, given
+    its requests in flight and its average latency. Connection errors, timeouts and
+    server errors count against the endpoint and the request is retried on
+    another one. When every endpoint is busy, requests wait for one to free
+    up; when every circuit is open, they fail at once.
+
+    Args:
+        urls: base URLs of the endpoints, e.g. "http://127.0.0.1:8000".
+        max_in_flight: requests sent at once to each endpoint.
+        failure_threshold: consecutive failures opening an endpoint circuit.
+        cooldown: seconds an open circuit keeps its endpoint out.
+        timeout: seconds each request is given.
+    """
+
+    def __init__(
+        self,
+        urls: list[str],
+        max_in_flight: int = LM_POOL_MAX_IN_FLIGHT,
+        failure_threshold: int = LM_POOL_FAILURE_THRESHOLD,
+        cooldown: float = LM_POOL_COOLDOWN,
+        timeout: float = LM_POOL_TIMEOUT,
+    ):
+        self.endpoints = [Endpoint(url, max_in_flight) for url in urls]
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.timeout = timeout
+        self._condition = Condition(Lock())
+
+    def stats(self) -> dict[str, dict]:
+        with self._condition:
+            return {endpoint.url: endpoint.stats() for endpoint in self.endpoints}
+
+    def _acquire(self, excluded: set) -> Endpoint:
+        with self._condition:
+            while True:
+                candidates = [
+                    endpoint
+                    for endpoint in self.endpoints
+                    if endpoint not in excluded and endpoint.available()
+                ]
+
+                if candidates:
+                    endpoint = min(
+                        candidates,
+                        key=lambda endpoint: (
+                            (endpoint.in_flight + 1) * (endpoint.latency or 0.0),
+                            endpoint.in_flight,
+                        ),
+                    )
+                    endpoint.in_flight += 1
+                    endpoint.requests += 1
+                    endpoint.probing = endpoint.state == "half-open"
+                    return endpoint
+
+                if all(
+                    endpoint in excluded or endpoint.state == "open"
+                    for endpoint in self.endpoints
+                ):
+                    raise NoHealthyEndpointError(
+                        f"No healthy LM endpoint among {[e.url for e in self.endpoints]}"
+                    )
+
+                # Busy endpoints free up, and open circuits half-open, in time
+                self._condition.wait(timeout=self.cooldown)
+
+    def _release(self, endpoint: Endpoint, latency: float = None):
+        with self._condition:
+            endpoint.in_flight -= 1
+            endpoint.probing = False
+
+            if latency is None:
+                endpoint.failures += 1
+                endpoint.consecutive_failures += 1
+
+                if (
+                    endpoint.consecutive_failures >= self.failure_threshold
+                    or endpoint.open_until is not None
+                ):
+                    endpoint.open_until = monotonic() + self.cooldown
+            else:
+                endpoint.consecutive_failures = 0
+                endpoint.open_until = None
+                endpoint.latency = (
+                    latency
+                    if endpoint.latency is None
+                    else endpoint.latency
+                    + _LATENCY_SMOOTHING * (latency - endpoint.latency)
+                )
+
+            self._condition.notify_all()
+
+    def post(self, path: str, **kwargs) -> requests.Response:
+        """POSTs to `path` of the least loaded endpoint, retrying on others.
+
+        Raises:
+            NoHealthyEndpointError: if every endpoint failed or has its circuit open.
+        """
+        excluded = set()
+        last_exception = None
+
+        while len(excluded) < len(self.endpoints):
+            try:
+                endpoint = self._acquire(excluded)
+            except NoHealthyEndpointError as exception:
+                raise exception from last_exception
+
+            start = monotonic()
+
+            try:
+                response = endpoint.session.post(
+                    f"{endpoint.url}{path}", timeout=self.timeout, **kwargs
+                )
+            except requests.RequestException as exception:
+                last_exception = exception
+            else:
+                # Client errors are the request's fault, not the endpoint's
+                if response.status_code < 500:
+                    self._release(endpoint, latency=monotonic() - start)
+                    return response
+
+                last_exception = requests.HTTPError(
+                    f"{response.status_code} from {endpoint.url}", response=response
+                )
+
+            self._release(endpoint)
+            excluded.add(endpoint)
+
+        raise NoHealthyEndpointError("Every LM endpoint failed") from last_exception
+
+
+# Pools shared by every client, and client copy, of the same endpoints
+_POOLS = {}
+_POOLS_LOCK = Lock()
+
+
+def get_pool(urls: tuple[str, ...], **kwargs) -> EndpointPool:
+    """Gets the pool of `urls`, creating it with `kwargs` on first use."""
+    with _POOLS_LOCK:
+        pool = _POOLS.get(tuple(urls))
+
+        if pool is None:
+            pool = _POOLS[tuple(urls)] = EndpointPool(list(urls), **kwargs)
+
+    return pool
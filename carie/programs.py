@@ -1,7 +1,36 @@
+from collections import Counter
+from hashlib import sha256
+from threading import Lock
+import json
+
 import dspy
 
+from config import (
+    CARIE_FAST_PATH,
+    CARIE_WEB_SEARCH,
+    JUDGE_CACHE_FILE_PATH,
+    JUDGE_CACHE_MAX_ENTRIES,
+    REACT_ACTION_MAX_TOKENS,
+    REACT_APPEND_ONLY_PROMPTS,
+    REACT_CONSTRAINED_ACTIONS,
+    REACT_MAX_CONTEXT_TOKENS,
+    REACT_STOP_AFTER_ACTION,
+    REACT_THOUGHT_MAX_TOKENS,
+)
 from react import ReAct
-from .tools import ExaminePlant, ReadPlantSensor, ListPlants  # , WebSearch
+from .cache import SQLiteCache
+from .lm import _CLIENT_SETTINGS
+from .router import Router
+from .tools import (
+    ExaminePlant,
+    FindPlants,
+    ReadAllSensors,
+    ReadPlantSensor,
+    ReadPlantSensorHistory,
+    ReadSensors,
+    ListPlants,
+    WebSearch,
+)
 from text_parsers import parse_boolean
 
 
@@ -15,23 +44,60 @@ class CarieSignature(dspy.Signature):
 
 
 class Carie(dspy.Module):
-    def __init__(self, max_hops: int = 8):
+    def __init__(
+        self,
+        max_hops: int = 8,
+        fast_path: bool = CARIE_FAST_PATH,
+        web_search: bool = CARIE_WEB_SEARCH,
+    ):
         super().__init__()
 
         self.retrievers = [
             ExaminePlant(),
             ReadPlantSensor(),
+            ReadAllSensors(),
+            ReadSensors(),
+            ReadPlantSensorHistory(),
             ListPlants(),
-            # WebSearch()
+            FindPlants(),
         ]
+
+        if web_search:
+            self.retrievers.append(WebSearch())
+
         self.generate_reasoning = ReAct(
-            CarieSignature, max_hops=max_hops, retrievers=self.retrievers
+            CarieSignature,
+            max_hops=max_hops,
+            retrievers=self.retrievers,
+            stop_after_action=REACT_STOP_AFTER_ACTION,
+            max_tokens={
+                "Thought": REACT_THOUGHT_MAX_TOKENS,
+                "Action": REACT_ACTION_MAX_TOKENS,
+            },
+            append_only=REACT_APPEND_ONLY_PROMPTS,
+            constrained_actions=REACT_CONSTRAINED_ACTIONS,
+            max_context_tokens=REACT_MAX_CONTEXT_TOKENS,
         )
+        self.router = Router(self.generate_reasoning.tools) if fast_path else None
 
     def forward(self, task):
+        routed = self.router and self.router(task)
+
+        if routed:
+            return routed
+
         reasoning = self.generate_reasoning(task=task)
         return reasoning
 
+    async def aforward(self, task):
+        routed = self.router and self.router(task)
+
+        if routed:
+            return routed
+
+        reasoning = await self.generate_reasoning.aforward(task=task)
+        return reasoning
+
 
 class SemanticSimilarity(dspy.Signature):
     """Verify that two texts are semantically similar"""
@@ -43,7 +109,83 @@ class SemanticSimilarity(dspy.Signature):
     )
 
 
+_JUDGE_CACHE = None
+_JUDGE_CACHE_LOCK = Lock()
+# Similarity checks by how they were answered, made from judge pool threads
+_JUDGE_STATS = Counter()
+_JUDGE_STATS_LOCK = Lock()
+
+
+def _load_judge_cache() -> SQLiteCache:
+    global _JUDGE_CACHE
+
+    with _JUDGE_CACHE_LOCK:
+        if _JUDGE_CACHE is None:
+            _JUDGE_CACHE = SQLiteCache(
+                JUDGE_CACHE_FILE_PATH, max_entries=JUDGE_CACHE_MAX_ENTRIES
+            )
+
+    return _JUDGE_CACHE
+
+
+def _count_judgement(how: str):
+    with _JUDGE_STATS_LOCK:
+        _JUDGE_STATS[how] += 1
+
+
+def _normalize_text(text: str) -> str:
+    return " ".join(text.lower().split()).rstrip(".!")
+
+
+def _judge_cache_key(text_1: str, text_2: str) -> str:
+    lm = dspy.settings.lm
+    lm_kwargs = {
+        key: value
+        for key, value in (lm.kwargs if lm else {}).items()
+        if key not in _CLIENT_SETTINGS
+    }
+    judge = {
+        # Sorted, so the cache answers the same for (a, b) and (b, a)
+        "texts": sorted([text_1, text_2]),
+        "instructions": SemanticSimilarity.instructions,
+        "fields": list(SemanticSimilarity.fields),
+        "lm": lm_kwargs,
+    }
+    judge_json = json.dumps(judge, sort_keys=True, default=str)
+    return sha256(judge_json.encode()).hexdigest()
+
+
+def judge_stats() -> dict:
+    """Counts how similarity checks were answered: identical, cached or judged."""
+    with _JUDGE_STATS_LOCK:
+        stats = dict(_JUDGE_STATS)
+
+    return {**stats, "cache": _load_judge_cache().stats()}
+
+
 def is_semantically_similar(text_1: str, text_2: str):
+    normalized_text_1 = _normalize_text(text_1)
+    normalized_text_2 = _normalize_text(text_2)
+
+    if normalized_text_1 == normalized_text_2:
+        _count_judgement("identical")
+        return True
+
+    judge_cache = _load_judge_cache()
+    key = _judge_cache_key(normalized_text_1, normalized_text_2)
+    semantically_similar = judge_cache.get(key)
+
+    if semantically_similar is not None:
+        _count_judgement("cached")
+        return semantically_similar
+
     program = dspy.ChainOfThought(SemanticSimilarity)
     prediction = program(text_1=text_1, text_2=text_2)
-    return parse_boolean(prediction.is_semantically_similar)
+    semantically_similar = parse_boolean(prediction.is_semantically_similar)
+    _count_judgement("judged")
+
+    # Unparseable verdicts are left out, so they are judged again next time
+    if semantically_similar is not None:
+        judge_cache.set(key, semantically_similar)
+
+    return semantically_similar
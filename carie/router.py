@@ -0,0 +1,377 @@
+from collections import Counter, deque
+from dataclasses import dataclass
+from threading import Lock
+from time import perf_counter
+import re
+
+import numpy as np
+from dspy.primitives.prediction import Prediction
+
+from plants import SENSOR_NAMES, STATUS_LABELS, count_plants, find_plants, get_plants
+
+# Words naming a sensor, each maybe implying the status asked about. Checked
+# in order, the first term found at a position wins. Terms of no sensor, as
+# a bare "humidity" of the air or the soil, leave the task to ReAct.
+_SENSOR_TERMS = (
+    (r"soil ?ph|ph|acid\w*|alkaline", "soil_ph", None),
+    (r"over-?water\w*|soggy", "soil_humidity", "high"),
+    (r"under-?water\w*|thirsty", "soil_humidity", "low"),
+    (r"soil (humidity|moisture)|water\w*|moist\w*", "soil_humidity", None),
+    (r"air humidity|humid\w* air", "air_humidity", None),
+    (r"humid\w*", None, None),
+    (r"damp", "air_humidity", "high"),
+    (r"(air )?temperatures?", "air_temperature", None),
+    (r"cold|chilly|freezing", "air_temperature", "low"),
+    (r"hot|warm", "air_temperature", "high"),
+    (r"light( levels?)?|sun\w*", "light_level", None),
+    (r"dark", "light_level", "low"),
+    (r"bright", "light_level", "high"),
+)
+_SENSOR_PATTERN = re.compile(
+    "|".join(
+        rf"\b(?P<term{index}>{pattern})\b"
+        for index, (pattern, _, _) in enumerate(_SENSOR_TERMS)
+    ),
+    flags=re.IGNORECASE,
+)
+
+_STATUS_PATTERNS = (
+    (
+        re.compile(
+            r"\btoo (much|high)\b|\bless\b|\bover-?(watered|heated|exposed)\b",
+            re.IGNORECASE,
+        ),
+        "high",
+    ),
+    (
+        re.compile(
+            r"\btoo (low|little)\b|\bneeds?\b(?! less)|\bmore\b|\bnot enough\b"
+            r"|\bunder-?(watered|exposed)\b",
+            re.IGNORECASE,
+        ),
+        "low",
+    ),
+    (re.compile(r"\benjoy\w*|\bhappy with\b|\bgood\b|\bfine\b", re.IGNORECASE), "good"),
+)
+# Negated questions, e.g. "which plants are not too hot?", are left to ReAct
+_NEGATION_PATTERN = re.compile(
+    r"\b(not|no|never|nor)\b(?! enough)|n't\b", re.IGNORECASE
+)
+# So are questions about past readings, which only the sensor history knows
+_PAST_PATTERN = re.compile(
+    r"\b(yesterday|ago|last|was|were|when|history|trends?)\b", re.IGNORECASE
+)
+_IDEAL_PATTERN = re.compile(
+    r"\b(ideal\w*|optimal\w*|prefer\w*|likes?)\b|\bshould\b[^?.!]*\bbe\b",
+    re.IGNORECASE,
+)
+# Any other "should" asks for advice, e.g. "should I water Eddie?"
+_ADVICE_PATTERN = re.compile(r"\bshould\b", re.IGNORECASE)
+_YES_NO_PATTERN = re.compile(r"^(is|are|am|does|do|has|have)\b", re.IGNORECASE)
+_VALUE_PATTERN = re.compile(
+    r"\b(what|tell me|how (much|high|low|is)|read|current\w*)\b", re.IGNORECASE
+)
+_FLEET_PATTERN = re.compile(
+    r"\b(who|which|any(body|one)|any( of our)? plants?)\b", re.IGNORECASE
+)
+_ADDRESS_PATTERN = re.compile(r"^\s*carie\s*,\s*", re.IGNORECASE)
+_WORD_PATTERN = re.compile(r"[A-Za-z0-9][\w-]*")
+
+# Plants listed by name in fleet answers, the rest are counted
+_MAX_NAMED_PLANTS = 5
+
+# Routed and fallen back tasks, and the latency of the latest routing attempts
+_ROUTER_STATS = Counter()
+_ROUTER_LATENCIES = deque(maxlen=10_000)
+_ROUTER_STATS_LOCK = Lock()
+
+
+def router_stats() -> dict:
+    """Counts tasks answered by the fast path and reports its latency.
+
+    Returns:
+        Routed and fallen back tasks, the hit rate, routes per intent and
+        the p50, p95 and p99 microseconds spent routing, hits and misses alike.
+    """
+    with _ROUTER_STATS_LOCK:
+        stats = dict(_ROUTER_STATS)
+        latencies = np.array(_ROUTER_LATENCIES)
+
+    routed, fallbacks = stats.pop("routed", 0), stats.pop("fallbacks", 0)
+    report = {
+        "routed": routed,
+        "fallbacks": fallbacks,
+        "hit_rate": routed / (routed + fallbacks) if routed + fallbacks else 0.0,
+        "intents": stats,
+    }
+
+    for percentile in (50, 95, 99):
+        report[f"p{percentile}_us"] = (
+            float(np.percentile(latencies, percentile)) * 1e6 if len(latencies) else 0.0
+        )
+
+    return report
+
+
+def reset_router_stats():
+    with _ROUTER_STATS_LOCK:
+        _ROUTER_STATS.clear()
+        _ROUTER_LATENCIES.clear()
+
+
+@dataclass
+class Route:
+    """A task matched to an intent, and the one ReAct hop answering it."""
+
+    intent: str
+    thought: str
+    action: str
+    observation: list[str]
+    conclusion: str
+    answer: str
+
+
+def _find_sensor(task: str) -> tuple[str, str | None] | None:
+    """Finds the one sensor a task is about, and the status a term implies."""
+    sensors = set()
+    implied_statuses = set()
+
+    for match in _SENSOR_PATTERN.finditer(task):
+        index = int(match.lastgroup.removeprefix("term"))
+        _, sensor_name, implied_status = _SENSOR_TERMS[index]
+        sensors.add(sensor_name)
+
+        if implied_status:
+            implied_statuses.add(implied_status)
+
+    if len(sensors) != 1 or None in sensors or len(implied_statuses) > 1:
+        return None
+
+    return sensors.pop(), next(iter(implied_statuses), None)
+
+
+def _find_status(task: str, implied_status: str | None) -> str | None:
+    """Finds the status a task asks about, or None if there is none or several."""
+    statuses = [status for pattern, status in _STATUS_PATTERNS if pattern.search(task)]
+
+    if implied_status:
+        statuses.insert(0, implied_status)
+
+    # e.g. "does it need more or less light?"
+    if "low" in statuses and "high" in statuses:
+        return None
+
+    return next(iter(statuses), None)
+
+
+def _find_plant(task: str):
+    """Finds the one plant a task names, exactly, or None.
+
+    Returns:
+        The plant, None if no plant is named, or False if several are.
+    """
+    words = _WORD_PATTERN.findall(task)
+    candidates = words + [
+        f"{first} {second}" for first, second in zip(words, words[1:])
+    ]
+    plants = {
+        plant.name: plant for plant in get_plants(candidates, fuzzy=False) if plant
+    }
+
+    if len(plants) > 1:
+        return False
+
+    return next(iter(plants.values()), None)
+
+
+def _clean_sensor_name(sensor_name: str) -> str:
+    return sensor_name.replace("_", " ").replace(" ph", " pH")
+
+
+def _reading(plant, sensor_name: str) -> tuple:
+    return (
+        plant.actual_sensor.__getattribute__(sensor_name),
+        plant.ideal_min_sensor.__getattribute__(sensor_name),
+        plant.ideal_max_sensor.__getattribute__(sensor_name),
+        STATUS_LABELS[plant.status_codes[SENSOR_NAMES.index(sensor_name)] + 1],
+    )
+
+
+def _join_names(names: list[str], n_more: int) -> str:
+    if n_more > 0:
+        return f"{', '.join(names)} and {n_more} more plants"
+
+    if len(names) == 1:
+        return f"Only {names[0]}"
+
+    return f"{', '.join(names[:-1])} and {names[-1]}"
+
+
+class Router:
+    """Answers simple plant questions from the plants, without the LM.
+
+    A task is routed when it names at most one plant and exactly one sensor,
+    and asks either the ideal range or the reading of that plant's sensor,
+    whether it is too low or too high, or which plants have it low, good or
+    high. Anything else, anything negated, about past readings or ambiguous,
+    is left to ReAct.
+
+    Args:
+        tools: the ReAct tools by name, which observe routed actions so
+            routed trajectories read like ReAct ones.
+    """
+
+    def __init__(self, tools: dict):
+        self.tools = tools
+
+    def __call__(self, task: str) -> Prediction | None:
+        start = perf_counter()
+        route = self.route(task)
+        latency = perf_counter() - start
+
+        with _ROUTER_STATS_LOCK:
+            _ROUTER_LATENCIES.append(latency)
+
+            if route:
+                _ROUTER_STATS["routed"] += 1
+                _ROUTER_STATS[route.intent] += 1
+            else:
+                _ROUTER_STATS["fallbacks"] += 1
+
+        if route is None:
+            return None
+
+        return Prediction(
+            task=task,
+            result=route.answer,
+            Thought_1=route.thought,
+            Action_1=route.action,
+            Observation_1=route.observation,
+            Thought_2=route.conclusion,
+            Action_2=f"Finish[{route.answer}]",
+            route=route.intent,
+        )
+
+    def route(self, task: str) -> Route | None:
+        """Matches a task to an intent and answers it, or returns None."""
+        question = _ADDRESS_PATTERN.sub("", task).strip()
+
+        if _NEGATION_PATTERN.search(question) or _PAST_PATTERN.search(question):
+            return None
+
+        sensor = _find_sensor(question)
+
+        if sensor is None:
+            return None
+
+        sensor_name, implied_status = sensor
+        plant = _find_plant(question)
+
+        if plant is False:
+            return None
+
+        if plant is None:
+            if not _FLEET_PATTERN.search(question):
+                return None
+
+            status = _find_status(question, implied_status)
+
+            if status is None:
+                return None
+
+            return self._find_plants(sensor_name, status)
+
+        if _IDEAL_PATTERN.search(question):
+            return self._read_sensor(plant, sensor_name, "ideal")
+
+        if _ADVICE_PATTERN.search(question):
+            return None
+
+        if _YES_NO_PATTERN.search(question):
+            status = _find_status(question, implied_status)
+
+            if status not in ("low", "high"):
+                return None
+
+            return self._check_sensor(plant, sensor_name, status)
+
+        if _VALUE_PATTERN.search(question):
+            return self._read_sensor(plant, sensor_name, "value")
+
+        return None
+
+    def _observe(self, action_name: str, action_arg: str) -> tuple[str, list[str]]:
+        passages = self.tools[action_name](action_arg).passages
+        return f"{action_name}[{action_arg}]", passages
+
+    def _read_sensor(self, plant, sensor_name: str, intent: str) -> Route:
+        clean_sensor_name = _clean_sensor_name(sensor_name)
+        actual, ideal_min, ideal_max, status = _reading(plant, sensor_name)
+        action, observation = self._observe(
+            "read_plant_sensor", f"{plant.name}, {sensor_name}"
+        )
+
+        if intent == "ideal":
+            answer = f"{plant.name}'s {clean_sensor_name} ideally is between {ideal_min} and {ideal_max}"
+            conclusion = f"We know {plant.name}'s ideal {clean_sensor_name} range"
+        else:
+            answer = f"{plant.name}'s {clean_sensor_name} is {status} at {actual}"
+            conclusion = f"We know {plant.name}'s current and ideal {clean_sensor_name}"
+
+        return Route(
+            intent=intent,
+            thought=f"We need to read {plant.name}'s {clean_sensor_name} sensor in order to know its current, minimum, maximum and ideal values",
+            action=action,
+            observation=observation,
+            conclusion=conclusion,
+            answer=answer,
+        )
+
+    def _check_sensor(self, plant, sensor_name: str, asked_status: str) -> Route:
+        clean_sensor_name = _clean_sensor_name(sensor_name)
+        actual, _, _, status = _reading(plant, sensor_name)
+        action, observation = self._observe(
+            "read_plant_sensor", f"{plant.name}, {sensor_name}"
+        )
+
+        if status == asked_status:
+            answer = f"Yes, {plant.name}'s {clean_sensor_name} currently is too {status} at {actual}"
+        elif status == "good":
+            answer = (
+                f"No, {plant.name}'s {clean_sensor_name} currently is good at {actual}"
+            )
+        else:
+            answer = f"No, on the contrary, {plant.name}'s {clean_sensor_name} currently is {status} at {actual}"
+
+        return Route(
+            intent="check",
+            thought=f"We need to read {plant.name}'s {clean_sensor_name} sensor in order to know its current, minimum, maximum and ideal values",
+            action=action,
+            observation=observation,
+            conclusion=f"We know {plant.name}'s {clean_sensor_name} is {status}",
+            answer=answer,
+        )
+
+    def _find_plants(self, sensor_name: str, status: str) -> Route:
+        clean_sensor_name = _clean_sensor_name(sensor_name)
+        names = [
+            plant.name
+            for plant in find_plants(sensor_name, status, limit=_MAX_NAMED_PLANTS)
+        ]
+        n_more = count_plants(sensor_name, status) - len(names)
+        action, observation = self._observe("find_plants", f"{sensor_name}, {status}")
+
+        if names:
+            verb = "has" if len(names) == 1 and n_more <= 0 else "have"
+            answer = f"{_join_names(names, n_more)} {verb} {status} {clean_sensor_name}"
+        else:
+            answer = f"None of our plants has {status} {clean_sensor_name}"
+
+        return Route(
+            intent="find",
+            thought=f"We need to check for {status} {clean_sensor_name} in all plants",
+            action=action,
+            observation=observation,
+            conclusion=f"We know which plants have {status} {clean_sensor_name}",
+            answer=answer,
+        )
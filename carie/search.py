@@ -0,0 +1,270 @@
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from functools import partial
+from threading import Lock
+from time import monotonic, sleep
+import json
+
+from duckduckgo_search import DDGS
+from serpapi import Client as SerpApiClient
+
+from config import (
+    SERP_API_KEY,
+    WEB_SEARCH_CACHE_FILE_PATH,
+    WEB_SEARCH_CACHE_MAX_ENTRIES,
+    WEB_SEARCH_FIXTURE_FILE_PATH,
+    WEB_SEARCH_HEDGE_DELAY,
+    WEB_SEARCH_HEDGED,
+    WEB_SEARCH_TIMEOUT,
+)
+from .cache import SQLiteCache
+
+# Backend calls cannot be interrupted, so calls past their timeout or beaten
+# by another backend are left to finish here in the background, and their
+# results dropped. The default backends time out their own requests too, so
+# these calls free their worker soon after they are given up on.
+_SEARCH_EXECUTOR = ThreadPoolExecutor(max_workers=8, thread_name_prefix="web-search")
+
+_SEARCH_CACHE = None
+_SEARCH_CACHE_LOCK = Lock()
+
+# Searches answered by each backend, and backend calls that failed, timed out,
+# came back empty or were abandoned for a faster backend
+_SEARCH_STATS = Counter()
+_SEARCH_STATS_LOCK = Lock()
+
+
+def _count(*names: str):
+    with _SEARCH_STATS_LOCK:
+        _SEARCH_STATS.update(names)
+
+
+def web_search_stats() -> dict:
+    """Counts searches by outcome and backend, plus the persistent cache stats."""
+    with _SEARCH_STATS_LOCK:
+        stats = dict(_SEARCH_STATS)
+
+    return {**stats, "cache": _load_search_cache().stats()}
+
+
+def _load_search_cache() -> SQLiteCache:
+    global _SEARCH_CACHE
+
+    with _SEARCH_CACHE_LOCK:
+        if _SEARCH_CACHE is None:
+            _SEARCH_CACHE = SQLiteCache(
+                WEB_SEARCH_CACHE_FILE_PATH, max_entries=WEB_SEARCH_CACHE_MAX_ENTRIES
+            )
+
+    return _SEARCH_CACHE
+
+
+def _normalize_query(query: str) -> str:
+    return " ".join(query.lower().split())
+
+
+def duckduckgo(
+    query: str, max_results: int, timeout: float = WEB_SEARCH_TIMEOUT
+) -> list[dict]:
+    with DDGS(timeout=timeout) as ddgs:
+        return [
+            {"title": result["title"], "content": result["body"]}
+            for result in ddgs.text(query, max_results=max_results)
+        ]
+
+
+def serpapi(
+    query: str, max_results: int, timeout: float = WEB_SEARCH_TIMEOUT
+) -> list[dict]:
+    client = SerpApiClient(api_key=SERP_API_KEY)
+    results = client.search(q=query, engine="google", timeout=timeout)
+
+    return [
+        {"title": organic_result["title"], "content": organic_result["snippet"]}
+        for organic_result in results["organic_results"][:max_results]
+    ]
+
+
+class FixtureBackend:
+    """Offline search backend answering from a JSON file.
+
+    The file maps queries to lists of {"title", "content"} results. Queries
+    are matched case and whitespace insensitively; unknown ones get no
+    results.
+
+    Args:
+        file_path: the JSON file.
+        latency: seconds every search takes.
+        fail: raise on every search instead, as an unreachable backend would.
+    """
+
+    def __init__(self, file_path: str, latency: float = 0.0, fail: bool = False):
+        self.latency = latency
+        self.fail = fail
+
+        with open(file_path) as file:
+            self.results = {
+                _normalize_query(query): results
+                for query, results in json.load(file).items()
+            }
+
+    def __call__(self, query: str, max_results: int) -> list[dict]:
+        sleep(self.latency)
+
+        if self.fail:
+            raise ConnectionError("Fixture backend set to fail")
+
+        return self.results.get(_normalize_query(query), [])[:max_results]
+
+
+def default_backends(
+    timeout: float = WEB_SEARCH_TIMEOUT,
+) -> list[tuple[str, object]]:
+    """Lists (name, backend) pairs in order of preference.
+
+    DuckDuckGo, then SerpApi, unless WEB_SEARCH_FIXTURE_FILE_PATH points to
+    a fixture, which then answers every search.
+
+    Args:
+        timeout: seconds the HTTP requests of each backend are given.
+    """
+    if WEB_SEARCH_FIXTURE_FILE_PATH:
+        return [("fixture", FixtureBackend(WEB_SEARCH_FIXTURE_FILE_PATH))]
+
+    return [
+        ("duckduckgo", partial(duckduckgo, timeout=timeout)),
+        ("serpapi", partial(serpapi, timeout=timeout)),
+    ]
+
+
+def _search_serially(
+    query: str, max_results: int, backends: list, timeout: float
+) -> list[dict]:
+    for name, backend in backends:
+        future = _SEARCH_EXECUTOR.submit(backend, query, max_results)
+
+        try:
+            results = future.result(timeout=timeout)
+        except TimeoutError:
+            _count(f"{name}_timeouts")
+            continue
+        except Exception:
+            _count(f"{name}_failures")
+            continue
+
+        if results:
+            _count(f"{name}_wins")
+            return results
+
+        _count(f"{name}_empty")
+
+    return []
+
+
+def _search_hedged(
+    query: str, max_results: int, backends: list, timeout: float, hedge_delay: float
+) -> list[dict]:
+    """Takes the first non-empty results of several backends.
+
+    Each backend starts `hedge_delay` seconds after the previous one, or as
+    soon as it failed, and is given up on `timeout` seconds after it started.
+    """
+    pending = {}
+    waiting = list(backends)
+    next_start = monotonic()
+
+    while waiting or pending:
+        now = monotonic()
+
+        if waiting and (now >= next_start or not pending):
+            name, backend = waiting.pop(0)
+            future = _SEARCH_EXECUTOR.submit(backend, query, max_results)
+            pending[future] = (name, now + timeout)
+            next_start = now + hedge_delay
+            continue
+
+        deadlines = [deadline for _, deadline in pending.values()]
+        wake_up = min(deadlines + ([next_start] if waiting else []))
+        done, _ = wait(
+            pending, timeout=max(wake_up - now, 0), return_when=FIRST_COMPLETED
+        )
+
+        for future in done:
+            name, _ = pending.pop(future)
+
+            try:
+                results = future.result()
+            except Exception:
+                _count(f"{name}_failures")
+                continue
+
+            if not results:
+                _count(f"{name}_empty")
+                continue
+
+            _count(f"{name}_wins")
+
+            for other_future, (other_name, _) in pending.items():
+                other_future.cancel()
+                _count(f"{other_name}_abandoned")
+
+            return results
+
+        now = monotonic()
+
+        for future, (name, deadline) in list(pending.items()):
+            if deadline <= now:
+                del pending[future]
+                future.cancel()
+                _count(f"{name}_timeouts")
+
+    return []
+
+
+def search(
+    query: str,
+    max_results: int = 5,
+    backends: list[tuple[str, object]] = None,
+    hedged: bool = WEB_SEARCH_HEDGED,
+    timeout: float = WEB_SEARCH_TIMEOUT,
+    hedge_delay: float = WEB_SEARCH_HEDGE_DELAY,
+    cache_ttl: float = None,
+) -> list[dict]:
+    """Searches the web, trying several backends.
+
+    Args:
+        query: the search query.
+        max_results: the maximum number of results.
+        backends: (name, backend) pairs in order of preference, where a
+            backend takes a query and a maximum number of results and returns
+            {"title", "content"} results. `default_backends(timeout)` if None.
+        hedged: start later backends while earlier ones are still running,
+            see `_search_hedged`, instead of only after they failed.
+        timeout: seconds each backend is given.
+        hedge_delay: seconds a backend runs alone before the next one starts.
+        cache_ttl: seconds results are kept in the persistent cache, which
+            is not used if None.
+
+    Returns:
+        The results of the first backend returning any, or an empty list.
+    """
+    cache_key = f"{max_results}:{_normalize_query(query)}"
+
+    if cache_ttl is not None:
+        results = _load_search_cache().get(cache_key)
+
+        if results is not None:
+            return results
+
+    backends = backends or default_backends(timeout)
+
+    if hedged:
+        results = _search_hedged(query, max_results, backends, timeout, hedge_delay)
+    else:
+        results = _search_serially(query, max_results, backends, timeout)
+
+    # Failed searches are tried again next time
+    if results and cache_ttl is not None:
+        _load_search_cache().set(cache_key, results, ttl=cache_ttl)
+
+    return results
@@ -1,22 +1,154 @@
+from collections import Counter, defaultdict
+from datetime import datetime
+from threading import Lock
+from time import perf_counter, time
+import asyncio
 import json
 
 from dspy.predict.parameter import Parameter
 from dspy.primitives.prediction import Prediction
-from duckduckgo_search import DDGS
-from serpapi import Client as SerpApiClient
 
-from config import SERP_API_KEY
-from plants import get_plant, list_plants
+from config import (
+    PLANTS_WATCH_INTERVAL,
+    TOOL_CACHE_MAX_ENTRIES,
+    TOOL_CACHE_PLANTS_TTL,
+    TOOL_CACHE_WEB_TTL,
+)
+from history import sensor_window
+from history_store import HistoryStore
+from plants import (
+    SENSOR_NAMES,
+    STATUS_LABELS,
+    count_plants,
+    find_plants,
+    fleet_version,
+    get_plant,
+    get_plants,
+    list_plants,
+    suggest_plants,
+    watch_plants,
+)
+from .cache import TTLCache
+from .search import search
+
+# Argument patterns for constrained action decoding, see ReAct
+_PLANT_NAME_PATTERN = r"[^,;\]\n]+"
+_SENSOR_NAME_PATTERN = f"({'|'.join(SENSOR_NAMES)})"
+
+# Passages of tool calls shared by every session, keyed by tool and argument
+_TOOL_CACHE = TTLCache(max_entries=TOOL_CACHE_MAX_ENTRIES)
+
+
+def tool_cache_stats() -> dict:
+    """Counts hits and misses of tool results shared between sessions."""
+    return _TOOL_CACHE.stats()
+
+
+# Calls and seconds of every tool, cached results included
+_TOOL_TIMES = defaultdict(Counter)
+_TOOL_TIMES_LOCK = Lock()
+
+
+def tool_time_stats() -> dict[str, dict]:
+    """Counts calls of every tool and the seconds spent on them, summed over threads."""
+    with _TOOL_TIMES_LOCK:
+        return {name: dict(times) for name, times in _TOOL_TIMES.items()}
+
+
+def reset_tool_time_stats():
+    with _TOOL_TIMES_LOCK:
+        _TOOL_TIMES.clear()
+
+
+def _record_tool_time(tool_name: str, seconds: float):
+    with _TOOL_TIMES_LOCK:
+        times = _TOOL_TIMES[tool_name]
+        times["calls"] += 1
+        times["seconds"] += seconds
+
+
+def _normalize_argument(argument: str) -> str:
+    return ", ".join(" ".join(variable.split()) for variable in argument.split(","))
 
 
 class RetrieverTool(Parameter):
+    # Calls of this tool running at once across sessions, unbounded if None
+    max_concurrency = None
+    # Regex of valid `input_variable` values, anything but "]" if None
+    input_pattern = None
+    # Seconds results are reused for, never if None
+    cache_ttl = None
+    # Results come from the plants, so any plant change invalidates them
+    reads_plants = True
+
     def __call__(self, *args, **kwargs):
+        start = perf_counter()
+
+        try:
+            return self._call(*args, **kwargs)
+        finally:
+            _record_tool_time(self.name, perf_counter() - start)
+
+    async def acall(self, *args, **kwargs):
+        start = perf_counter()
+
+        try:
+            return await self._acall(*args, **kwargs)
+        finally:
+            _record_tool_time(self.name, perf_counter() - start)
+
+    def _call(self, *args, **kwargs):
+        key = self._cache_key(args, kwargs)
+
+        if key is None:
+            return self.forward(*args, **kwargs)
+
+        version = fleet_version() if self.reads_plants else None
+        passages = _TOOL_CACHE.get(key, version=version)
+
+        if passages is None:
+            passages = tuple(self.forward(*args).passages)
+
+            # Empty results, e.g. of failed searches, are tried again
+            if passages:
+                _TOOL_CACHE.set(key, passages, ttl=self.cache_ttl, version=version)
+
+        return Prediction(passages=list(passages))
+
+    async def _acall(self, *args, **kwargs):
+        key = self._cache_key(args, kwargs)
+
+        if key is None:
+            return await self.aforward(*args, **kwargs)
+
+        version = fleet_version() if self.reads_plants else None
+        passages = _TOOL_CACHE.get(key, version=version)
+
+        if passages is None:
+            passages = tuple((await self.aforward(*args)).passages)
+
+            if passages:
+                _TOOL_CACHE.set(key, passages, ttl=self.cache_ttl, version=version)
+
+        return Prediction(passages=list(passages))
+
+    def _cache_key(self, args: tuple, kwargs: dict) -> tuple | None:
+        # Only calls made by ReAct, with the action argument alone, are cached
+        if self.cache_ttl is None or len(args) != 1 or kwargs:
+            return None
+
+        return self.name, _normalize_argument(args[0])
+
+    async def aforward(self, *args, **kwargs):
+        # Most tools only read plants in memory, so a thread hop would cost
+        # more than it saves. Tools doing I/O override this.
         return self.forward(*args, **kwargs)
 
     def reset(self):
         pass
 
-    def dump_state(self):
+    def dump_state(self, *args, **kwargs):
+        # Tools have no learned state, whatever dspy asks to be saved
         return {}
 
     def load_state(self, state):
@@ -24,18 +156,30 @@ class RetrieverTool(Parameter):
             setattr(self, name, value)
 
 
+def _plant_not_found(plant_name: str) -> Prediction:
+    passage = f"We dont have a plant named `{plant_name}`"
+    suggested_names = [plant.name for plant in suggest_plants(plant_name)]
+
+    if suggested_names:
+        passage += f". Did you mean {' or '.join(suggested_names)}?"
+
+    return Prediction(passages=[passage])
+
+
 class ExaminePlant(RetrieverTool):
     name = "examine_plant"
     input_variable = "plant_name"
+    input_pattern = _PLANT_NAME_PATTERN
     desc = "selects one of our plants by its name and describes their overall characteristics"
+    cache_ttl = TOOL_CACHE_PLANTS_TTL
 
     def forward(self, plant_name: str, *args, **kwargs) -> Prediction:
         plant = get_plant(plant_name)
 
         if not plant:
-            return Prediction(passages=[f"We dont have a plant named `{plant_name}`"])
+            return _plant_not_found(plant_name)
 
-        exam = f"{plant_name} is a {plant.scientific_name}. It currently is {plant.status}."
+        exam = f"{plant.name} is a {plant.scientific_name}. It currently is {plant.status}."
         passages = [exam]
         prediction = Prediction(passages=passages)
 
@@ -45,7 +189,9 @@ class ExaminePlant(RetrieverTool):
 class ReadPlantSensor(RetrieverTool):
     name = "read_plant_sensor"
     input_variable = "plant_name, sensor_name"
+    input_pattern = f"{_PLANT_NAME_PATTERN}, {_SENSOR_NAME_PATTERN}"
     desc = "selects one of our plants by its name and read one of its sensors. Available sensors: air_humidity, air_temperature, soil_humidity, soil_ph, light_level"
+    cache_ttl = TOOL_CACHE_PLANTS_TTL
 
     def forward(self, input_variable: str, *args, **kwargs) -> Prediction:
         try:
@@ -71,7 +217,7 @@ class ReadPlantSensor(RetrieverTool):
         plant = get_plant(plant_name)
 
         if not plant:
-            return Prediction(passages=[f"We dont have a plant named `{plant_name}`"])
+            return _plant_not_found(plant_name)
 
         clean_sensor_name = sensor_name.replace("_", " ")
         actual_sensor_value = plant.actual_sensor.__getattribute__(sensor_name)
@@ -86,10 +232,106 @@ class ReadPlantSensor(RetrieverTool):
         return prediction
 
 
+_PLANTS_WATCHER = None
+_PLANTS_WATCHER_LOCK = Lock()
+
+
+def start_watching():
+    """Starts the plants watcher, keeping plants and their sensor history up to date.
+
+    Meant to be called once by whatever serves Carie, as evaluations and
+    benchmarks read fixed plants. Later calls, and calls while
+    PLANTS_WATCH_INTERVAL is 0, do nothing.
+    """
+    global _PLANTS_WATCHER
+
+    with _PLANTS_WATCHER_LOCK:
+        if _PLANTS_WATCHER is None and PLANTS_WATCH_INTERVAL:
+            _PLANTS_WATCHER = watch_plants(interval=PLANTS_WATCH_INTERVAL)
+
+
+def _format_timestamp(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M")
+
+
+class ReadPlantSensorHistory(RetrieverTool):
+    name = "read_plant_sensor_history"
+    input_variable = "plant_name, sensor_name, hours"
+    input_pattern = rf"{_PLANT_NAME_PATTERN}, {_SENSOR_NAME_PATTERN}, \d+"
+    desc = "selects one of our plants by its name and summarizes how one of its sensors changed over the last hours. Available sensors: air_humidity, air_temperature, soil_humidity, soil_ph, light_level"
+    cache_ttl = TOOL_CACHE_PLANTS_TTL
+
+    def forward(self, input_variable: str, *args, **kwargs) -> Prediction:
+        variables = [variable.strip() for variable in input_variable.split(",")]
+
+        try:
+            plant_name, sensor_name = variables[:2]
+            hours = float(variables[2]) if len(variables) > 2 else 24.0
+        except ValueError:
+            return Prediction(
+                passages=[
+                    "The action MUST follow the format read_plant_sensor_history[one of our plants name, one of the available sensors, number of hours]"
+                ]
+            )
+
+        if sensor_name not in SENSOR_NAMES:
+            return Prediction(passages=[f"We dont have a sensor named `{sensor_name}`"])
+
+        plant = get_plant(plant_name)
+
+        if not plant:
+            return _plant_not_found(plant_name)
+
+        clean_sensor_name = sensor_name.replace("_", " ")
+        window = sensor_window(plant.name, sensor_name, seconds=hours * 3600)
+        in_memory = window is not None
+
+        if not in_memory:
+            window = HistoryStore().window(
+                plant.name, sensor_name, since=time() - hours * 3600
+            )
+
+        if not window:
+            return Prediction(
+                passages=[
+                    f"There are no readings of {plant.name}'s {clean_sensor_name} in the last {hours:g} hours"
+                ]
+            )
+
+        # The in-memory history only records a plant when its readings change,
+        # the history store records every reading
+        if in_memory:
+            readings = f"{plant.name}'s {clean_sensor_name} was recorded {window.count} times, once whenever {plant.name}'s readings changed"
+        else:
+            readings = (
+                f"{plant.name}'s {clean_sensor_name} was read {window.count} times"
+            )
+
+        passages = [
+            f"In the last {hours:g} hours {readings}, "
+            f"ranging from {window.minimum:g} to {window.maximum:g} with an average of {window.mean:.1f}. "
+            f"It was last read as {window.last:g} at {_format_timestamp(window.last_timestamp)}"
+        ]
+
+        if window.last_change:
+            timestamp, before, after = window.last_change
+            direction = "rose" if after > before else "dropped"
+            passages.append(
+                f"It last {direction} from {before:g} to {after:g} at {_format_timestamp(timestamp)}"
+            )
+        elif window.count > 1 and window.minimum == window.maximum:
+            passages.append("It did not change in that time")
+
+        prediction = Prediction(passages=passages)
+        return prediction
+
+
 class ListPlants(RetrieverTool):
     name = "list_plants"
     input_variable = " "
+    input_pattern = " ?"
     desc = "lists all of our plant's names and species"
+    cache_ttl = TOOL_CACHE_PLANTS_TTL
 
     def forward(self, *args, **kwargs) -> Prediction:
         plants = list_plants()
@@ -100,43 +342,152 @@ class ListPlants(RetrieverTool):
         return prediction
 
 
+def _sensor_row(plant, sensor_name: str, status_code: int) -> str:
+    return (
+        f"{plant.actual_sensor.__getattribute__(sensor_name):g} | "
+        f"{plant.ideal_min_sensor.__getattribute__(sensor_name):g}-"
+        f"{plant.ideal_max_sensor.__getattribute__(sensor_name):g} | "
+        f"{STATUS_LABELS[status_code + 1]}"
+    )
+
+
+class ReadAllSensors(RetrieverTool):
+    name = "read_all_sensors"
+    input_variable = "plant_name"
+    input_pattern = _PLANT_NAME_PATTERN
+    desc = "selects one of our plants by its name and reads all of its sensors at once"
+    cache_ttl = TOOL_CACHE_PLANTS_TTL
+
+    def forward(self, plant_name: str, *args, **kwargs) -> Prediction:
+        plant = get_plant(plant_name)
+
+        if not plant:
+            return _plant_not_found(plant_name)
+
+        passages = [f"{plant.name}'s sensor | current | ideal | status"]
+        passages.extend(
+            f"{sensor_name.replace('_', ' ')} | {_sensor_row(plant, sensor_name, status_code)}"
+            for sensor_name, status_code in zip(SENSOR_NAMES, plant.status_codes)
+        )
+
+        prediction = Prediction(passages=passages)
+        return prediction
+
+
+class ReadSensors(RetrieverTool):
+    name = "read_sensors"
+    input_variable = "plant_name, plant_name, ...; sensor_name"
+    input_pattern = (
+        f"{_PLANT_NAME_PATTERN}(, {_PLANT_NAME_PATTERN})*; {_SENSOR_NAME_PATTERN}"
+    )
+    desc = "selects several of our plants by their names and reads one of their sensors at once. Available sensors: air_humidity, air_temperature, soil_humidity, soil_ph, light_level"
+    cache_ttl = TOOL_CACHE_PLANTS_TTL
+    max_plants = 20
+
+    def forward(self, input_variable: str, *args, **kwargs) -> Prediction:
+        try:
+            plant_names, sensor_name = input_variable.split(";")
+        except ValueError:
+            return Prediction(
+                passages=[
+                    "The action MUST follow the format read_sensors[one or more of our plants names separated by commas; one of the available sensors]"
+                ]
+            )
+
+        sensor_name = sensor_name.strip()
+        plant_names = [
+            plant_name.strip()
+            for plant_name in plant_names.split(",")
+            if plant_name.strip()
+        ][: self.max_plants]
+
+        if sensor_name not in SENSOR_NAMES:
+            return Prediction(passages=[f"We dont have a sensor named `{sensor_name}`"])
+
+        column = SENSOR_NAMES.index(sensor_name)
+        passages = [f"plant | current {sensor_name.replace('_', ' ')} | ideal | status"]
+
+        for plant_name, plant in zip(plant_names, get_plants(plant_names)):
+            if plant:
+                status_code = plant.status_codes[column]
+                passages.append(
+                    f"{plant.name} | {_sensor_row(plant, sensor_name, status_code)}"
+                )
+            else:
+                passages.append(_plant_not_found(plant_name).passages[0])
+
+        prediction = Prediction(passages=passages)
+        return prediction
+
+
+class FindPlants(RetrieverTool):
+    name = "find_plants"
+    input_variable = "sensor_name, low|good|high"
+    input_pattern = f"{_SENSOR_NAME_PATTERN}, (low|good|high)"
+    desc = "finds which of our plants have one of their sensors low, good or high, neediest first. Available sensors: air_humidity, air_temperature, soil_humidity, soil_ph, light_level"
+    cache_ttl = TOOL_CACHE_PLANTS_TTL
+    max_results = 5
+
+    def forward(self, input_variable: str, *args, **kwargs) -> Prediction:
+        try:
+            sensor_name, status = [
+                variable.strip().lower() for variable in input_variable.split(",")
+            ]
+        except ValueError:
+            return Prediction(
+                passages=[
+                    "The action MUST follow the format find_plants[one of the available sensors, either low, good or high]"
+                ]
+            )
+
+        if sensor_name not in SENSOR_NAMES:
+            return Prediction(passages=[f"We dont have a sensor named `{sensor_name}`"])
+
+        if status not in ["low", "good", "high"]:
+            return Prediction(
+                passages=[f"The status must be low, good or high, not `{status}`"]
+            )
+
+        clean_sensor_name = sensor_name.replace("_", " ")
+        plants = find_plants(sensor_name, status, limit=self.max_results)
+
+        if not plants:
+            return Prediction(
+                passages=[f"None of our plants has {status} {clean_sensor_name}"]
+            )
+
+        passages = [
+            f"{plant.name}'s {clean_sensor_name} is {status} at {plant.actual_sensor.__getattribute__(sensor_name)}. Ideally it should be between {plant.ideal_min_sensor.__getattribute__(sensor_name)} and {plant.ideal_max_sensor.__getattribute__(sensor_name)}"
+            for plant in plants
+        ]
+
+        n_more = count_plants(sensor_name, status) - len(plants)
+
+        if n_more > 0:
+            passages.append(
+                f"And {n_more} more plants have {status} {clean_sensor_name}"
+            )
+
+        prediction = Prediction(passages=passages)
+        return prediction
+
+
 class WebSearch(RetrieverTool):
     name = "web_search"
     input_variable = "query"
     desc = "takes a search query and returns one or more potentially relevant results from a web search engine"
+    # Searches are slow, so only a few run at once and local tools keep going
+    max_concurrency = 2
+    cache_ttl = TOOL_CACHE_WEB_TTL
+    reads_plants = False
 
     def forward(self, query: str, max_results: int = 5, *args, **kwargs) -> Prediction:
         clean_query = query.split("]")[0]
+        results = search(clean_query, max_results, cache_ttl=self.cache_ttl)
 
-        passages = []
-        try:
-            passages = list(self._duckduckgo(clean_query, max_results))
-        except Exception:
-            passages = list(self._google(clean_query, max_results))
-
+        passages = [json.dumps(result) for result in results]
         prediction = Prediction(passages=passages)
         return prediction
 
-    @staticmethod
-    def _duckduckgo(query: str, max_results: int):
-        with DDGS() as ddgs:
-            for result in ddgs.text(query, max_results=max_results):
-                yield json.dumps(
-                    {
-                        "title": result["title"],
-                        "content": result["body"],
-                    }
-                )
-
-    @staticmethod
-    def _google(query: str, max_results: int):
-        client = SerpApiClient(api_key=SERP_API_KEY)
-        results = client.search(q=query, engine="google")
-
-        for organic_result in results["organic_results"][:max_results]:
-            yield json.dumps(
-                {
-                    "title": organic_result["title"],
-                    "content": organic_result["snippet"],
-                }
-            )
+    async def aforward(self, query: str, *args, **kwargs) -> Prediction:
+        return await asyncio.to_thread(self.forward, query, *args, **kwargs)
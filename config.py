@@ -1,3 +1,103 @@
 from os import environ
 
 SERP_API_KEY = environ.get("SERP_API_KEY")
+
+# Web searches start the next backend after a delay, instead of after a
+# failure, and give up on a backend after a timeout, in seconds
+WEB_SEARCH_HEDGED = environ.get("WEB_SEARCH_HEDGED", "true") == "true"
+WEB_SEARCH_HEDGE_DELAY = float(environ.get("WEB_SEARCH_HEDGE_DELAY", 0.5))
+WEB_SEARCH_TIMEOUT = float(environ.get("WEB_SEARCH_TIMEOUT", 5))
+WEB_SEARCH_CACHE_FILE_PATH = environ.get(
+    "WEB_SEARCH_CACHE_FILE_PATH", "./storage/cache/web_search.sqlite"
+)
+WEB_SEARCH_CACHE_MAX_ENTRIES = int(environ.get("WEB_SEARCH_CACHE_MAX_ENTRIES", 100_000))
+
+# JSON file of query -> results answering every web search, for offline runs
+WEB_SEARCH_FIXTURE_FILE_PATH = environ.get("WEB_SEARCH_FIXTURE_FILE_PATH")
+
+# Give Carie the web search tool. Off by default, and always off when
+# optimizing, so evaluations do not depend on live search results.
+CARIE_WEB_SEARCH = environ.get("CARIE_WEB_SEARCH", "false") == "true"
+
+# Either "dataclass" (one Plant instance per plant) or "columnar" (NumPy arrays)
+PLANTS_STORE = environ.get("PLANTS_STORE", "dataclass")
+
+# Seconds between checks of the plants file and its update log, each check
+# also recording changed readings in the sensor history, once started by
+# carie.tools.start_watching. 0 never checks.
+PLANTS_WATCH_INTERVAL = float(environ.get("PLANTS_WATCH_INTERVAL", 5))
+
+# Readings kept per plant, e.g. one day of readings taken every minute
+SENSOR_HISTORY_CAPACITY = int(environ.get("SENSOR_HISTORY_CAPACITY", 1440))
+
+# Comma separated base URLs of LM servers, e.g. vLLM replicas, to spread
+# requests across. Empty for the single server given to get_lm.
+LM_ENDPOINTS = [url for url in environ.get("LM_ENDPOINTS", "").split(",") if url]
+# Requests sent at once to each of them, consecutive failures taking one out
+# for a cooldown, in seconds, and seconds given to each request
+LM_POOL_MAX_IN_FLIGHT = int(environ.get("LM_POOL_MAX_IN_FLIGHT", 32))
+LM_POOL_FAILURE_THRESHOLD = int(environ.get("LM_POOL_FAILURE_THRESHOLD", 3))
+LM_POOL_COOLDOWN = float(environ.get("LM_POOL_COOLDOWN", 5))
+LM_POOL_TIMEOUT = float(environ.get("LM_POOL_TIMEOUT", 120))
+
+# Milliseconds concurrent LM completion requests are collected for, to be
+# sent as one batch of at most LM_BATCH_MAX_SIZE. 0 sends each on its own.
+LM_BATCH_WINDOW_MS = float(environ.get("LM_BATCH_WINDOW_MS", 0))
+LM_BATCH_MAX_SIZE = int(environ.get("LM_BATCH_MAX_SIZE", 32))
+
+# Either "off", "record" (append every LM response to the cassette) or
+# "replay" (answer from the cassette, failing on misses unless they fall
+# through to the LM)
+LM_CASSETTE_MODE = environ.get("LM_CASSETTE_MODE", "off")
+LM_CASSETTE_FILE_PATH = environ.get(
+    "LM_CASSETTE_FILE_PATH", "./storage/cassettes/lm.jsonl"
+)
+LM_CASSETTE_FALL_THROUGH = environ.get("LM_CASSETTE_FALL_THROUGH", "false") == "true"
+
+JUDGE_CACHE_FILE_PATH = environ.get(
+    "JUDGE_CACHE_FILE_PATH", "./storage/cache/semantic_similarity.sqlite"
+)
+JUDGE_CACHE_MAX_ENTRIES = int(environ.get("JUDGE_CACHE_MAX_ENTRIES", 100_000))
+
+# Semantic similarity checks run at once while scoring
+JUDGE_MAX_CONCURRENCY = int(environ.get("JUDGE_MAX_CONCURRENCY", 8))
+
+# Examples run at once by the evaluation runner, and examples queued for
+# its workers and for its results writer at most
+EVAL_WORKERS = int(environ.get("EVAL_WORKERS", 16))
+EVAL_QUEUE_SIZE = int(environ.get("EVAL_QUEUE_SIZE", 64))
+
+# Per-example evaluation results, one directory per run. Running a run of
+# the same name again resumes it, only evaluating the examples it is missing.
+EVAL_RESULTS_DIR_PATH = environ.get("EVAL_RESULTS_DIR_PATH", "./storage/evaluations/")
+EVAL_RUN_NAME = environ.get("EVAL_RUN_NAME")
+
+# Answer simple plant questions from the plants, before trying ReAct
+CARIE_FAST_PATH = environ.get("CARIE_FAST_PATH", "true") == "true"
+
+# ReAct planner calls waited on at once by async sessions
+REACT_MAX_CONCURRENCY = int(environ.get("REACT_MAX_CONCURRENCY", 64))
+
+# Actions taken at once in one hop, and threads running them
+REACT_MAX_ACTIONS_PER_HOP = int(environ.get("REACT_MAX_ACTIONS_PER_HOP", 8))
+REACT_TOOL_WORKERS = int(environ.get("REACT_TOOL_WORKERS", 16))
+
+# Planner generations end after Action n, within these budgets per field
+REACT_STOP_AFTER_ACTION = environ.get("REACT_STOP_AFTER_ACTION", "true") == "true"
+REACT_THOUGHT_MAX_TOKENS = int(environ.get("REACT_THOUGHT_MAX_TOKENS", 96))
+REACT_ACTION_MAX_TOKENS = int(environ.get("REACT_ACTION_MAX_TOKENS", 48))
+
+# Prompts that only grow at their end across hops, for LM prefix caching
+REACT_APPEND_ONLY_PROMPTS = environ.get("REACT_APPEND_ONLY_PROMPTS", "false") == "true"
+
+# Tokens of the trajectory given to planners, older observations are
+# compressed beyond them. 0 leaves trajectories as they are.
+REACT_MAX_CONTEXT_TOKENS = int(environ.get("REACT_MAX_CONTEXT_TOKENS", 2048))
+
+# Send vLLM a regex of valid actions, so every action parses
+REACT_CONSTRAINED_ACTIONS = environ.get("REACT_CONSTRAINED_ACTIONS", "false") == "true"
+
+# Seconds tool results are shared by sessions, for plant and web tools
+TOOL_CACHE_PLANTS_TTL = float(environ.get("TOOL_CACHE_PLANTS_TTL", 30))
+TOOL_CACHE_WEB_TTL = float(environ.get("TOOL_CACHE_WEB_TTL", 24 * 3600))
+TOOL_CACHE_MAX_ENTRIES = int(environ.get("TOOL_CACHE_MAX_ENTRIES", 10_000))
@@ -0,0 +1,217 @@
+from dataclasses import dataclass
+from threading import Lock
+from time import time
+
+import numpy as np
+
+from config import SENSOR_HISTORY_CAPACITY
+from plants import SENSOR_NAMES, Plant, PlantView, changed_since
+
+_HISTORY = {}
+_HISTORY_LOCK = Lock()
+
+
+@dataclass
+class SensorWindow:
+    count: int
+    minimum: float
+    maximum: float
+    mean: float
+    last: float
+    last_timestamp: float
+    # (timestamp, value before, value after) of the latest notable change
+    last_change: tuple[float, float, float] | None
+
+
+class RingBuffer:
+    """Fixed number of timestamped readings of every sensor of one plant.
+
+    Timestamps and readings are preallocated, so appending overwrites the
+    oldest slot in O(1) and memory stays at `capacity` readings per plant.
+    """
+
+    __slots__ = ("timestamps", "values", "head", "size")
+
+    def __init__(self, capacity: int = SENSOR_HISTORY_CAPACITY):
+        self.timestamps = np.zeros(capacity, dtype=np.float64)
+        self.values = np.full((capacity, len(SENSOR_NAMES)), np.nan, dtype=np.float32)
+        self.head = 0
+        self.size = 0
+
+    @property
+    def capacity(self) -> int:
+        return len(self.timestamps)
+
+    def append(self, timestamp: float, values: list[float]):
+        self.timestamps[self.head] = timestamp
+        self.values[self.head] = values
+        self.head = (self.head + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+    def last_values(self) -> np.ndarray | None:
+        if not self.size:
+            return None
+
+        return self.values[self.head - 1]
+
+    def segments(self, since: float) -> list[slice]:
+        """Slices of the buffer holding readings taken at or after `since`.
+
+        There are at most two slices, oldest first, as the readings of a full
+        buffer wrap around its end.
+        """
+        if self.size < self.capacity:
+            chronological = [slice(0, self.size)]
+        else:
+            chronological = [slice(self.head, self.capacity), slice(0, self.head)]
+
+        segments = []
+
+        for segment in chronological:
+            timestamps = self.timestamps[segment]
+            start = segment.start + np.searchsorted(timestamps, since, side="left")
+
+            if start < segment.stop:
+                segments.append(slice(int(start), segment.stop))
+
+        return segments
+
+    def window(
+        self, sensor_name: str, since: float, min_change: float
+    ) -> SensorWindow | None:
+        column = SENSOR_NAMES.index(sensor_name)
+        segments = [
+            segment
+            for segment in self.segments(since)
+            if not np.all(np.isnan(self.values[segment, column]))
+        ]
+
+        if not segments:
+            return None
+
+        # Aggregates are reduced per segment, so the window is never copied
+        values = [self.values[segment, column] for segment in segments]
+        count = sum(int(np.count_nonzero(~np.isnan(value))) for value in values)
+        total = sum(float(np.nansum(value)) for value in values)
+        last_segment = segments[-1]
+
+        return SensorWindow(
+            count=count,
+            minimum=min(float(np.nanmin(value)) for value in values),
+            maximum=max(float(np.nanmax(value)) for value in values),
+            mean=total / count,
+            last=float(values[-1][-1]),
+            last_timestamp=float(self.timestamps[last_segment.stop - 1]),
+            last_change=self._last_change(segments, column, min_change),
+        )
+
+    def _last_change(
+        self, segments: list[slice], column: int, min_change: float
+    ) -> tuple[float, float, float] | None:
+        # Newest first, with the step between two segments checked in between
+        for index in range(len(segments) - 1, -1, -1):
+            segment = segments[index]
+            values = self.values[segment, column]
+            changes = np.flatnonzero(np.abs(np.diff(values)) > min_change)
+
+            if changes.size:
+                change = int(changes[-1])
+                return (
+                    float(self.timestamps[segment.start + change + 1]),
+                    float(values[change]),
+                    float(values[change + 1]),
+                )
+
+            if index:
+                before = float(self.values[segments[index - 1].stop - 1, column])
+                after = float(values[0])
+
+                if abs(after - before) > min_change:
+                    return float(self.timestamps[segment.start]), before, after
+
+        return None
+
+
+def record_readings(name: str, readings: dict[str, float], timestamp: float = None):
+    """Appends one reading of some or all sensors of a plant to its history.
+
+    Args:
+        name: the name of the plant the readings belong to.
+        readings: values keyed by sensor name. Sensors left out repeat their
+            previous value.
+        timestamp: seconds since the epoch, defaults to now. Readings of a
+            plant are expected in chronological order.
+    """
+    lower_name = name.lower()
+    timestamp = time() if timestamp is None else timestamp
+
+    with _HISTORY_LOCK:
+        ring_buffer = _HISTORY.get(lower_name)
+
+        if ring_buffer is None:
+            ring_buffer = _HISTORY[lower_name] = RingBuffer()
+
+        last_values = ring_buffer.last_values()
+        values = [
+            readings.get(
+                sensor_name, np.nan if last_values is None else last_values[column]
+            )
+            for column, sensor_name in enumerate(SENSOR_NAMES)
+        ]
+        ring_buffer.append(timestamp, values)
+
+
+def record_plants(plants: list[Plant | PlantView], timestamp: float = None):
+    """Appends the actual readings of every given plant to their history."""
+    for plant in plants:
+        readings = {
+            sensor_name: plant.actual_sensor.__getattribute__(sensor_name)
+            for sensor_name in SENSOR_NAMES
+        }
+        record_readings(plant.name, readings, timestamp=timestamp)
+
+
+def record_changed_plants(version: int, timestamp: float = None) -> int:
+    """Appends the readings of plants that changed after `version`.
+
+    Meant to be polled after reloading plants, e.g. following
+    `plants.follow_plant_updates`.
+
+    Args:
+        version: the value returned by the previous call, or 0.
+
+    Returns:
+        The version to be given to the next call.
+    """
+    plants = changed_since(version)
+
+    if plants:
+        version = max(plant.version for plant in plants)
+        record_plants(plants, timestamp=timestamp)
+
+    return version
+
+
+def sensor_window(
+    name: str, sensor_name: str, seconds: float, min_change: float = 0.0
+) -> SensorWindow | None:
+    """Aggregates the readings of one sensor of a plant over a time window.
+
+    Args:
+        name: the name of the plant.
+        sensor_name: one of `SENSOR_NAMES`.
+        seconds: how far back from now the window goes.
+        min_change: steps between two readings up to this size are not
+            reported as the last change.
+
+    Returns:
+        SensorWindow with min/max/mean/last-change or None if there are no
+        readings in the window.
+    """
+    ring_buffer = _HISTORY.get(name.lower())
+
+    if ring_buffer is None:
+        return None
+
+    with _HISTORY_LOCK:
+        return ring_buffer.window(sensor_name, time() - seconds, min_change)
@@ -0,0 +1,460 @@
+from argparse import ArgumentParser
+from time import time
+from urllib.parse import quote
+import os
+
+import numpy as np
+
+from history import SensorWindow
+from plants import _PLANTS_JSON_FILE_PATH, SENSOR_NAMES, _read_plants_json
+
+_HISTORY_DIRECTORY = "./storage/history/"
+
+# Fixed-width little-endian records, so files can be memory-mapped as arrays
+RAW_DTYPE = np.dtype(
+    [("timestamp", "<f8")] + [(sensor_name, "<f4") for sensor_name in SENSOR_NAMES]
+)
+# Besides aggregates, buckets keep their first and last reading and their
+# latest change, NaN if none, so the last change of a window is found from
+# its buckets alone
+ROLLUP_DTYPE = np.dtype(
+    [("timestamp", "<f8")]
+    + [
+        (f"{sensor_name}_{aggregate}", dtype)
+        for sensor_name in SENSOR_NAMES
+        for aggregate, dtype in (
+            ("count", "<u4"),
+            ("min", "<f4"),
+            ("max", "<f4"),
+            ("sum", "<f8"),
+            ("first", "<f4"),
+            ("first_timestamp", "<f8"),
+            ("last", "<f4"),
+            ("change_timestamp", "<f8"),
+            ("change_before", "<f4"),
+            ("change_after", "<f4"),
+        )
+    ]
+)
+_CHANGE_FIELDS = ("change_timestamp", "change_before", "change_after")
+ROLLUP_SECONDS = {"hourly": 3600, "daily": 86400}
+
+# Windows at least this long are answered from the coarser rollup
+_ROLLUP_MIN_WINDOW_SECONDS = {"daily": 14 * 86400, "hourly": 12 * 3600}
+# Raw readings scanned at once, newest first, for the last change of a window
+_CHANGE_SCAN_RECORDS = 4096
+
+
+def _file_path(directory: str, name: str, kind: str) -> str:
+    return os.path.join(directory, f"{quote(name.lower(), safe='')}.{kind}")
+
+
+def _open_records(file_path: str, dtype: np.dtype) -> np.ndarray:
+    try:
+        n_records = os.path.getsize(file_path) // dtype.itemsize
+    except FileNotFoundError:
+        n_records = 0
+
+    if not n_records:
+        return np.empty(0, dtype=dtype)
+
+    return np.memmap(file_path, dtype=dtype, mode="r", shape=(n_records,))
+
+
+def _time_range(records: np.ndarray, since: float, until: float) -> np.ndarray:
+    timestamps = records["timestamp"]
+    start = np.searchsorted(timestamps, since, side="left")
+    stop = np.searchsorted(timestamps, until, side="right")
+    return records[start:stop]
+
+
+def _rollup(records: np.ndarray, bucket_seconds: int) -> np.ndarray:
+    if not len(records):
+        return np.empty(0, dtype=ROLLUP_DTYPE)
+
+    buckets = records["timestamp"] // bucket_seconds * bucket_seconds
+    bucket_starts, first_indexes = np.unique(buckets, return_index=True)
+
+    rollups = np.zeros(len(bucket_starts), dtype=ROLLUP_DTYPE)
+    rollups["timestamp"] = bucket_starts
+
+    for sensor_name in SENSOR_NAMES:
+        values = records[sensor_name].astype(np.float64)
+        present = ~np.isnan(values)
+
+        rollups[f"{sensor_name}_count"] = np.add.reduceat(present, first_indexes)
+        rollups[f"{sensor_name}_sum"] = np.add.reduceat(
+            np.where(present, values, 0.0), first_indexes
+        )
+        rollups[f"{sensor_name}_min"] = np.minimum.reduceat(
+            np.where(present, values, np.inf), first_indexes
+        )
+        rollups[f"{sensor_name}_max"] = np.maximum.reduceat(
+            np.where(present, values, -np.inf), first_indexes
+        )
+        _rollup_changes(
+            rollups,
+            sensor_name,
+            np.searchsorted(bucket_starts, buckets[present]),
+            records["timestamp"][present],
+            values[present],
+        )
+
+    return rollups
+
+
+def _rollup_changes(
+    rollups: np.ndarray,
+    sensor_name: str,
+    rows: np.ndarray,
+    timestamps: np.ndarray,
+    values: np.ndarray,
+):
+    """Sets the first and last reading and the latest change of every bucket.
+
+    Args:
+        rows: the bucket of every present reading, in chronological order.
+    """
+    for aggregate in ("first", "first_timestamp", "last") + _CHANGE_FIELDS:
+        rollups[f"{sensor_name}_{aggregate}"] = np.nan
+
+    if not len(values):
+        return
+
+    present_rows, firsts = np.unique(rows, return_index=True)
+    lasts = np.append(firsts[1:], len(values)) - 1
+    rollups[f"{sensor_name}_first"][present_rows] = values[firsts]
+    rollups[f"{sensor_name}_first_timestamp"][present_rows] = timestamps[firsts]
+    rollups[f"{sensor_name}_last"][present_rows] = values[lasts]
+
+    # Readings following a different one of the same bucket, the latest per bucket
+    changes = 1 + np.flatnonzero((np.diff(values) != 0) & (np.diff(rows) == 0))
+
+    if changes.size:
+        changes = changes[np.append(np.diff(rows[changes]) != 0, True)]
+        change_rows = rows[changes]
+        rollups[f"{sensor_name}_change_timestamp"][change_rows] = timestamps[changes]
+        rollups[f"{sensor_name}_change_before"][change_rows] = values[changes - 1]
+        rollups[f"{sensor_name}_change_after"][change_rows] = values[changes]
+
+
+def _rollup_last_change(
+    rollups: np.ndarray, sensor_name: str
+) -> tuple[float, float, float] | None:
+    """Finds the latest change within or between consecutive buckets, if any."""
+    rollups = rollups[rollups[f"{sensor_name}_count"] > 0]
+
+    if not len(rollups):
+        return None
+
+    firsts = rollups[f"{sensor_name}_first"]
+    lasts = rollups[f"{sensor_name}_last"]
+
+    # Events in chronological order: the step into every bucket from the
+    # previous one, then the latest change within it
+    steps = np.append(False, lasts[:-1] != firsts[1:])
+    within = ~np.isnan(rollups[f"{sensor_name}_change_timestamp"])
+    events = np.flatnonzero(np.column_stack((steps, within)).ravel())
+
+    if not events.size:
+        return None
+
+    row, is_within = divmod(int(events[-1]), 2)
+
+    if is_within:
+        return tuple(
+            float(rollups[f"{sensor_name}_{field}"][row]) for field in _CHANGE_FIELDS
+        )
+
+    return (
+        float(rollups[f"{sensor_name}_first_timestamp"][row]),
+        float(lasts[row - 1]),
+        float(firsts[row]),
+    )
+
+
+def _last_change(
+    records: np.ndarray, sensor_name: str
+) -> tuple[float, float, float] | None:
+    """Finds the latest step between two readings of a sensor, if any.
+
+    Records are scanned in chunks from the newest, so long windows are only
+    read back to their last change.
+    """
+    values = records[sensor_name]
+    later_index = None
+    stop = len(records)
+
+    while stop > 0:
+        start = max(stop - _CHANGE_SCAN_RECORDS, 0)
+        indexes = start + np.flatnonzero(~np.isnan(values[start:stop]))
+        stop = start
+
+        if not indexes.size:
+            continue
+
+        # The oldest reading of the newer chunk, to check the step between chunks
+        if later_index is not None:
+            indexes = np.append(indexes, later_index)
+
+        changes = np.flatnonzero(np.diff(values[indexes]) != 0)
+
+        if changes.size:
+            before, after = indexes[changes[-1]], indexes[changes[-1] + 1]
+            return (
+                float(records["timestamp"][after]),
+                float(values[before]),
+                float(values[after]),
+            )
+
+        later_index = indexes[0]
+
+    return None
+
+
+def _merge_rollups(rollup: np.ndarray, other: np.ndarray) -> np.ndarray:
+    merged = rollup.copy()
+
+    for sensor_name in SENSOR_NAMES:
+        for aggregate in ("count", "sum"):
+            field = f"{sensor_name}_{aggregate}"
+            merged[field] = rollup[field] + other[field]
+
+        field = f"{sensor_name}_min"
+        merged[field] = min(rollup[field], other[field])
+        field = f"{sensor_name}_max"
+        merged[field] = max(rollup[field], other[field])
+
+        if not other[f"{sensor_name}_count"]:
+            continue
+
+        if not rollup[f"{sensor_name}_count"]:
+            for aggregate in ("first", "first_timestamp"):
+                field = f"{sensor_name}_{aggregate}"
+                merged[field] = other[field]
+
+        merged[f"{sensor_name}_last"] = other[f"{sensor_name}_last"]
+
+        # The latest change is the one within `other`, or else the step into it
+        if not np.isnan(other[f"{sensor_name}_change_timestamp"]):
+            for aggregate in _CHANGE_FIELDS:
+                field = f"{sensor_name}_{aggregate}"
+                merged[field] = other[field]
+        elif (
+            rollup[f"{sensor_name}_count"]
+            and rollup[f"{sensor_name}_last"] != other[f"{sensor_name}_first"]
+        ):
+            merged[f"{sensor_name}_change_timestamp"] = other[
+                f"{sensor_name}_first_timestamp"
+            ]
+            merged[f"{sensor_name}_change_before"] = rollup[f"{sensor_name}_last"]
+            merged[f"{sensor_name}_change_after"] = other[f"{sensor_name}_first"]
+
+    return merged
+
+
+class HistoryStore:
+    """Sensor readings of every plant in memory-mappable binary files.
+
+    Each plant has a `.raw` file of RAW_DTYPE records, one per reading, plus
+    `.hourly` and `.daily` files of ROLLUP_DTYPE records that are kept up to
+    date on every append. Records are sorted by timestamp, so range scans
+    are binary searches over the mapped files and return views, not copies.
+    """
+
+    def __init__(self, directory: str = _HISTORY_DIRECTORY):
+        self.directory = directory
+
+    def append(self, name: str, timestamps: list[float], values: np.ndarray):
+        """Appends readings of a plant and folds them into its rollups.
+
+        Args:
+            name: the name of the plant.
+            timestamps: seconds since the epoch, in chronological order and
+                not older than the last reading already stored.
+            values: one row per timestamp and one column per sensor, in
+                `SENSOR_NAMES` order. Missing readings are NaN.
+        """
+        records = np.zeros(len(timestamps), dtype=RAW_DTYPE)
+        records["timestamp"] = timestamps
+        values = np.asarray(values, dtype=np.float32).reshape(len(records), -1)
+
+        for column, sensor_name in enumerate(SENSOR_NAMES):
+            records[sensor_name] = values[:, column]
+
+        if not len(records):
+            return
+
+        if np.any(np.diff(records["timestamp"]) < 0):
+            raise ValueError("Readings must be in chronological order")
+
+        stored = self.records(name)
+
+        if len(stored) and records["timestamp"][0] < stored["timestamp"][-1]:
+            raise ValueError(f"Readings of {name} older than the last one stored")
+
+        os.makedirs(self.directory, exist_ok=True)
+
+        with open(_file_path(self.directory, name, "raw"), "ab") as file:
+            file.write(records.tobytes())
+
+        for kind, bucket_seconds in ROLLUP_SECONDS.items():
+            self._append_rollups(name, kind, _rollup(records, bucket_seconds))
+
+    def _append_rollups(self, name: str, kind: str, rollups: np.ndarray):
+        file_path = _file_path(self.directory, name, kind)
+        stored = _open_records(file_path, ROLLUP_DTYPE)
+
+        # The first new bucket may continue the last stored one
+        if len(stored) and stored["timestamp"][-1] == rollups["timestamp"][0]:
+            rollups[0] = _merge_rollups(stored[-1], rollups[0])
+            offset = (len(stored) - 1) * ROLLUP_DTYPE.itemsize
+        else:
+            offset = len(stored) * ROLLUP_DTYPE.itemsize
+
+        del stored
+
+        with open(file_path, "r+b" if offset else "wb") as file:
+            file.seek(offset)
+            file.write(rollups.tobytes())
+
+    def records(self, name: str, since: float = None, until: float = None):
+        """Gets the raw readings of a plant as a read-only memory-mapped view.
+
+        Args:
+            name: the name of the plant.
+            since: earliest timestamp to be included, defaults to the first.
+            until: latest timestamp to be included, defaults to the last.
+
+        Returns:
+            RAW_DTYPE records sorted by timestamp.
+        """
+        records = _open_records(_file_path(self.directory, name, "raw"), RAW_DTYPE)
+        return _time_range(records, since or -np.inf, until or np.inf)
+
+    def rollups(self, name: str, kind: str, since: float = None, until: float = None):
+        """Gets the "hourly" or "daily" rollups of a plant, see `records`.
+
+        Buckets are included when their start is within `since` and `until`.
+        """
+        rollups = _open_records(_file_path(self.directory, name, kind), ROLLUP_DTYPE)
+        return _time_range(rollups, since or -np.inf, until or np.inf)
+
+    def window(
+        self, name: str, sensor_name: str, since: float, until: float = None
+    ) -> SensorWindow | None:
+        """Aggregates one sensor of a plant between two timestamps.
+
+        Long windows are answered from the hourly or daily rollups, plus
+        the raw readings of the buckets cut by `since` or `until`, so they
+        aggregate exactly the readings within the window.
+        """
+        until = until or time()
+        last_records = self.records(name, until=until)[-1:]
+
+        if not len(last_records):
+            return None
+
+        for kind, min_window_seconds in _ROLLUP_MIN_WINDOW_SECONDS.items():
+            if until - since >= min_window_seconds:
+                return self._rollup_window(name, kind, sensor_name, since, until)
+
+        records = self.records(name, since, until)
+        values = records[sensor_name]
+        present = np.flatnonzero(~np.isnan(values))
+
+        if not present.size:
+            return None
+
+        return SensorWindow(
+            count=int(present.size),
+            minimum=float(np.nanmin(values)),
+            maximum=float(np.nanmax(values)),
+            mean=float(np.nanmean(values)),
+            last=float(values[present[-1]]),
+            last_timestamp=float(records["timestamp"][present[-1]]),
+            last_change=_last_change(records, sensor_name),
+        )
+
+    def _rollup_window(
+        self, name: str, kind: str, sensor_name: str, since: float, until: float
+    ) -> SensorWindow | None:
+        bucket_seconds = ROLLUP_SECONDS[kind]
+        # Whole buckets start at or after `since` and end at or before `until`
+        start = -(-since // bucket_seconds) * bucket_seconds
+        stop = until // bucket_seconds * bucket_seconds
+        before_start = min(np.nextafter(start, -np.inf), until)
+        rollups = np.concatenate(
+            (
+                _rollup(self.records(name, since, before_start), bucket_seconds),
+                self.rollups(name, kind, start, np.nextafter(stop, -np.inf)),
+                _rollup(self.records(name, max(stop, start), until), bucket_seconds),
+            )
+        )
+        counts = rollups[f"{sensor_name}_count"]
+
+        if not counts.sum():
+            return None
+
+        last = self.records(name, until=until)[-1]
+        present = counts > 0
+
+        return SensorWindow(
+            count=int(counts.sum()),
+            minimum=float(rollups[f"{sensor_name}_min"][present].min()),
+            maximum=float(rollups[f"{sensor_name}_max"][present].max()),
+            mean=float(rollups[f"{sensor_name}_sum"].sum() / counts.sum()),
+            last=float(last[sensor_name]),
+            last_timestamp=float(last["timestamp"]),
+            last_change=_rollup_last_change(rollups, sensor_name),
+        )
+
+    def rebuild_rollups(self, name: str):
+        """Writes the rollups of a plant again from its raw readings.
+
+        Needed for rollup files written before ROLLUP_DTYPE changed.
+        """
+        records = self.records(name)
+
+        for kind, bucket_seconds in ROLLUP_SECONDS.items():
+            with open(_file_path(self.directory, name, kind), "wb") as file:
+                file.write(_rollup(records, bucket_seconds).tobytes())
+
+
+def convert_plants_json(
+    json_file_path: str = _PLANTS_JSON_FILE_PATH,
+    directory: str = _HISTORY_DIRECTORY,
+    timestamp: float = None,
+) -> int:
+    """Writes the actual readings of plants.json as one reading per plant.
+
+    Args:
+        json_file_path: path of a file shaped like storage/plants.json.
+        directory: where the history files are written.
+        timestamp: when the readings were taken, defaults to the modification
+            time of `json_file_path`.
+
+    Returns:
+        The number of plants converted.
+    """
+    plants_json = _read_plants_json(json_file_path)
+    timestamp = timestamp or os.path.getmtime(json_file_path)
+    history_store = HistoryStore(directory)
+
+    for plant_json in plants_json:
+        values = [
+            [plant_json["actual_sensor"][sensor_name] for sensor_name in SENSOR_NAMES]
+        ]
+        history_store.append(plant_json["name"], [timestamp], values)
+
+    return len(plants_json)
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description="Converts plants.json to history files")
+    parser.add_argument("--json", default=_PLANTS_JSON_FILE_PATH)
+    parser.add_argument("--directory", default=_HISTORY_DIRECTORY)
+    args = parser.parse_args()
+
+    n_plants = convert_plants_json(args.json, args.directory)
+    print(f"Converted {n_plants} plants into {args.directory}")
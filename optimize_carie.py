@@ -1,19 +1,38 @@
 from datetime import datetime
+from random import randrange
+import os
 
 import dspy
-from dspy.evaluate import Evaluate
 from dspy.teleprompt import BootstrapFewShot
 
 from carie.data import load_examples
+from carie.evaluation import examples_key, load_run, run_evaluation, save_run
 from carie.lm import get_lm
 from carie.programs import Carie
 from carie.metrics import evaluate_carie
+from config import EVAL_RESULTS_DIR_PATH, EVAL_RUN_NAME
 
 dspy.settings.configure(lm=get_lm())
 
 
+# Runs are resumed by running again with the same EVAL_RUN_NAME: they keep
+# the seed of their data split, their compiled program and their results
+run_name = EVAL_RUN_NAME or datetime.now().isoformat()
+run_dir_path = os.path.join(EVAL_RESULTS_DIR_PATH, run_name)
+run = load_run(run_dir_path)
+
 # Load data
-trainset, valset, testset = load_examples(test_size=0.5)
+seed = run.get("seed", randrange(2**32))
+trainset, valset, testset = load_examples(test_size=0.5, seed=seed)
+testset_key = examples_key(testset)
+
+if run and run["testset"] != testset_key:
+    raise ValueError(
+        f"The test set of run `{run_name}` changed since it started, so its results "
+        "cannot be resumed. Start a run with another EVAL_RUN_NAME."
+    )
+
+save_run(run_dir_path, {"seed": seed, "testset": testset_key})
 
 # Optimize
 bs_few_shot = BootstrapFewShot(
@@ -24,23 +43,30 @@ bs_few_shot = BootstrapFewShot(
     max_errors=2,
 )
 
-carie = Carie()
-bs_few_shot_carie = bs_few_shot.compile(carie, trainset=trainset, valset=valset)
+# Routed tasks never reach the planners, so they would bootstrap no demos.
+# Live web searches would make runs impossible to reproduce.
+carie = Carie(fast_path=False, web_search=False)
+compiled_file_path = os.path.join(run_dir_path, "bs_few_shot_carie.json")
 
+if os.path.exists(compiled_file_path):
+    bs_few_shot_carie = Carie(fast_path=False, web_search=False)
+    bs_few_shot_carie.load(compiled_file_path)
+else:
+    bs_few_shot_carie = bs_few_shot.compile(carie, trainset=trainset, valset=valset)
+    bs_few_shot_carie.save(compiled_file_path)
 
-# Evaluate
-evaluator = Evaluate(
-    devset=testset,
-    metric=evaluate_carie,
-    num_threads=16,
-    display_progress=True,
-    display_table=0,
-)
 
-base_score = evaluator(carie)
+# Evaluate, streaming every result to the run directory
+base_score = run_evaluation(
+    carie, testset, file_path=os.path.join(run_dir_path, "base.jsonl")
+)
 print("Base score: ", base_score)
 
-bs_few_shot_score = evaluator(bs_few_shot_carie)
+bs_few_shot_score = run_evaluation(
+    bs_few_shot_carie,
+    testset,
+    file_path=os.path.join(run_dir_path, "bs_few_shot.jsonl"),
+)
 print("Few-shot score: ", bs_few_shot_score)
 
 # Save
@@ -1,8 +1,45 @@
-from dataclasses import dataclass
+from abc import ABC, abstractmethod
+from collections import Counter, defaultdict
+from collections.abc import Mapping
+from dataclasses import asdict, dataclass, field
+from functools import cached_property
+from heapq import nsmallest
+from itertools import count, product
+from threading import Lock, Thread
+from time import sleep
 import json
+import os
+import re
+
+import numpy as np
+
+from config import PLANTS_STORE
 
 _PLANTS = {}
 _PLANTS_JSON_FILE_PATH = "./storage/plants.json"
+_PLANTS_FILE_STAT = None
+_PLANTS_UPDATES_FILE_PATH = "./storage/plants_updates.jsonl"
+_PLANTS_UPDATES_OFFSET = 0
+_RELOAD_LOCK = Lock()
+
+SENSOR_NAMES = (
+    "air_humidity",
+    "air_temperature",
+    "soil_humidity",
+    "soil_ph",
+    "light_level",
+)
+STATUS_LABELS = ("low", "good", "high")
+
+_VERSIONS = count(1)
+_FLEET_VERSION = 0
+
+
+def _next_version() -> int:
+    global _FLEET_VERSION
+
+    _FLEET_VERSION = next(_VERSIONS)
+    return _FLEET_VERSION
 
 
 @dataclass
@@ -13,6 +50,14 @@ class Sensor:
     soil_ph: float  # Typical Range: 0 (highly acidic) to 14 (highly alkaline).
     light_level: int
 
+    def __setattr__(self, name, value):
+        super().__setattr__(name, value)
+
+        # Set by the Plant holding this sensor so its cached status is dropped
+        owner = self.__dict__.get("_owner")
+        if owner is not None:
+            owner._invalidate()
+
 
 @dataclass
 class Plant:
@@ -23,40 +68,55 @@ class Plant:
     actual_sensor: Sensor
     ideal_min_sensor: Sensor
     ideal_max_sensor: Sensor
+    version: int = field(default=0, init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        self._invalidate()
+
+    def __setattr__(self, name, value):
+        super().__setattr__(name, value)
+
+        if isinstance(value, Sensor):
+            object.__setattr__(value, "_owner", self)
+
+        # While __init__ is still assigning fields __post_init__ covers this
+        if name != "version" and "version" in self.__dict__:
+            self._invalidate()
+
+    def _invalidate(self):
+        for cached_attribute in _PLANT_CACHED_ATTRIBUTES:
+            self.__dict__.pop(cached_attribute, None)
+
+        self.version = _next_version()
 
     @property
     def genus(self):
         return self.scientific_name.split(" ")[0]
 
-    @property
-    def status(self) -> str:
-        status = []
-
-        for attribute in [
-            "air_humidity",
-            "air_temperature",
-            "soil_humidity",
-            "soil_ph",
-            "light_level",
-        ]:
+    @cached_property
+    def status_codes(self) -> tuple[int, ...]:
+        """Low (-1), good (0) or high (1) per sensor, in `SENSOR_NAMES` order."""
+        status_codes = []
+
+        for attribute in SENSOR_NAMES:
             actual = self.actual_sensor.__getattribute__(attribute)
             ideal_min = self.ideal_min_sensor.__getattribute__(attribute)
             ideal_max = self.ideal_max_sensor.__getattribute__(attribute)
 
-            readable_attribute = attribute.replace("_", " ")
-
             if actual < ideal_min:
-                status.append(f"low {readable_attribute}")
+                status_codes.append(-1)
             elif actual > ideal_max:
-                status.append(f"high {readable_attribute}")
+                status_codes.append(1)
             else:
-                status.append(f"good {readable_attribute}")
+                status_codes.append(0)
 
-        status = ", ".join(status)
-        return status
+        return tuple(status_codes)
 
-    @property
-    def summary(self):
+    @cached_property
+    def status(self) -> str:
+        return _status_text(self.status_codes)
+
+    def _summary(self):
         summary = {
             "name": self.name,
             "scientific_name": self.scientific_name,
@@ -65,21 +125,14 @@ class Plant:
 
         return summary
 
-    @property
-    def exam(self):
+    def _exam(self):
         exam = {
             "name": self.name,
             "scientific_name": self.scientific_name,
             "personality": self.personality,
         }
 
-        for attribute in [
-            "air_humidity",
-            "air_temperature",
-            "soil_humidity",
-            "soil_ph",
-            "light_level",
-        ]:
+        for attribute in SENSOR_NAMES:
             exam[attribute] = {
                 "ideal_min": self.ideal_min_sensor.__getattribute__(attribute),
                 "actual": self.actual_sensor.__getattribute__(attribute),
@@ -88,59 +141,936 @@ class Plant:
 
         return exam
 
+    _cached_summary = cached_property(_summary)
+    _cached_exam = cached_property(_exam)
+
+    # Copies of the cached dicts, so callers changing them leave the cache be
+    @property
+    def summary(self) -> dict:
+        return dict(self._cached_summary)
+
+    @property
+    def exam(self) -> dict:
+        return {
+            key: dict(value) if isinstance(value, dict) else value
+            for key, value in self._cached_exam.items()
+        }
+
+
+_PLANT_CACHED_ATTRIBUTES = ("status_codes", "status", "_cached_summary", "_cached_exam")
+
+
+def _status_text(status_codes: tuple[int, ...]) -> str:
+    status = [
+        f"{STATUS_LABELS[status_code + 1]} {attribute.replace('_', ' ')}"
+        for attribute, status_code in zip(SENSOR_NAMES, status_codes)
+    ]
+
+    return ", ".join(status)
+
+
+# Every combination of low (-1), good (0) and high (1) across the sensors,
+# indexed by `_status_key` so a whole fleet can look up its status at once
+_STATUS_TEXTS = tuple(
+    _status_text(status_codes)
+    for status_codes in product((-1, 0, 1), repeat=len(SENSOR_NAMES))
+)
+_STATUS_KEY_WEIGHTS = 3 ** np.arange(len(SENSOR_NAMES) - 1, -1, -1)
+
+
+def _status_codes(
+    actual: np.ndarray, ideal_min: np.ndarray, ideal_max: np.ndarray
+) -> np.ndarray:
+    # Low wins over high, as in Plant.status, when a range is inverted
+    return np.where(actual < ideal_min, -1, actual > ideal_max).astype(np.int8)
+
+
+def _status_key(status_codes: np.ndarray) -> np.ndarray:
+    return (status_codes + 1) @ _STATUS_KEY_WEIGHTS
 
-def _read_plants_file() -> dict[Plant]:
-    plants = {}
 
-    with open(_PLANTS_JSON_FILE_PATH) as file:
+def _severity(actual, ideal_min, ideal_max):
+    """How far readings are outside their ideal range, relative to its width.
+
+    Readings inside the range get the negative distance to its closest end,
+    so sorting by severity puts the neediest plants first for any status.
+    """
+    width = np.abs(ideal_max - ideal_min)
+    width = np.where(width > 0, width, 1.0)
+    return np.maximum(ideal_min - actual, actual - ideal_max) / width
+
+
+def _sensor_property(index: int):
+    sensor_type = Sensor.__annotations__[SENSOR_NAMES[index]]
+    return property(lambda self: sensor_type(self._values[index]))
+
+
+class SensorView:
+    """Read-only view of one row of a ColumnarPlants sensor array."""
+
+    __slots__ = ("_values",)
+
+    def __init__(self, values: np.ndarray):
+        self._values = values
+
+    air_humidity = _sensor_property(0)
+    air_temperature = _sensor_property(1)
+    soil_humidity = _sensor_property(2)
+    soil_ph = _sensor_property(3)
+    light_level = _sensor_property(4)
+
+
+class PlantView:
+    """Lightweight stand-in for a Plant backed by a ColumnarPlants row."""
+
+    __slots__ = ("_store", "_row")
+
+    def __init__(self, store: "ColumnarPlants", row: int):
+        self._store = store
+        self._row = row
+
+    @property
+    def id(self) -> int:
+        return self._store.ids[self._row]
+
+    @property
+    def name(self) -> str:
+        return self._store.names[self._row]
+
+    @property
+    def personality(self) -> str:
+        return self._store.personalities[self._row]
+
+    @property
+    def scientific_name(self) -> str:
+        return self._store.scientific_names[self._row]
+
+    @property
+    def actual_sensor(self) -> SensorView:
+        return SensorView(self._store.actual[self._row])
+
+    @property
+    def ideal_min_sensor(self) -> SensorView:
+        return SensorView(self._store.ideal_min[self._row])
+
+    @property
+    def ideal_max_sensor(self) -> SensorView:
+        return SensorView(self._store.ideal_max[self._row])
+
+    @property
+    def version(self) -> int:
+        return int(self._store.versions[self._row])
+
+    @property
+    def status_codes(self) -> tuple[int, ...]:
+        return tuple(self._store.status_codes[self._row].tolist())
+
+    @property
+    def status(self) -> str:
+        return _STATUS_TEXTS[self._store.status_keys[self._row]]
+
+    genus = Plant.genus
+    summary = property(Plant._summary)
+    exam = property(Plant._exam)
+
+    def __repr__(self):
+        return f"PlantView(id={self.id!r}, name={self.name!r})"
+
+
+class ColumnarPlants(Mapping):
+    """Plants keyed by lower case name, stored as plant x sensor arrays.
+
+    Actual, ideal minimum and ideal maximum readings live in contiguous
+    arrays whose columns follow `SENSOR_NAMES`, so the low/good/high status
+    of the whole fleet is evaluated with one vectorized comparison instead of
+    one Python loop per plant. Lookups return PlantView instances.
+    """
+
+    def __init__(
+        self,
+        ids: list[int],
+        names: list[str],
+        personalities: list[str],
+        scientific_names: list[str],
+        actual: np.ndarray,
+        ideal_min: np.ndarray,
+        ideal_max: np.ndarray,
+        rows: dict[str, int] = None,
+    ):
+        self.ids = ids
+        self.names = names
+        self.personalities = personalities
+        self.scientific_names = scientific_names
+        self.actual = np.ascontiguousarray(actual, dtype=np.float64)
+        self.ideal_min = np.ascontiguousarray(ideal_min, dtype=np.float64)
+        self.ideal_max = np.ascontiguousarray(ideal_max, dtype=np.float64)
+
+        self.rows = rows or {name.lower(): row for row, name in enumerate(names)}
+        self.status_codes = _status_codes(self.actual, self.ideal_min, self.ideal_max)
+        self.status_keys = _status_key(self.status_codes)
+        self.versions = np.full(len(names), _next_version(), dtype=np.int64)
+
+    @classmethod
+    def from_json(cls, plants_json: list[dict]) -> "ColumnarPlants":
+        def sensor_rows(sensor_key: str) -> np.ndarray:
+            return np.array(
+                [
+                    [plant_json[sensor_key][attribute] for attribute in SENSOR_NAMES]
+                    for plant_json in plants_json
+                ],
+                dtype=np.float64,
+            ).reshape(len(plants_json), len(SENSOR_NAMES))
+
+        return cls(
+            ids=[plant_json["id"] for plant_json in plants_json],
+            names=[plant_json["name"] for plant_json in plants_json],
+            personalities=[plant_json["personality"] for plant_json in plants_json],
+            scientific_names=[
+                plant_json["scientific_name"] for plant_json in plants_json
+            ],
+            actual=sensor_rows("actual_sensor"),
+            ideal_min=sensor_rows("ideal_min_sensor"),
+            ideal_max=sensor_rows("ideal_max_sensor"),
+        )
+
+    def __getitem__(self, name: str) -> PlantView:
+        return PlantView(self, self.rows[name])
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def values(self) -> list[PlantView]:
+        return [PlantView(self, row) for row in range(len(self.names))]
+
+    def update_sensor(self, name: str, sensor: str, **readings: float):
+        """Writes readings of one plant and re-evaluates only its status.
+
+        Args:
+            name: lower case name of the plant to be updated.
+            sensor: either "actual_sensor", "ideal_min_sensor" or "ideal_max_sensor".
+            readings: new values keyed by sensor attribute, e.g. soil_ph=6.5.
+        """
+        row = self.rows[name]
+        values = self.__getattribute__(_COLUMNAR_SENSOR_ARRAYS[sensor])
+
+        for attribute, value in readings.items():
+            values[row, SENSOR_NAMES.index(attribute)] = value
+
+        self.status_codes[row] = _status_codes(
+            self.actual[row], self.ideal_min[row], self.ideal_max[row]
+        )
+        self.status_keys[row] = _status_key(self.status_codes[row])
+        self.versions[row] = _next_version()
+
+    def changed_since(self, version: int) -> list[PlantView]:
+        rows = np.flatnonzero(self.versions > version)
+        return [PlantView(self, row) for row in rows.tolist()]
+
+    def find(
+        self, sensor_name: str, status_code: int, limit: int = None
+    ) -> list[PlantView]:
+        """Finds plants by the status of one sensor, see `find_plants`.
+
+        The status codes array serves as the index of the columnar store.
+        """
+        column = SENSOR_NAMES.index(sensor_name)
+        rows = np.flatnonzero(self.status_codes[:, column] == status_code)
+        severities = _severity(
+            self.actual[rows, column],
+            self.ideal_min[rows, column],
+            self.ideal_max[rows, column],
+        )
+
+        if limit is not None and limit < len(rows):
+            top = np.argpartition(-severities, limit - 1)[:limit]
+            rows, severities = rows[top], severities[top]
+
+        order = np.lexsort((rows, -severities))
+        return [PlantView(self, row) for row in rows[order].tolist()]
+
+    def count(self, sensor_name: str, status_code: int) -> int:
+        column = SENSOR_NAMES.index(sensor_name)
+        return int(np.count_nonzero(self.status_codes[:, column] == status_code))
+
+    def with_updates(self, updates: list[dict]) -> "ColumnarPlants":
+        """Copies the store with `updates` applied, see `apply_plant_updates`."""
+        sensor_arrays = {
+            sensor: self.__getattribute__(array).copy()
+            for sensor, array in _COLUMNAR_SENSOR_ARRAYS.items()
+        }
+        personalities = list(self.personalities)
+        scientific_names = list(self.scientific_names)
+        updated_rows = set()
+        new_plants_json = {}
+
+        for update in updates:
+            lower_name = update["name"].lower()
+            row = self.rows.get(lower_name)
+
+            if row is None:
+                new_plants_json[lower_name] = _merge_plant_json(
+                    new_plants_json.get(lower_name, {}), update
+                )
+                continue
+
+            for sensor, values in sensor_arrays.items():
+                for attribute, value in update.get(sensor, {}).items():
+                    values[row, SENSOR_NAMES.index(attribute)] = value
+
+            personalities[row] = update.get("personality", personalities[row])
+            scientific_names[row] = update.get("scientific_name", scientific_names[row])
+            updated_rows.add(row)
+
+        new_plants = ColumnarPlants.from_json(list(new_plants_json.values()))
+        rows = dict(self.rows)
+        rows.update(
+            (lower_name, row + len(self.names))
+            for lower_name, row in new_plants.rows.items()
+        )
+        plants = ColumnarPlants(
+            ids=self.ids + new_plants.ids,
+            names=self.names + new_plants.names,
+            personalities=personalities + new_plants.personalities,
+            scientific_names=scientific_names + new_plants.scientific_names,
+            actual=np.concatenate([sensor_arrays["actual_sensor"], new_plants.actual]),
+            ideal_min=np.concatenate(
+                [sensor_arrays["ideal_min_sensor"], new_plants.ideal_min]
+            ),
+            ideal_max=np.concatenate(
+                [sensor_arrays["ideal_max_sensor"], new_plants.ideal_max]
+            ),
+            rows=rows,
+        )
+
+        unchanged = np.ones(len(self.names), dtype=bool)
+        unchanged[list(updated_rows)] = False
+        old_versions = plants.versions[: len(self.names)]
+        old_versions[unchanged] = self.versions[unchanged]
+
+        return plants
+
+
+_COLUMNAR_SENSOR_ARRAYS = {
+    "actual_sensor": "actual",
+    "ideal_min_sensor": "ideal_min",
+    "ideal_max_sensor": "ideal_max",
+}
+
+
+class _PlantIndex(ABC):
+    """Base of the indexes over plants, keyed by lower case plant name.
+
+    Kept in sync by re-indexing only the plants whose version is newer than
+    the last sync, plus dropping the plants that are gone.
+    """
+
+    def __init__(self):
+        self.version = 0
+        self.indexed = {}
+
+    def sync(self, plants: dict[Plant] | ColumnarPlants):
+        if self.version == _FLEET_VERSION and len(plants) == len(self.indexed):
+            return
+
+        for lower_name in self.indexed.keys() - plants.keys():
+            self._remove(lower_name)
+
+        version = _FLEET_VERSION
+
+        if isinstance(plants, ColumnarPlants):
+            changed_plants = plants.changed_since(self.version)
+        else:
+            changed_plants = [
+                plant
+                for lower_name, plant in plants.items()
+                if plant.version > self.version or lower_name not in self.indexed
+            ]
+
+        for plant in changed_plants:
+            lower_name = plant.name.lower()
+            self._remove(lower_name)
+            self._add(lower_name, plant)
+
+        self.version = version
+
+    @abstractmethod
+    def _add(self, lower_name: str, plant: Plant | PlantView):
+        pass
+
+    @abstractmethod
+    def _remove(self, lower_name: str):
+        pass
+
+
+class _StatusIndex(_PlantIndex):
+    """Lower case plant names by sensor and status, for the dataclass store."""
+
+    def __init__(self):
+        super().__init__()
+        self.names = {
+            (sensor_name, status_code): set()
+            for sensor_name in SENSOR_NAMES
+            for status_code in (-1, 0, 1)
+        }
+
+    def _add(self, lower_name: str, plant: Plant):
+        self.indexed[lower_name] = plant.status_codes
+
+        for sensor_name, status_code in zip(SENSOR_NAMES, plant.status_codes):
+            self.names[(sensor_name, status_code)].add(lower_name)
+
+    def _remove(self, lower_name: str):
+        status_codes = self.indexed.pop(lower_name, None)
+
+        if status_codes is None:
+            return
+
+        for sensor_name, status_code in zip(SENSOR_NAMES, status_codes):
+            self.names[(sensor_name, status_code)].discard(lower_name)
+
+
+def _trigrams(text: str) -> frozenset[str]:
+    padded_text = "  " + " ".join(re.findall(r"[a-z0-9]+", text.lower())) + " "
+    return frozenset(padded_text[i : i + 3] for i in range(len(padded_text) - 2))
+
+
+def _similarity(trigrams: frozenset[str], other_trigrams: frozenset[str]) -> float:
+    return len(trigrams & other_trigrams) / len(trigrams | other_trigrams)
+
+
+class _NameIndex(_PlantIndex):
+    """Character trigrams of plant names and scientific names.
+
+    Candidates are gathered from the rarest trigrams of a query only, and
+    trigrams shared by more than `max_postings` plants are skipped, so a
+    lookup reads a bounded number of plants however large the fleet is.
+    """
+
+    max_trigrams = 4
+    max_postings = 300
+    max_candidates = 20
+
+    def __init__(self):
+        super().__init__()
+        self.postings = defaultdict(set)
+
+    def _add(self, lower_name: str, plant: Plant | PlantView):
+        terms = (_trigrams(plant.name), _trigrams(plant.scientific_name))
+        self.indexed[lower_name] = terms
+
+        for trigram in terms[0] | terms[1]:
+            self.postings[trigram].add(lower_name)
+
+    def _remove(self, lower_name: str):
+        terms = self.indexed.pop(lower_name, None)
+
+        if terms is None:
+            return
+
+        for trigram in terms[0] | terms[1]:
+            self.postings[trigram].discard(lower_name)
+
+    def search(self, query: str, limit: int) -> list[tuple[float, str]]:
+        """Ranks plant names by trigram similarity with `query` or any word of it.
+
+        Returns:
+            Up to `limit` (similarity, lower case name) pairs, best first.
+        """
+        words = [
+            word for word in re.findall(r"[a-z0-9]+", query.lower()) if len(word) > 2
+        ]
+        queries = {_trigrams(query)} | {_trigrams(word) for word in words}
+        hits = Counter()
+
+        for query_trigrams in queries:
+            postings = sorted(
+                (self.postings.get(trigram, ()) for trigram in query_trigrams), key=len
+            )
+
+            for posting in postings[: self.max_trigrams]:
+                if len(posting) > self.max_postings:
+                    break
+
+                hits.update(posting)
+
+        matches = [
+            (
+                max(
+                    _similarity(query_trigrams, term)
+                    for query_trigrams in queries
+                    for term in self.indexed[lower_name]
+                ),
+                lower_name,
+            )
+            for lower_name, _ in hits.most_common(self.max_candidates)
+        ]
+
+        return nsmallest(limit, matches, key=lambda match: (-match[0], match[1]))
+
+
+_STATUS_INDEX = _StatusIndex()
+_STATUS_INDEX_LOCK = Lock()
+_NAME_INDEX = _NameIndex()
+_NAME_INDEX_LOCK = Lock()
+
+# A near-miss name resolves to a plant when it is this similar to the plant,
+# and this much more similar to it than to the runner-up
+_FUZZY_MIN_SIMILARITY = 0.4
+_FUZZY_MIN_MARGIN = 0.1
+
+
+def _read_plants_json(file_path: str = _PLANTS_JSON_FILE_PATH) -> list[dict]:
+    with open(file_path) as file:
         plants_json = json.load(file)
 
+    return plants_json
+
+
+def _plant_from_json(plant_json: dict) -> Plant:
+    plant_json = {key: value for key, value in plant_json.items() if key != "_meta"}
+    plant = Plant(**plant_json)
+    plant.actual_sensor = Sensor(**plant_json["actual_sensor"])
+    plant.ideal_min_sensor = Sensor(**plant_json["ideal_min_sensor"])
+    plant.ideal_max_sensor = Sensor(**plant_json["ideal_max_sensor"])
+    return plant
+
+
+def _read_plants_file(file_path: str = _PLANTS_JSON_FILE_PATH) -> dict[Plant]:
+    plants = {}
+
+    plants_json = _read_plants_json(file_path)
+
     for plant_json in plants_json:
-        del plant_json["_meta"]
-        plant = Plant(**plant_json)
-        plant.actual_sensor = Sensor(**plant_json["actual_sensor"])
-        plant.ideal_min_sensor = Sensor(**plant_json["ideal_min_sensor"])
-        plant.ideal_max_sensor = Sensor(**plant_json["ideal_max_sensor"])
+        plant = _plant_from_json(plant_json)
         plants[plant.name.lower()] = plant
 
     return plants
 
 
-def _load_plants() -> dict[Plant]:
-    global _PLANTS
+def _read_columnar_plants_file(
+    file_path: str = _PLANTS_JSON_FILE_PATH,
+) -> ColumnarPlants:
+    plants_json = _read_plants_json(file_path)
+    return ColumnarPlants.from_json(plants_json)
+
+
+def _read_plants(
+    store: str = PLANTS_STORE, file_path: str = _PLANTS_JSON_FILE_PATH
+) -> dict[Plant] | ColumnarPlants:
+    if store == "columnar":
+        return _read_columnar_plants_file(file_path)
+
+    return _read_plants_file(file_path)
+
+
+def _file_stat(file_path: str) -> tuple[int, int]:
+    stat = os.stat(file_path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _merge_plant_json(plant_json: dict, update: dict) -> dict:
+    merged_json = {**plant_json, **update}
+
+    for sensor in _COLUMNAR_SENSOR_ARRAYS:
+        if sensor in update:
+            merged_json[sensor] = {**plant_json.get(sensor, {}), **update[sensor]}
+
+    return merged_json
+
+
+def _updated_plant(plant: Plant, update: dict) -> Plant:
+    plant_json = {
+        "id": plant.id,
+        "name": plant.name,
+        "personality": plant.personality,
+        "scientific_name": plant.scientific_name,
+    }
+
+    for sensor in _COLUMNAR_SENSOR_ARRAYS:
+        plant_json[sensor] = asdict(plant.__getattribute__(sensor))
+
+    # The name is the key of the plant, so it is never renamed
+    update = {key: value for key, value in update.items() if key != "name"}
+    return _plant_from_json(_merge_plant_json(plant_json, update))
+
+
+def _apply_updates(
+    plants: dict[Plant] | ColumnarPlants, updates: list[dict]
+) -> dict[Plant] | ColumnarPlants:
+    if isinstance(plants, ColumnarPlants):
+        return plants.with_updates(updates)
+
+    plants = dict(plants)
+
+    for update in updates:
+        lower_name = update["name"].lower()
+        plant = plants.get(lower_name)
+
+        if plant:
+            plants[lower_name] = _updated_plant(plant, update)
+        else:
+            plants[lower_name] = _plant_from_json(update)
+
+    return plants
+
+
+def _carry_versions(
+    old_plants: dict[Plant] | ColumnarPlants, plants: dict[Plant] | ColumnarPlants
+):
+    """Keeps the version of the plants a full reload left unchanged."""
+    if isinstance(plants, ColumnarPlants):
+        if (
+            not isinstance(old_plants, ColumnarPlants)
+            or plants.names != old_plants.names
+        ):
+            return
+
+        unchanged = (
+            np.all(plants.actual == old_plants.actual, axis=1)
+            & np.all(plants.ideal_min == old_plants.ideal_min, axis=1)
+            & np.all(plants.ideal_max == old_plants.ideal_max, axis=1)
+        )
+        plants.versions[unchanged] = old_plants.versions[unchanged]
+        return
+
+    for lower_name, plant in plants.items():
+        old_plant = old_plants.get(lower_name)
+
+        if old_plant == plant:
+            plants[lower_name] = old_plant
+
+
+def _load_plants() -> dict[Plant] | ColumnarPlants:
+    global _PLANTS, _PLANTS_FILE_STAT
 
     if _PLANTS:
         return _PLANTS
 
-    _PLANTS = _read_plants_file()
+    # Stat before reading, so a write racing the read is picked up on reload
+    _PLANTS_FILE_STAT = _file_stat(_PLANTS_JSON_FILE_PATH)
+    _PLANTS = _read_plants()
+
     return _PLANTS
 
 
-def list_plants() -> list[Plant]:
+def _read_updates(
+    file_path: str, offset: int, end: int = None
+) -> tuple[list[dict], int]:
+    """Reads the whole lines of an update log from `offset` on, up to `end`.
+
+    Returns:
+        The updates read, and the offset of the first line left unread.
+    """
+    try:
+        size = os.path.getsize(file_path)
+    except FileNotFoundError:
+        return [], 0
+
+    # The log was truncated or rotated, so it is followed from the start
+    if offset > size:
+        offset = 0
+
+    with open(file_path, "rb") as file:
+        file.seek(offset)
+        chunk = file.read() if end is None else file.read(max(end - offset, 0))
+
+    chunk = chunk[: chunk.rfind(b"\n") + 1]
+    updates = [json.loads(line) for line in chunk.splitlines() if line.strip()]
+
+    return updates, offset + len(chunk)
+
+
+def reload_plants(force: bool = False) -> bool:
+    """Re-reads the plants file if its modification time or size changed.
+
+    The new plants replace the old ones in a single assignment, so concurrent
+    `get_plant` and `list_plants` calls see either all old or all new plants.
+    The updates followed so far from the update log are applied again to the
+    new plants, so a reload does not undo them.
+
+    Args:
+        force: re-read the file even if it looks unchanged.
+
+    Returns:
+        True if plants were reloaded, False otherwise.
+    """
+    global _PLANTS, _PLANTS_FILE_STAT, _PLANTS_UPDATES_OFFSET
+
+    with _RELOAD_LOCK:
+        file_stat = _file_stat(_PLANTS_JSON_FILE_PATH)
+
+        if _PLANTS and not force and file_stat == _PLANTS_FILE_STAT:
+            return False
+
+        plants = _read_plants()
+        updates, _PLANTS_UPDATES_OFFSET = _read_updates(
+            _PLANTS_UPDATES_FILE_PATH, 0, _PLANTS_UPDATES_OFFSET
+        )
+
+        if updates:
+            plants = _apply_updates(plants, updates)
+
+        if _PLANTS:
+            _carry_versions(_PLANTS, plants)
+
+        _PLANTS, _PLANTS_FILE_STAT = plants, file_stat
+
+    return True
+
+
+def apply_plant_updates(updates: list[dict]):
+    """Applies partial plant updates without re-reading the plants file.
+
+    Updated plants are copied rather than changed in place, and the copies
+    replace the old plants in a single assignment.
+
+    Args:
+        updates: dicts with a plant "name" and the values that changed, e.g.
+            {"name": "Eddie", "actual_sensor": {"soil_humidity": 31.2}}.
+            An update naming an unknown plant must hold a whole plant, like
+            the items of plants.json.
+    """
+    global _PLANTS
+
+    with _RELOAD_LOCK:
+        _PLANTS = _apply_updates(_load_plants(), updates)
+
+
+def follow_plant_updates(file_path: str = _PLANTS_UPDATES_FILE_PATH) -> int:
+    """Applies the updates appended to an update log since the last call.
+
+    Each line of the log is one JSON update, as taken by `apply_plant_updates`.
+    A trailing line without a line break is left for the next call.
+
+    Args:
+        file_path: path of the append-only update log.
+
+    Returns:
+        The number of updates applied.
+    """
+    global _PLANTS, _PLANTS_UPDATES_OFFSET
+
+    with _RELOAD_LOCK:
+        updates, offset = _read_updates(file_path, _PLANTS_UPDATES_OFFSET)
+
+        if updates:
+            _PLANTS = _apply_updates(_load_plants(), updates)
+
+        _PLANTS_UPDATES_OFFSET = offset
+
+    return len(updates)
+
+
+def watch_plants(interval: float = 5.0) -> Thread:
+    """Keeps plants up to date with the plants file and its update log.
+
+    After every check, the readings of the plants that changed are appended
+    to their in-memory sensor history, see `history.record_changed_plants`.
+
+    Args:
+        interval: seconds to wait between checks.
+
+    Returns:
+        The daemon thread doing the checks.
+    """
+    # history imports this module, so it can only be imported once loaded
+    from history import record_changed_plants
+
+    def watch():
+        version = 0
+
+        while True:
+            try:
+                reload_plants()
+                follow_plant_updates()
+                version = record_changed_plants(version)
+            except (OSError, ValueError):
+                # Likely a file caught halfway written, retried on next check
+                pass
+
+            sleep(interval)
+
+    thread = Thread(target=watch, name="plants-watcher", daemon=True)
+    thread.start()
+    return thread
+
+
+def list_plants() -> list[Plant | PlantView]:
     """Lists available plants.
 
     Returns:
-        A list with available Plant instances.
+        A list with available Plant instances, or PlantView instances when
+        the columnar store is configured.
     """
     plants = _load_plants()
     return list(plants.values())
 
 
-def get_plant(name: str) -> Plant | None:
+def _search_names(
+    plants: dict[Plant] | ColumnarPlants, name: str, limit: int
+) -> list[tuple[float, str]]:
+    with _NAME_INDEX_LOCK:
+        _NAME_INDEX.sync(plants)
+        return _NAME_INDEX.search(name, limit)
+
+
+def get_plant(name: str, fuzzy: bool = True) -> Plant | PlantView | None:
     """Gets a Plant by its name.
 
     Args:
         name: the name of the Plant to be returned.
+        fuzzy: if there is no exact match, fall back to the one plant whose
+            name or scientific name is clearly the closest to `name`.
+
+    Returns:
+        Plant (or PlantView) matching `name` or None if there is no match.
+    """
+    return _get_plant(_load_plants(), name, fuzzy)
+
+
+def get_plants(names: list[str], fuzzy: bool = True) -> list[Plant | PlantView | None]:
+    """Gets several plants by their names, all from the same reload.
+
+    Args:
+        names: the names of the plants to be returned.
+        fuzzy: see `get_plant`.
 
     Returns:
-        Plant matching `name` or None if there is no match.
+        Plant (or PlantView) matching each name, or None where there is no
+        match, in the order of `names`.
     """
+    plants = _load_plants()
+    return [_get_plant(plants, name, fuzzy) for name in names]
+
+
+def _get_plant(
+    plants: dict[Plant] | ColumnarPlants, name: str, fuzzy: bool
+) -> Plant | PlantView | None:
     if not name:
         return None
 
-    lower_name = name.lower()
+    lower_name = name.strip().lower()
+    plant = plants.get(lower_name)
+
+    if plant or not fuzzy:
+        return plant
+
+    matches = _search_names(plants, name, limit=2)
+
+    if not matches or matches[0][0] < _FUZZY_MIN_SIMILARITY:
+        return None
+
+    if len(matches) > 1 and matches[0][0] - matches[1][0] < _FUZZY_MIN_MARGIN:
+        return None
+
+    return plants.get(matches[0][1])
+
+
+def suggest_plants(name: str, limit: int = 3) -> list[Plant | PlantView]:
+    """Lists the plants whose name or scientific name is closest to `name`.
+
+    Args:
+        name: a plant name, possibly misspelled or within other words.
+        limit: the maximum number of plants to be returned.
+
+    Returns:
+        Plants similar enough to `name`, the most similar first.
+    """
+    if not name:
+        return []
 
     plants = _load_plants()
-    plant = plants.get(lower_name)
+    matches = _search_names(plants, name, limit=limit)
 
-    return plant
+    return [
+        plants[lower_name]
+        for similarity, lower_name in matches
+        if similarity >= _FUZZY_MIN_SIMILARITY / 2 and lower_name in plants
+    ]
+
+
+def fleet_version() -> int:
+    """Gets the version of the most recent change to any plant.
+
+    Returns:
+        A number that only grows, to be given later to `changed_since`.
+    """
+    _load_plants()
+    return _FLEET_VERSION
+
+
+def changed_since(version: int) -> list[Plant | PlantView]:
+    """Lists plants whose readings changed after `version`.
+
+    Args:
+        version: a value previously returned by `fleet_version`, or 0.
+
+    Returns:
+        A list with the plants whose status may differ since `version`.
+    """
+    plants = _load_plants()
+
+    if isinstance(plants, ColumnarPlants):
+        return plants.changed_since(version)
+
+    return [plant for plant in plants.values() if plant.version > version]
+
+
+def _status_code(status: str) -> int:
+    return STATUS_LABELS.index(status.strip().lower()) - 1
+
+
+def find_plants(
+    sensor_name: str, status: str, limit: int = None
+) -> list[Plant | PlantView]:
+    """Finds plants by the status of one of their sensors, neediest first.
+
+    Args:
+        sensor_name: one of `SENSOR_NAMES`.
+        status: either "low", "good" or "high".
+        limit: the maximum number of plants to be returned.
+
+    Returns:
+        Plants whose `sensor_name` reads `status`, sorted by how far the
+        reading is outside the ideal range (or how close it is to leaving it).
+    """
+    status_code = _status_code(status)
+    plants = _load_plants()
+
+    if isinstance(plants, ColumnarPlants):
+        return plants.find(sensor_name, status_code, limit)
+
+    with _STATUS_INDEX_LOCK:
+        _STATUS_INDEX.sync(plants)
+        lower_names = list(_STATUS_INDEX.names[(sensor_name, status_code)])
+
+    def sort_key(plant: Plant) -> tuple[float, str]:
+        severity = _severity(
+            plant.actual_sensor.__getattribute__(sensor_name),
+            plant.ideal_min_sensor.__getattribute__(sensor_name),
+            plant.ideal_max_sensor.__getattribute__(sensor_name),
+        )
+        return -severity, plant.name
+
+    matches = [plants[lower_name] for lower_name in lower_names]
+
+    if limit is not None:
+        return nsmallest(limit, matches, key=sort_key)
+
+    return sorted(matches, key=sort_key)
+
+
+def count_plants(sensor_name: str, status: str) -> int:
+    """Counts plants by the status of one of their sensors, see `find_plants`."""
+    status_code = _status_code(status)
+    plants = _load_plants()
+
+    if isinstance(plants, ColumnarPlants):
+        return plants.count(sensor_name, status_code)
+
+    with _STATUS_INDEX_LOCK:
+        _STATUS_INDEX.sync(plants)
+        return len(_STATUS_INDEX.names[(sensor_name, status_code)])
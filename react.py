@@ -1,7 +1,14 @@
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from copy import deepcopy
 from functools import partial
+from threading import Lock
 from typing import Literal
+import asyncio
+import logging
+import re
 
+from dspy import settings
 from dspy.primitives.example import Example
 from dspy.primitives.prediction import Prediction
 from dspy.primitives.program import Module
@@ -9,9 +16,50 @@ from dspy.predict import Predict
 from dspy.retrieve import Retrieve
 from dspy.signatures import Signature
 from dspy.signatures.field import OutputField, InputField
-from dspy.signatures.signature import ensure_signature
+from dspy.signatures.signature import ensure_signature, signature_to_template
+import dsp
+
+from config import REACT_MAX_ACTIONS_PER_HOP, REACT_MAX_CONCURRENCY, REACT_TOOL_WORKERS
+
+_LOGGER = logging.getLogger(__name__)
 
 _FINISH_ACTION_NAME = "Finish"
+_ACTION_SEPARATOR = "; "
+_ACTION_PATTERN = re.compile(r"(\w+)\s*\[([^\]]*)\]?")
+
+# Planner calls block on the LM, so async sessions wait for them in threads
+_PLANNER_EXECUTOR = ThreadPoolExecutor(
+    max_workers=REACT_MAX_CONCURRENCY, thread_name_prefix="react-planner"
+)
+
+# Actions of the same hop run here. Tools with a `max_concurrency` get a pool
+# of their own instead, so slow ones cannot take every thread of this one.
+_TOOL_EXECUTOR = ThreadPoolExecutor(
+    max_workers=REACT_TOOL_WORKERS, thread_name_prefix="react-tool"
+)
+_TOOL_EXECUTORS = {}
+_TOOL_EXECUTORS_LOCK = Lock()
+
+# Guards the counters of the stats below, updated from many sessions at once
+_STATS_LOCK = Lock()
+
+# Tokens of Thought n and Action n generated by planners vs kept after
+# cleaning, by hop. Counted as words and punctuation, close to LM tokens.
+_HOP_TOKENS = defaultdict(Counter)
+_TOKEN_PATTERN = re.compile(r"\w+|[^\w\s]")
+
+# Tasks, hops, actions and actions that failed to parse or run
+_ACTION_STATS = Counter()
+_FAILED_ACTION_OBSERVATION = (
+    "Failed to parse action. Bad formatting or incorrect action name."
+)
+
+# Trajectory tokens vs tokens sent to planners once older observations are
+# compressed, by hop
+_CONTEXT_TOKENS = defaultdict(Counter)
+# Passages, and tokens of a passage, kept when summarizing an observation
+_SUMMARY_PASSAGES = 3
+_SUMMARY_PASSAGE_TOKENS = 48
 
 
 def _generate_tools(retrievers: list[Retrieve], outputs: str):
@@ -41,28 +89,46 @@ def _generate_instructions(
             f"({idx+1}) {tool.name}[{tool.input_variable}], which {tool.desc}",
         )
 
+    instructions.append(
+        f"\nIndependent actions can be taken at once by separating them with `{_ACTION_SEPARATOR}`."
+    )
+
     joined_instructions = "\n".join(instructions)
     return joined_instructions
 
 
-def _generate_planners(
-    n: int,
-    input_fields: dict[str, InputField],
+# Planner signatures shared by every ReAct with the same signature and tools,
+# keyed by (signature, tools, hops)
+_REACT_SIGNATURES = {}
+_REACT_SIGNATURES_LOCK = Lock()
+
+
+def _tools_key(tools: dict[str, Retrieve | Example]) -> tuple:
+    return tuple((tool.name, tool.input_variable, tool.desc) for tool in tools.values())
+
+
+def _get_react_signature(
+    signature: type[Signature],
     tools: dict[str, Retrieve | Example],
+    hops: int,
     instructions: str,
-):
-    planners = []
-    for n_reaction in range(1, n + 1):
-        react_signature = _generate_react_signature(
-            tools=tools,
-            input_fields=input_fields,
-            hops=n_reaction,
-            instructions=instructions,
-        )
-        reactor = Predict(react_signature)
-        planners.append(reactor)
+) -> Signature:
+    key = (signature, _tools_key(tools), hops)
+    react_signature = _REACT_SIGNATURES.get(key)
+
+    if react_signature is None:
+        with _REACT_SIGNATURES_LOCK:
+            react_signature = _REACT_SIGNATURES.get(key)
+
+            if react_signature is None:
+                react_signature = _REACT_SIGNATURES[key] = _generate_react_signature(
+                    tools=tools,
+                    input_fields=signature.input_fields,
+                    hops=hops,
+                    instructions=instructions,
+                )
 
-    return planners
+    return react_signature
 
 
 def _generate_react_signature(
@@ -126,10 +192,39 @@ def _format_action(action_name: str, action_arg: str) -> str:
     return formatted_action
 
 
+def _parse_actions(action: str) -> list[tuple[str, str]]:
+    """Parses every `name[arg]` on the first line of an action.
+
+    Finish is only taken when it comes first, as an answer given alongside
+    other actions has not seen their observations yet. Actions after a
+    Finish, or beyond REACT_MAX_ACTIONS_PER_HOP, are dropped.
+    """
+    first_line = action.strip().split("\n")[0]
+    actions = _ACTION_PATTERN.findall(first_line)
+
+    if not actions:
+        return [_parse_action(action)]
+
+    action_names = [action_name for action_name, _ in actions]
+
+    if _FINISH_ACTION_NAME in action_names:
+        actions = actions[: max(action_names.index(_FINISH_ACTION_NAME), 1)]
+
+    return actions[:REACT_MAX_ACTIONS_PER_HOP]
+
+
+def _format_actions(actions: list[tuple[str, str]]) -> str:
+    return _ACTION_SEPARATOR.join(
+        _format_action(action_name, action_arg) for action_name, action_arg in actions
+    )
+
+
 def _clean_action(action: str) -> str:
-    action_name, action_arg = _parse_action(action)
-    clean_action = _format_action(action_name, action_arg)
-    return clean_action
+    # Field descriptions are formatted too, and only mention actions
+    if not _ACTION_PATTERN.match(action.strip()):
+        return action.strip()
+
+    return _format_actions(_parse_actions(action))
 
 
 def _clean_observation(passages: list[str] | str) -> str:
@@ -182,17 +277,312 @@ def is_duplicate_action(action: str, reactions: dict[str, str]) -> bool:
     return is_duplicate_action
 
 
+def get_earlier_observation(action: str, reactions: dict[str, str]):
+    """Gets the observation of an earlier identical action, see `is_duplicate_action`.
+
+    Returns:
+        The observation or None if the action was not taken before.
+    """
+    action_reactions = get_reactions_by_step(reactions, step_name="action")
+    lower_action_value = action.lower()
+
+    for action_step_name, action_value in action_reactions.items():
+        if action_value.lower() == lower_action_value:
+            hop = action_step_name.split("_")[-1]
+            return reactions.get(f"Observation_{hop}")
+
+    return None
+
+
+def _hop_stop_sequences(hop: int) -> list[str]:
+    # Anything after Action n is a made-up observation or a later hop
+    return [f"Observation {hop}:", f"Thought {hop + 1}:", "\n---"]
+
+
+def _count_tokens(text) -> int:
+    return len(_TOKEN_PATTERN.findall(str(text)))
+
+
+def _count_hop_tokens(reaction: Prediction, hop: int) -> int:
+    return sum(
+        _count_tokens(reaction.get(step_name, ""))
+        for step_name in (f"Thought_{hop}", f"Action_{hop}")
+    )
+
+
+def hop_token_stats() -> dict[int, dict[str, int]]:
+    """Counts planner calls and tokens generated vs kept, by hop."""
+    with _STATS_LOCK:
+        return {hop: dict(_HOP_TOKENS[hop]) for hop in sorted(_HOP_TOKENS)}
+
+
+def action_stats() -> dict:
+    """Counts tasks, hops and failed actions, with their rates."""
+    counts = ("tasks", "hops", "actions", "failed_actions", "repeated_actions")
+
+    with _STATS_LOCK:
+        stats = {count: _ACTION_STATS[count] for count in counts}
+
+    return {
+        **stats,
+        "parse_failure_rate": stats["failed_actions"] / max(stats["actions"], 1),
+        "hops_per_task": stats["hops"] / max(stats["tasks"], 1),
+    }
+
+
+def context_token_stats() -> dict[int, dict[str, int]]:
+    """Counts trajectory tokens, tokens sent to planners and tokens saved, by hop."""
+    with _STATS_LOCK:
+        return {hop: dict(_CONTEXT_TOKENS[hop]) for hop in sorted(_CONTEXT_TOKENS)}
+
+
+def reset_react_stats():
+    with _STATS_LOCK:
+        _HOP_TOKENS.clear()
+        _ACTION_STATS.clear()
+        _CONTEXT_TOKENS.clear()
+
+
+def _observation_passages(observation: list[str] | str) -> list[str]:
+    return [observation] if isinstance(observation, str) else list(observation)
+
+
+def _truncate_passage(passage: str, max_tokens: int) -> str:
+    tokens = list(_TOKEN_PATTERN.finditer(passage))
+
+    if len(tokens) <= max_tokens:
+        return passage
+
+    return passage[: tokens[max_tokens - 1].end()] + " ..."
+
+
+def _summarize_observation(passages: list[str]) -> list[str]:
+    summary = [
+        _truncate_passage(passage, _SUMMARY_PASSAGE_TOKENS)
+        for passage in passages[:_SUMMARY_PASSAGES]
+    ]
+    n_more = len(passages) - len(summary)
+
+    if n_more > 0:
+        summary.append(f"... and {n_more} more lines")
+
+    return summary
+
+
+def _compress_trajectory(reactions: dict, max_tokens: int) -> tuple[dict, int, int]:
+    """Shrinks older observations until the trajectory fits `max_tokens`.
+
+    Observations are compressed oldest first, each one in steps that stop as
+    soon as the trajectory fits: passages repeated by a later observation are
+    dropped, then the observation is cut down to its first passages, then
+    it is left out altogether. The latest observation is always kept as is.
+
+    Returns:
+        The reactions to plan with, the tokens of the whole trajectory and
+        the tokens saved.
+    """
+    step_tokens = {
+        step_name: _count_tokens(_clean_observation(value))
+        for step_name, value in reactions.items()
+    }
+    total_tokens = sum(step_tokens.values())
+
+    observation_names = sorted(
+        (step_name for step_name in reactions if step_name.startswith("Observation_")),
+        key=lambda step_name: int(step_name.split("_")[-1]),
+    )
+
+    if total_tokens <= max_tokens or len(observation_names) < 2:
+        return reactions, total_tokens, 0
+
+    compressed = dict(reactions)
+    saved_tokens = 0
+
+    for index, step_name in enumerate(observation_names[:-1]):
+        later_passages = {
+            passage.strip()
+            for later_step_name in observation_names[index + 1 :]
+            for passage in _observation_passages(reactions[later_step_name])
+        }
+        passages = _observation_passages(reactions[step_name])
+        unique_passages = [
+            passage for passage in passages if passage.strip() not in later_passages
+        ] or ["Repeated in later observations"]
+
+        for observation in (
+            unique_passages,
+            _summarize_observation(unique_passages),
+            "Left out to save space",
+        ):
+            tokens = _count_tokens(_clean_observation(observation))
+
+            if tokens >= step_tokens[step_name]:
+                continue
+
+            compressed[step_name] = observation
+            saved_tokens += step_tokens[step_name] - tokens
+            step_tokens[step_name] = tokens
+
+            if total_tokens - saved_tokens <= max_tokens:
+                return compressed, total_tokens, saved_tokens
+
+    return compressed, total_tokens, saved_tokens
+
+
+def _generate_action_regex(
+    tools: dict[str, Retrieve | Example], hop: int, max_actions: int
+) -> str:
+    """Matches a completion of Thought n and Action n holding valid actions.
+
+    Tool arguments follow the tool `input_pattern`, if it has one. Only
+    capturing groups are used, as some guided decoding backends support
+    nothing else.
+    """
+    action_patterns = [
+        rf"{re.escape(tool.name)}\[{getattr(tool, 'input_pattern', None) or r'[^\]\n]*'}\]"
+        for tool in tools.values()
+        if tool.name != _FINISH_ACTION_NAME
+    ]
+    action = f"({'|'.join(action_patterns)})"
+    finish = rf"{_FINISH_ACTION_NAME}\[[^\]\n]+\]"
+    # The separator has no special characters, and escaped spaces confuse
+    # some regex engines
+    actions = (
+        rf"({finish}|{action}({_ACTION_SEPARATOR}{action}){{0,{max_actions - 1}}})"
+    )
+    return rf"[^\n]+\n\nAction {hop}: {actions}"
+
+
+def _call_planner(planner: Predict, lm, reactions: dict, config: dict) -> Prediction:
+    # Worker threads start from the main thread settings, not the caller's
+    with settings.context(lm=lm):
+        return planner(**reactions, config=config)
+
+
+def _next_hop(reactions: dict) -> int:
+    hop = 1
+
+    while f"Thought_{hop}" in reactions:
+        hop += 1
+
+    return hop
+
+
+class _AppendOnlyPlanner(Predict):
+    """Plans every hop with the signature and demos of the last hop.
+
+    Instructions, format and demos are rendered the same way at every hop and
+    the trajectory only grows at its end, so the prompt of a hop extends the
+    prompt of the previous one byte for byte and LM servers with prefix
+    caching only prefill the new steps. Only `Thought n` and `Action n` are
+    taken from the completion, the later fields are left to later hops.
+    """
+
+    def forward(self, **kwargs):
+        config = {**self.config, **kwargs.pop("config", {})}
+        lm = self.lm or settings.lm
+        hop = _next_hop(kwargs)
+
+        template = signature_to_template(self.signature)
+        example = dsp.Example(demos=self.demos, **kwargs)
+        completions = [
+            template.extract(example, completion)
+            for completion in lm(template(example), **config)
+        ]
+        completions = [
+            {
+                step_name: completion.get(step_name) or ""
+                for step_name in (f"Thought_{hop}", f"Action_{hop}")
+            }
+            for completion in completions
+        ]
+        prediction = Prediction.from_completions(completions, signature=self.signature)
+
+        if settings.trace is not None:
+            settings.trace.append((self, {**kwargs}, prediction))
+
+        return prediction
+
+
+def _tool_executor(tool: Retrieve) -> ThreadPoolExecutor:
+    max_concurrency = getattr(tool, "max_concurrency", None)
+
+    if max_concurrency is None:
+        return _TOOL_EXECUTOR
+
+    with _TOOL_EXECUTORS_LOCK:
+        executor = _TOOL_EXECUTORS.get(tool.name)
+
+        if executor is None:
+            executor = _TOOL_EXECUTORS[tool.name] = ThreadPoolExecutor(
+                max_workers=max_concurrency, thread_name_prefix=f"react-{tool.name}"
+            )
+
+    return executor
+
+
+async def _acall_tool(tool: Retrieve, action_arg: str) -> Prediction:
+    acall = getattr(tool, "acall", None)
+
+    if acall is not None and getattr(tool, "max_concurrency", None) is None:
+        return await acall(action_arg)
+
+    return await asyncio.wrap_future(_tool_executor(tool).submit(tool, action_arg))
+
+
+def _merge_observations(observations: list[Prediction | Exception]) -> list[str]:
+    passages = []
+
+    for observation in observations:
+        if isinstance(observation, Exception):
+            with _STATS_LOCK:
+                _ACTION_STATS["failed_actions"] += 1
+
+            passages.append(_FAILED_ACTION_OBSERVATION)
+        else:
+            passages.extend(observation.passages)
+
+    return passages
+
+
 class ReAct(Module):
+    """Interleaves Thought, Action and Observation steps for up to `max_hops`.
+
+    Args:
+        stop_after_action: end each generation right after `Action n`, with
+            stop sequences sent to the LM.
+        max_tokens: budgets of the generated fields, e.g.
+            {"Thought": 96, "Action": 48}. LM clients take one budget per
+            request, so each hop is given their sum.
+        append_only: plan every hop with one planner whose prompt only grows
+            at its end, see `_AppendOnlyPlanner`.
+        constrained_actions: send the LM a regex of valid actions, built from
+            the tools, as vLLM guided decoding parameter `guided_regex`.
+        max_context_tokens: budget of the trajectory given to planners. Older
+            observations are compressed to fit it, see `_compress_trajectory`,
+            unbounded if None.
+    """
+
     def __init__(
         self,
         signature,
         *,
         max_hops: int = 5,
         retrievers: list[Retrieve] = None,
+        stop_after_action: bool = False,
+        max_tokens: dict[str, int] = None,
+        append_only: bool = False,
+        constrained_actions: bool = False,
+        max_context_tokens: int = None,
     ):
         super().__init__()
         self.signature = ensure_signature(signature)
         self.max_hops = max_hops
+        self.stop_after_action = stop_after_action
+        self.max_tokens = max_tokens
+        self.append_only = append_only
+        self.constrained_actions = constrained_actions
+        self.max_context_tokens = max_context_tokens
 
         self.input_fields = self.signature.input_fields
         self.output_fields = self.signature.output_fields
@@ -209,53 +599,270 @@ class ReAct(Module):
             tools=self.tools, joined_inputs=joined_inputs, joined_outputs=joined_outputs
         )
 
-        self.planners = _generate_planners(
-            n=max_hops,
-            input_fields=self.input_fields,
-            tools=self.tools,
-            instructions=self.instructions,
+        # Planners are created when their hop is first reached, see `_planner`
+        self.planners = [None] * (1 if append_only else max_hops)
+
+    def _planner(self, hop: int) -> Predict:
+        index = 0 if self.append_only else hop - 1
+        planner = self.planners[index]
+
+        # Sessions racing here create equal, still untrained planners
+        if planner is None:
+            react_signature = _get_react_signature(
+                signature=self.signature,
+                tools=self.tools,
+                hops=self.max_hops if self.append_only else hop,
+                instructions=self.instructions,
+            )
+            planner_type = _AppendOnlyPlanner if self.append_only else Predict
+            planner = self.planners[index] = planner_type(react_signature)
+
+        return planner
+
+    def _planner_config(self, hop: int) -> dict:
+        config = {}
+
+        if self.stop_after_action:
+            config["stop"] = _hop_stop_sequences(hop)
+
+        if self.max_tokens:
+            config["max_tokens"] = sum(self.max_tokens.values())
+
+        if self.constrained_actions:
+            config["guided_regex"] = _generate_action_regex(
+                self.tools, hop, REACT_MAX_ACTIONS_PER_HOP
+            )
+
+        return config
+
+    def _planner_reactions(self, reactions: dict, hop: int) -> dict:
+        if not self.max_context_tokens:
+            return dict(reactions)
+
+        planner_reactions, trajectory_tokens, saved_tokens = _compress_trajectory(
+            reactions, self.max_context_tokens
         )
 
-    def act_and_observe(self, reaction: Prediction):
+        with _STATS_LOCK:
+            context_tokens = _CONTEXT_TOKENS[hop]
+            context_tokens["calls"] += 1
+            context_tokens["trajectory"] += trajectory_tokens
+            context_tokens["sent"] += trajectory_tokens - saved_tokens
+            context_tokens["saved"] += saved_tokens
+
+        if saved_tokens:
+            _LOGGER.debug(
+                "Hop %d: compressed older observations, %d of %d trajectory tokens saved",
+                hop,
+                saved_tokens,
+                trajectory_tokens,
+            )
+
+        return dict(planner_reactions)
+
+    def named_parameters(self):
+        # Optimizers, saving and loading need every planner
+        for hop in range(1, self.max_hops + 1):
+            self._planner(hop)
+
+        return super().named_parameters()
+
+    def _parse_latest_actions(
+        self, reaction: Prediction
+    ) -> tuple[int, list[tuple[str, str]]]:
         step_n, latest_action_step = _get_latest_step(reaction, step_name="action")
-        latest_action = reaction[latest_action_step]
 
         try:
-            action_name, action_arg = _parse_action(latest_action)
-            reaction[latest_action_step] = _format_action(action_name, action_arg)
+            actions = _parse_actions(reaction[latest_action_step])
+        except Exception:
+            with _STATS_LOCK:
+                _ACTION_STATS["actions"] += 1
+
+            raise
+
+        with _STATS_LOCK:
+            _ACTION_STATS["actions"] += len(actions)
+
+        reaction[latest_action_step] = _format_actions(actions)
+        return step_n, actions
+
+    def _observe_failure(self, reaction: Prediction):
+        step_n, _ = _get_latest_step(reaction, step_name="action")
+
+        with _STATS_LOCK:
+            _ACTION_STATS["failed_actions"] += 1
+
+        reaction[f"Observation_{step_n}"] = _FAILED_ACTION_OBSERVATION
+
+    def _observe(self, actions: list[tuple[str, str]]) -> list[str]:
+        if len(actions) == 1:
+            action_name, action_arg = actions[0]
+            return self.tools[action_name](action_arg).passages
+
+        futures = []
+
+        for action_name, action_arg in actions:
+            action_tool = self.tools.get(action_name)
+
+            if action_tool is None:
+                futures.append(None)
+            else:
+                executor = _tool_executor(action_tool)
+                futures.append(executor.submit(action_tool, action_arg))
+
+        observations = []
+
+        # In the order of the actions, whichever finishes first
+        for (action_name, _), future in zip(actions, futures):
+            try:
+                if future is None:
+                    raise KeyError(action_name)
+
+                observations.append(future.result())
+            except Exception as exception:
+                observations.append(exception)
+
+        return _merge_observations(observations)
+
+    async def _aobserve(self, actions: list[tuple[str, str]]) -> list[str]:
+        if len(actions) == 1:
+            action_name, action_arg = actions[0]
+            observation = await _acall_tool(self.tools[action_name], action_arg)
+            return observation.passages
+
+        observations = await asyncio.gather(
+            *(
+                (
+                    _acall_tool(self.tools[action_name], action_arg)
+                    if action_name in self.tools
+                    else asyncio.sleep(0, KeyError(action_name))
+                )
+                for action_name, action_arg in actions
+            ),
+            return_exceptions=True,
+        )
+        return _merge_observations(observations)
+
+    def _repeated_observation(
+        self, reaction: Prediction, step_n: int, reactions: dict | None
+    ) -> bool:
+        # Repeated actions get the observation they got before, right away
+        observation = get_earlier_observation(
+            reaction[f"Action_{step_n}"], reactions or {}
+        )
+
+        if observation is None:
+            return False
+
+        with _STATS_LOCK:
+            _ACTION_STATS["repeated_actions"] += 1
+
+        reaction[f"Observation_{step_n}"] = observation
+        return True
+
+    def act_and_observe(self, reaction: Prediction, reactions: dict = None):
+        try:
+            step_n, actions = self._parse_latest_actions(reaction)
+            action_name, action_arg = actions[0]
 
-            if action_name == "Finish":
+            if action_name == _FINISH_ACTION_NAME:
                 return action_arg
 
-            action_tool = self.tools[action_name]
-            reaction[f"Observation_{step_n}"] = action_tool(action_arg).passages
+            if not self._repeated_observation(reaction, step_n, reactions):
+                reaction[f"Observation_{step_n}"] = self._observe(actions)
 
         except Exception:
-            reaction[f"Observation_{step_n}"] = (
-                "Failed to parse action. Bad formatting or incorrect action name."
-            )
+            self._observe_failure(reaction)
+
+    async def aact_and_observe(self, reaction: Prediction, reactions: dict = None):
+        try:
+            step_n, actions = self._parse_latest_actions(reaction)
+            action_name, action_arg = actions[0]
+
+            if action_name == _FINISH_ACTION_NAME:
+                return action_arg
+
+            if not self._repeated_observation(reaction, step_n, reactions):
+                reaction[f"Observation_{step_n}"] = await self._aobserve(actions)
+
+        except Exception:
+            self._observe_failure(reaction)
+
+    def _record_hop_tokens(self, hop: int, generated_tokens: int, reaction: Prediction):
+        kept_tokens = _count_hop_tokens(reaction, hop)
+
+        with _STATS_LOCK:
+            hop_tokens = _HOP_TOKENS[hop]
+            hop_tokens["calls"] += 1
+            hop_tokens["generated"] += generated_tokens
+            hop_tokens["kept"] += kept_tokens
+
+    def _prediction(self, final: str | None, reactions: dict, hops: int) -> Prediction:
+        with _STATS_LOCK:
+            _ACTION_STATS["tasks"] += 1
+            _ACTION_STATS["hops"] += hops
+
+        # assumes only 1 output field for now - TODO: handling for multiple output fields
+        output_field_name = list(self.output_fields.keys())[0]
+        prediction_kwargs = {output_field_name: final or "", **reactions}
+        prediction = Prediction(**prediction_kwargs)
+        return prediction
 
     def forward(self, **kwargs):
         reactions = {
             key: kwargs[key] for key in self.input_fields.keys() if key in kwargs
         }
 
-        for idx, planner in enumerate(self.planners):
-            reaction = planner(**reactions)
+        for hop in range(1, self.max_hops + 1):
+            reaction = self._planner(hop)(
+                **self._planner_reactions(reactions, hop),
+                config=self._planner_config(hop),
+            )
+            generated_tokens = _count_hop_tokens(reaction, hop)
 
             # Suggest(
-            #     is_duplicate_action(reaction[f"Action_{idx+1}"], reactions),
+            #     is_duplicate_action(reaction[f"Action_{hop}"], reactions),
             #     "This action has been used before with its results in observations. Re-examine observations and try again.",
             # )
 
-            final = self.act_and_observe(reaction)
+            final = self.act_and_observe(reaction, reactions)
+            self._record_hop_tokens(hop, generated_tokens, reaction)
             reactions.update(reaction)
 
             if final:
                 break
 
-        # assumes only 1 output field for now - TODO: handling for multiple output fields
-        output_field_name = list(self.output_fields.keys())[0]
-        prediction_kwargs = {output_field_name: final or "", **reactions}
-        prediction = Prediction(**prediction_kwargs)
-        return prediction
+        return self._prediction(final, reactions, hops=hop)
+
+    async def aforward(self, **kwargs):
+        """Same as `forward`, but many sessions can be awaited concurrently.
+
+        Planner calls run in a shared thread pool, bounded by
+        REACT_MAX_CONCURRENCY, and tools are awaited through their `acall`
+        when they have one.
+        """
+        reactions = {
+            key: kwargs[key] for key in self.input_fields.keys() if key in kwargs
+        }
+        lm = settings.lm
+        loop = asyncio.get_running_loop()
+
+        for hop in range(1, self.max_hops + 1):
+            reaction = await loop.run_in_executor(
+                _PLANNER_EXECUTOR,
+                _call_planner,
+                self._planner(hop),
+                lm,
+                self._planner_reactions(reactions, hop),
+                self._planner_config(hop),
+            )
+            generated_tokens = _count_hop_tokens(reaction, hop)
+
+            final = await self.aact_and_observe(reaction, reactions)
+            self._record_hop_tokens(hop, generated_tokens, reaction)
+            reactions.update(reaction)
+
+            if final:
+                break
+
+        return self._prediction(final, reactions, hops=hop)
@@ -0,0 +1,48 @@
+import unittest
+
+from carie.router import Router
+from carie.tools import FindPlants, ReadPlantSensor
+
+# Questions about Eddie of storage/plants.json, and the intent they are
+# routed to, or None when they must be left to ReAct
+_CASES = (
+    ("What is Eddie's soil pH?", "value"),
+    ("Carie, what is the current light level of Eddie?", "value"),
+    ("What is Eddie's ideal air temperature?", "ideal"),
+    ("What should Eddie's air humidity be?", "ideal"),
+    ("Is Eddie too cold?", "check"),
+    ("Is Eddie over-watered?", "check"),
+    ("Who needs more light?", "find"),
+    ("Which plants have too much soil moisture?", "find"),
+    # The past, only the sensor history knows
+    ("What was Eddie's air temperature yesterday?", None),
+    ("How did Eddie's light level change over the last week?", None),
+    ("When was Eddie watered?", None),
+    # Humidity of the air or of the soil
+    ("What should the humidity be for Eddie?", None),
+    ("Is Eddie's humidity too low?", None),
+    # Advice
+    ("Should I water Eddie?", None),
+    # Negations and conflicting cues
+    ("Which plants are not too hot?", None),
+    ("Isn't Eddie too cold?", None),
+    ("Does Eddie need more or less light?", None),
+    # No single plant or sensor
+    ("How is Eddie doing?", None),
+    ("Is Eddie or Iduna too cold?", None),
+)
+
+
+class RouterTest(unittest.TestCase):
+    def test_route(self):
+        tools = {tool.name: tool for tool in (ReadPlantSensor(), FindPlants())}
+        router = Router(tools)
+
+        for question, intent in _CASES:
+            with self.subTest(question=question):
+                route = router.route(question)
+                self.assertEqual(route and route.intent, intent)
+
+
+if __name__ == "__main__":
+    unittest.main()